@@ -0,0 +1,296 @@
+"""Benchmarks for the framework's own overhead: attack loading, detection and the runner.
+
+Model calls are answered by FakeLLMClient, so the numbers measure this code, not Bedrock.
+
+    uv run python benchmarks/run_benchmarks.py [--quick] [--fail-on-regression]
+
+Every run is appended to benchmarks/results/history.jsonl and compared with the previous run
+of the same kind (quick or full) on the same machine; metrics that got more than
+--tolerance worse are reported as regressions.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from attack_loader import AttackLoader
+from detection_engine import AhoCorasick, CompiledIndicators, IncrementalMatcher, compile_indicators
+from helpers.fake_llm_client import FakeLLMClient
+from prompt_injection_detector import PromptInjectionDetector
+from result_formatter import ResultFormatter
+from runner import Runner
+
+REAL_CORPUS = ROOT / 'use_cases' / 'all_attacks'
+RESULTS_PATH = ROOT / 'benchmarks' / 'results' / 'history.jsonl'
+TAXONOMIES = ('jailbreak', 'discuss_harm', 'get_prompt_secret', 'cognitive_overload', 'data_exfiltration', 'morse', 'markdown')
+PAYLOADS = ('PWNED', 'DAN Mode', 'This model has been hijacked', 'Access Denied', 'anti_patterns.md', 'I hate humans')
+
+
+def synthetic_attacks(count, seed=0):
+    rng = random.Random(seed)
+    attacks = []
+    for n in range(count):
+        taxonomy = rng.choice(TAXONOMIES)
+        payload = rng.choice(PAYLOADS)
+        padding = ' '.join(rng.choice(('please', 'ignore', 'previous', 'instructions', 'now', 'say')) for _ in range(rng.randint(5, 200)))
+        attacks.append(
+            {
+                'name': f'Synthetic {n}',
+                'prompt': f'{padding} and answer only with {payload}',
+                'payload': payload,
+                'type': taxonomy.replace('_', ' '),
+                'prompt_taxonomy': taxonomy,
+                'language': rng.choice(('en', 'es')),
+                'source': 'synthetic',
+                'relative_path': f'{taxonomy}/synthetic_{n:05d}.yaml',
+                'image_path': None,
+            }
+        )
+    return attacks
+
+
+def write_corpus(directory, attacks):
+    import yaml
+
+    for attack in attacks:
+        path = Path(directory) / attack['relative_path']
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {key: value for key, value in attack.items() if key not in ('relative_path', 'image_path')}
+        path.write_text(yaml.safe_dump(data, allow_unicode=True), encoding='utf-8')
+
+
+@contextlib.contextmanager
+def quiet():
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def timed(function):
+    start = time.perf_counter()
+    with quiet():
+        result = function()
+    return time.perf_counter() - start, result
+
+
+def bench_loader(attacks_dir):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus = Path(temp_dir) / 'attacks'
+        shutil.copytree(attacks_dir, corpus, ignore=shutil.ignore_patterns('.attack_index.sqlite'))
+        direct_seconds, attacks = timed(lambda: AttackLoader(str(corpus)).load_yaml_attacks())
+        cold_seconds, _ = timed(lambda: AttackLoader(str(corpus), use_index=True).load_yaml_attacks())
+        warm_seconds, _ = timed(lambda: AttackLoader(str(corpus), use_index=True).load_yaml_attacks())
+    return {
+        'attacks': len(attacks),
+        'direct_seconds': direct_seconds,
+        'index_cold_seconds': cold_seconds,
+        'index_warm_seconds': warm_seconds,
+    }
+
+
+def bench_detector(attacks, responses):
+    rng = random.Random(1)
+    detector = PromptInjectionDetector(None)
+    samples = []
+    for _ in range(responses):
+        attack = rng.choice(attacks)
+        text = FakeLLMClient(response_chars=rng.randint(200, 8000)).invoke_model('m', 's', attack['prompt'])['content'][0]['text']
+        samples.append((attack, text))
+
+    start = time.perf_counter()
+    for attack, text in samples:
+        detector.evaluate_response(text, compile_indicators(attack))
+    seconds = time.perf_counter() - start
+    return {'responses': responses, 'responses_per_second': responses / seconds}
+
+
+def bench_multi_pattern(literal_count, repeats):
+    """Substring search per literal against the Aho-Corasick automaton, on whole responses and on streams.
+
+    The crossover between the two sets MULTI_PATTERN_THRESHOLD and STREAM_MULTI_PATTERN_THRESHOLD.
+    """
+    rng = random.Random(2)
+    text = FakeLLMClient(response_chars=8000).invoke_model('m', 's', 'attack')['content'][0]['text'].lower()
+    chunks = [text[i : i + 100] for i in range(0, len(text), 100)]
+    literals = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(12)) for _ in range(literal_count)]
+    substring, automaton = CompiledIndicators(literals), CompiledIndicators(literals)
+    substring.matcher, automaton.matcher = None, AhoCorasick(automaton.literals)
+
+    def stream(indicators):
+        matcher = IncrementalMatcher(indicators)
+        for chunk in chunks:
+            matcher.feed(chunk)
+
+    def best(function):
+        return min(timed(lambda: [function() for _ in range(repeats)])[0] for _ in range(3)) / repeats
+
+    return {
+        'literals': literal_count,
+        'substring_seconds': best(lambda: any(literal in text for literal in substring.literals)),
+        'automaton_seconds': best(lambda: automaton.matcher.search(text)),
+        'substring_stream_seconds': best(lambda: stream(substring)),
+        'automaton_stream_seconds': best(lambda: stream(automaton)),
+    }
+
+
+def run_fake(attacks, iterations, concurrency, latency_ms, keep_responses=True):
+    client = FakeLLMClient(latency_median_ms=latency_ms, latency_p95_ms=latency_ms * 3, compliance_rate=0.2, seed=42)
+    runner = Runner(PromptInjectionDetector(client), ResultFormatter(), iterations, concurrency, keep_responses=keep_responses)
+    return timed(lambda: runner.run_injection_tests('system', 'pre', 'post', attacks, 'fake-model'))
+
+
+def bench_runner(attacks, iterations, concurrency, latency_ms):
+    seconds, stats = run_fake(attacks, iterations, concurrency, latency_ms)
+    calls = stats['total_iterations']
+    result = {
+        'attacks': len(attacks),
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'latency_ms': latency_ms,
+        'wall_seconds': seconds,
+        'tests_per_second': len(attacks) / seconds,
+        'calls_per_second': calls / seconds,
+    }
+    if latency_ms:
+        # Share of the ideal `concurrency / latency` call rate actually reached
+        result['scaling_efficiency'] = result['calls_per_second'] / (concurrency * 1000 / latency_ms)
+    else:
+        result['overhead_us_per_call'] = seconds / calls * 1e6
+    return result
+
+
+def bench_memory(attacks, concurrency, keep_responses):
+    tracemalloc.start()
+    try:
+        run_fake(attacks, 1, concurrency, 0, keep_responses)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'attacks': len(attacks), 'keep_responses': keep_responses, 'peak_bytes': peak}
+
+
+def run_benchmarks(quick):
+    real_attacks = timed(lambda: AttackLoader(str(REAL_CORPUS)).load_yaml_attacks())[1] if REAL_CORPUS.exists() else []
+    synthetic_count = 1_000 if quick else 10_000
+    synthetic = synthetic_attacks(synthetic_count)
+    concurrency_levels = (1, 8) if quick else (1, 4, 16, 64)
+    results = {}
+
+    if REAL_CORPUS.exists():
+        results['loader_all_attacks'] = bench_loader(REAL_CORPUS)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_corpus(temp_dir, synthetic)
+        results[f'loader_synthetic_{synthetic_count}'] = bench_loader(temp_dir)
+
+    results['detector'] = bench_detector(real_attacks or synthetic, 500 if quick else 5_000)
+    for literal_count in (16, 128, 512) if quick else (16, 64, 128, 256, 512, 1024):
+        results[f'multi_pattern_{literal_count}'] = bench_multi_pattern(literal_count, 5 if quick else 20)
+
+    for concurrency in (1, 8):
+        results[f'runner_overhead_synthetic_{synthetic_count}_c{concurrency}'] = bench_runner(synthetic, 1, concurrency, 0)
+    scaling_attacks = real_attacks or synthetic[:155]
+    for concurrency in concurrency_levels:
+        results[f'runner_scaling_c{concurrency}'] = bench_runner(scaling_attacks, 1 if quick else 3, concurrency, 20)
+
+    for keep_responses in (True, False):
+        results[f'memory_synthetic_{synthetic_count}_keep_{str(keep_responses).lower()}'] = bench_memory(synthetic, 8, keep_responses)
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metric_direction(name):
+    """+1 when higher is better, -1 when lower is better, 0 for parameters that are not compared."""
+    if name.endswith(('_per_second', '_efficiency')):
+        return 1
+    if name.endswith(('_seconds', '_bytes', '_per_call')):
+        return -1
+    return 0
+
+
+def find_regressions(current, previous, tolerance):
+    regressions = []
+    for benchmark, metrics in current['benchmarks'].items():
+        for name, value in metrics.items():
+            direction = metric_direction(name)
+            before = previous['benchmarks'].get(benchmark, {}).get(name)
+            if not direction or not before:
+                continue
+            change = (value - before) / before
+            if change * direction < -tolerance:
+                regressions.append(f'{benchmark}.{name}: {before:.4g} -> {value:.4g} ({change:+.0%})')
+    return regressions
+
+
+def load_previous(current):
+    if not RESULTS_PATH.exists():
+        return None
+    previous = None
+    with open(RESULTS_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record['quick'] == current['quick'] and record['machine'] == current['machine']:
+                previous = record
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='Smaller corpora and fewer concurrency levels')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Relative change reported as a regression (default: 0.2)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 when a regression is found')
+    parser.add_argument('--no-record', action='store_true', help='Do not append this run to the history file')
+    args = parser.parse_args()
+
+    current = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'quick': args.quick,
+        'machine': f'{platform.node()} {platform.machine()} python {platform.python_version()}',
+        'benchmarks': run_benchmarks(args.quick),
+    }
+
+    for benchmark, metrics in current['benchmarks'].items():
+        print(
+            f'{benchmark}: '
+            + ', '.join(f'{name}={value:.4g}' if isinstance(value, float) else f'{name}={value}' for name, value in metrics.items())
+        )
+
+    previous = load_previous(current)
+    regressions = find_regressions(current, previous, args.tolerance) if previous else []
+    if previous:
+        print(f'\nCompared with {previous["commit"]} ({previous["timestamp"]}): {len(regressions)} regressions')
+        for regression in regressions:
+            print(f'  - {regression}')
+
+    if not args.no_record:
+        RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(RESULTS_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(current) + '\n')
+        print(f'Recorded in {RESULTS_PATH.relative_to(ROOT)}')
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
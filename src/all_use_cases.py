@@ -0,0 +1,76 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from attack_loader import AttackLoader
+from attack_selector import AttackSelector
+from config import USE_CASES_DIR
+
+
+def discover_use_cases(use_cases_dir: str = USE_CASES_DIR) -> List[str]:
+    """Names of the use cases that have a prompt_to_test.yaml."""
+    return sorted(path.parent.name for path in Path(use_cases_dir).glob('*/prompt_to_test.yaml'))
+
+
+class SharedResources:
+    """What the use cases of one process share (main.py --all).
+
+    Each attacks directory is parsed once, and objects such as client stacks are built once
+    per distinct settings. A single use case run uses a fresh instance, so nothing changes for it.
+    """
+
+    def __init__(self, selector: Optional[AttackSelector] = None) -> None:
+        self.selector = selector
+        self._attacks: Dict[str, Tuple[AttackLoader, List[Dict[str, Any]]]] = {}
+        self._objects: Dict[Tuple[str, str], Any] = {}
+
+    def attacks(self, attacks_dir: str) -> Tuple[AttackLoader, List[Dict[str, Any]]]:
+        """The loader and selected attacks of a directory. Use cases must not modify the returned attacks."""
+        key = str(Path(attacks_dir).resolve())
+        if key not in self._attacks:
+            loader = AttackLoader(attacks_dir=attacks_dir, use_index=True)
+            self._attacks[key] = (loader, loader.load_yaml_attacks(self.selector))
+        return self._attacks[key]
+
+    def get(self, kind: str, settings: Any, build: Callable[[], Any]) -> Any:
+        """The `kind` object built for these settings, calling `build` the first time they are seen."""
+        key = (kind, json.dumps(settings, sort_keys=True, default=str))
+        if key not in self._objects:
+            self._objects[key] = build()
+        return self._objects[key]
+
+    def built(self, kind: str) -> List[Any]:
+        return [value for (object_kind, _), value in self._objects.items() if object_kind == kind]
+
+
+async def run_use_cases_async(jobs: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Dict[str, Any]]]:
+    """Run every model of every use case on one pool of `concurrency` threads.
+
+    Each job holds a use case name, its `runner`, its `prompt_to_test` config and its `attacks`.
+    Model calls of all use cases are interleaved, so a slow use case does not hold the others
+    up. Returns the stats per model of each job, in job order.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    runs = []
+    for job in jobs:
+        prompt_to_test = job['prompt_to_test']
+        for model_id in prompt_to_test['model_ids']:
+            label = job['use_case'] if len(prompt_to_test['model_ids']) == 1 else f'{job["use_case"]}/{model_id.split(".")[-1]}'
+            runs.append(
+                job['runner'].run_injection_tests_async(
+                    prompt_to_test['system_prompt'],
+                    prompt_to_test['pre_user_message'],
+                    prompt_to_test['post_user_message'],
+                    job['attacks'],
+                    model_id,
+                    executor=executor,
+                    label=label,
+                )
+            )
+    try:
+        stats = iter(await asyncio.gather(*runs))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [{model_id: next(stats) for model_id in job['prompt_to_test']['model_ids']} for job in jobs]
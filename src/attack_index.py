@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+from attack_selector import AttackSelector
+from config import ATTACK_INDEX_FILENAME, ATTACK_INDEX_PARALLEL_THRESHOLD
+
+# libyaml's C parser is much faster than the pure-Python one when it is available
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+INDEX_VERSION = 1
+INDEXED_FIELDS = ('type', 'prompt_taxonomy', 'language', 'source')
+
+
+def parse_yaml_file(path: str) -> Tuple[Optional[Any], Optional[str]]:
+    """Parse one YAML file, returning (data, None) or (None, error message). Runs in worker processes."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return yaml.load(f, Loader=SafeLoader), None
+    except Exception as e:
+        return None, str(e)
+
+
+class AttackIndex:
+    """Compiled index of an attacks directory, stored as SQLite inside it.
+
+    Each YAML file is parsed once and its data kept with the file's mtime, size and content
+    hash. Later loads only stat the files and re-parse those that changed, so startup cost
+    no longer grows with YAML parsing. Image paths are still resolved on every load, which
+    is a cheap stat for the few image attacks.
+    """
+
+    def __init__(self, loader: Any, index_path: Optional[str] = None) -> None:
+        self.loader = loader
+        self.index_path = Path(index_path) if index_path else Path(loader.attacks_dir) / ATTACK_INDEX_FILENAME
+        self.connection = sqlite3.connect(str(self.index_path))
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != INDEX_VERSION:
+            self.connection.execute('DROP TABLE IF EXISTS attacks')
+        columns = ', '.join(f'{field} TEXT' for field in INDEXED_FIELDS)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS attacks ('
+            'relative_path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, sha256 TEXT NOT NULL, '
+            f'data TEXT, error TEXT, {columns})'
+        )
+        self.connection.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+        self.connection.commit()
+
+    def _parse_files(self, paths: List[str]) -> List[Tuple[Optional[Any], Optional[str]]]:
+        if len(paths) < ATTACK_INDEX_PARALLEL_THRESHOLD:
+            return [parse_yaml_file(path) for path in paths]
+        with ProcessPoolExecutor() as executor:
+            return list(executor.map(parse_yaml_file, paths, chunksize=16))
+
+    def _find_changed_files(
+        self, selector: Optional[AttackSelector] = None
+    ) -> Tuple[List[Tuple[str, Path, os.stat_result, str]], List[Tuple[int, int, str]], set]:
+        indexed = {row[0]: row[1:] for row in self.connection.execute('SELECT relative_path, mtime_ns, size, sha256 FROM attacks')}
+        changed, touched, seen = [], [], set()
+
+        attacks_path = Path(self.loader.attacks_dir)
+        for yaml_file in self.loader.find_yaml_files():
+            relative_path = str(yaml_file.relative_to(attacks_path))
+            seen.add(relative_path)
+            if selector and not selector.matches_path(relative_path):
+                # Not selected whatever its contents: leave its index entry as it is
+                continue
+            stat = yaml_file.stat()
+            row = indexed.get(relative_path)
+            if row and row[:2] == (stat.st_mtime_ns, stat.st_size):
+                continue
+
+            sha256 = hashlib.sha256(yaml_file.read_bytes()).hexdigest()
+            if row and row[2] == sha256:
+                # Touched but not edited: keep the parsed data
+                touched.append((stat.st_mtime_ns, stat.st_size, relative_path))
+            else:
+                changed.append((relative_path, yaml_file, stat, sha256))
+
+        removed = set(indexed) - seen
+        return changed, touched, removed
+
+    def refresh(self, selector: Optional[AttackSelector] = None) -> Dict[str, int]:
+        """Bring the index up to date with the directory and return how many files changed.
+
+        With a selector, files whose path is not selected are neither hashed nor parsed.
+        """
+        changed, touched, removed = self._find_changed_files(selector)
+        parsed = self._parse_files([str(yaml_file) for _, yaml_file, _, _ in changed])
+
+        rows = []
+        for (relative_path, _, stat, sha256), (data, error) in zip(changed, parsed):
+            fields = [str(data.get(field)) if isinstance(data, dict) and data.get(field) is not None else None for field in INDEXED_FIELDS]
+            rows.append((relative_path, stat.st_mtime_ns, stat.st_size, sha256, json.dumps(data, default=str), error, *fields))
+
+        placeholders = ', '.join('?' * (6 + len(INDEXED_FIELDS)))
+        self.connection.executemany(f'INSERT OR REPLACE INTO attacks VALUES ({placeholders})', rows)
+        self.connection.executemany('UPDATE attacks SET mtime_ns = ?, size = ? WHERE relative_path = ?', touched)
+        self.connection.executemany('DELETE FROM attacks WHERE relative_path = ?', [(path,) for path in removed])
+        self.connection.commit()
+
+        return {'parsed': len(changed), 'touched': len(touched), 'removed': len(removed)}
+
+    def load_attacks(self, selector: Optional[AttackSelector] = None) -> List[Dict[str, Any]]:
+        changes = self.refresh(selector)
+        columns = ', '.join(INDEXED_FIELDS)
+        rows = self.connection.execute(f'SELECT relative_path, data, error, {columns} FROM attacks ORDER BY relative_path').fetchall()
+        print(f'Found {len(rows)} YAML files ({changes["parsed"]} parsed, {len(rows) - changes["parsed"]} from index)')
+
+        if selector and not selector.is_empty:
+            # Answered from the index columns, so unselected attacks are never decoded
+            rows = [row for row in rows if selector.matches({'relative_path': row[0], **dict(zip(INDEXED_FIELDS, row[3:]))})]
+            print(f'Selected {len(rows)} attacks')
+
+        # Resolve the directory once instead of every file
+        attacks_path = Path(self.loader.attacks_dir).resolve()
+        attacks = []
+        for relative_path, data, error, *_ in rows:
+            yaml_file = attacks_path / relative_path
+            if error is not None:
+                print(f'Failed to load {yaml_file.name}: {error}')
+                continue
+            attack = self.loader.build_attack(json.loads(data), yaml_file, relative_path)
+            if attack:
+                attacks.append(attack)
+
+        print(f'Loaded {len(attacks)} valid attacks')
+        return attacks
+
+    def close(self) -> None:
+        self.connection.close()
@@ -1,11 +1,16 @@
+import re
+import sqlite3
 from pathlib import Path
 
 import yaml
 
+from attack_index import AttackIndex, SafeLoader
+
 
 class AttackLoader:
-    def __init__(self, attacks_dir):
+    def __init__(self, attacks_dir, use_index=False):
         self.attacks_dir = attacks_dir
+        self.use_index = use_index
 
     def is_valid_attack_structure(self, attack_data):
         if not (attack_data and 'name' in attack_data and 'prompt' in attack_data and 'payload' in attack_data):
@@ -15,6 +20,17 @@ class AttackLoader:
         if not (attack_data['name'].strip() and attack_data['prompt'].strip() and attack_data['payload'].strip()):
             return False
 
+        # Optional extra indicators: more literals and regexes that also count as the attack succeeding
+        for field in ('payloads', 'payload_patterns'):
+            values = attack_data.get(field) or []
+            if not (isinstance(values, list) and all(isinstance(value, str) and value.strip() for value in values)):
+                return False
+        for pattern in attack_data.get('payload_patterns') or []:
+            try:
+                re.compile(pattern)
+            except re.error:
+                return False
+
         if 'image_path' in attack_data and attack_data['image_path']:
             image_path = Path(self.attacks_dir) / 'shared_assets' / attack_data['image_path']
             if not image_path.exists():
@@ -30,37 +46,62 @@ class AttackLoader:
 
         return True
 
+    def get_relative_path(self, yaml_file):
+        attacks_path = Path(self.attacks_dir).resolve()
+        return str(yaml_file.resolve().relative_to(attacks_path))
+
+    def build_attack(self, attack_data, yaml_file, relative_path=None):
+        """Validate parsed YAML data and add file information, or return None if it is not a valid attack."""
+        if not self.is_valid_attack_structure(attack_data):
+            print(f'Invalid structure in {yaml_file.name}')
+            return None
+
+        # Add filename and file path information
+        attack_data['filename'] = yaml_file.name
+        attack_data['file_path'] = str(yaml_file.resolve())
+        # Add relative path from attacks directory
+        attack_data['relative_path'] = relative_path or self.get_relative_path(yaml_file)
+        return attack_data
+
     def load_attack_from_file(self, yaml_file):
         try:
             with open(yaml_file, 'r', encoding='utf-8') as f:
-                attack_data = yaml.safe_load(f)
-                if self.is_valid_attack_structure(attack_data):
-                    # Add filename and file path information
-                    attack_data['filename'] = yaml_file.name
-                    attack_data['file_path'] = str(yaml_file.resolve())
-                    # Add relative path from attacks directory
-                    attacks_path = Path(self.attacks_dir).resolve()
-                    attack_data['relative_path'] = str(yaml_file.resolve().relative_to(attacks_path))
-                    return attack_data
-                print(f'Invalid structure in {yaml_file.name}')
-                return None
+                attack_data = yaml.load(f, Loader=SafeLoader)
+                return self.build_attack(attack_data, yaml_file)
         except Exception as e:
             print(f'Failed to load {yaml_file.name}: {e}')
             return None
 
     def find_yaml_files(self):
         attacks_path = Path(self.attacks_dir)
-        # Use recursive glob to find YAML files in all subdirectories
-        return list(attacks_path.glob('**/*.yaml'))
+        # Use recursive glob to find YAML files in all subdirectories; a use case that keeps its attacks
+        # next to its prompt_to_test.yaml (all_attacks) must not load that config as an attack
+        config_path = attacks_path / 'prompt_to_test.yaml'
+        return [yaml_file for yaml_file in attacks_path.glob('**/*.yaml') if yaml_file != config_path]
+
+    def load_yaml_attacks(self, selector=None):
+        if self.use_index:
+            try:
+                index = AttackIndex(self)
+            except sqlite3.OperationalError as e:
+                print(f'Attack index unavailable ({e}), loading YAML files directly')
+            else:
+                try:
+                    return index.load_attacks(selector)
+                finally:
+                    index.close()
 
-    def load_yaml_attacks(self):
         yaml_files = self.find_yaml_files()
         print(f'Found {len(yaml_files)} YAML files')
+        if selector and not selector.is_empty:
+            # Skip files that cannot be selected before parsing them
+            attacks_path = Path(self.attacks_dir)
+            yaml_files = [yaml_file for yaml_file in yaml_files if selector.matches_path(str(yaml_file.relative_to(attacks_path)))]
 
         attacks = []
         for yaml_file in yaml_files:
             attack = self.load_attack_from_file(yaml_file)
-            if attack:
+            if attack and (not selector or selector.matches(attack)):
                 attacks.append(attack)
 
         print(f'Loaded {len(attacks)} valid attacks')
@@ -0,0 +1,72 @@
+from fnmatch import fnmatchcase
+from typing import Any, Dict, List, Optional
+
+FIELD_ALIASES = {
+    'type': 'type',
+    'taxonomy': 'prompt_taxonomy',
+    'prompt_taxonomy': 'prompt_taxonomy',
+    'language': 'language',
+    'source': 'source',
+    'path': 'relative_path',
+}
+
+
+def parse_terms(terms: Optional[List[str]]) -> Dict[str, List[str]]:
+    """Parse ['taxonomy=jailbreak,language=en', ...] into {'prompt_taxonomy': ['jailbreak'], 'language': ['en']}."""
+    criteria = {}
+    for term in terms or []:
+        for condition in term.split(','):
+            if not condition.strip():
+                continue
+            key, separator, pattern = condition.partition('=')
+            field = FIELD_ALIASES.get(key.strip().lower())
+            if not separator or field is None or not pattern.strip():
+                raise ValueError(
+                    f"Invalid selection '{condition}'. Expected <field>=<pattern> with field one of: {', '.join(FIELD_ALIASES)}"
+                )
+            criteria.setdefault(field, []).append(pattern.strip())
+    return criteria
+
+
+def _matches_any(field: str, value: Any, patterns: List[str]) -> bool:
+    if value is None:
+        return False
+    value = str(value).replace('\\', '/').lower()
+    candidates = [value]
+    if field == 'relative_path' and value.endswith('.yaml'):
+        # Allow `path=injection/base64` as well as `path=injection/base64.yaml`
+        candidates.append(value[: -len('.yaml')])
+    return any(fnmatchcase(candidate, pattern.lower()) for candidate in candidates for pattern in patterns)
+
+
+class AttackSelector:
+    """Chooses a subset of attacks from --select / --exclude terms.
+
+    Patterns are case-insensitive shell globs. An attack is selected when every selected field
+    matches one of its patterns, and dropped when any exclude pattern matches. Only fields kept
+    as attack index columns can be selected on, so a selection never needs the full YAML data.
+    """
+
+    def __init__(self, select: Optional[Dict[str, List[str]]] = None, exclude: Optional[Dict[str, List[str]]] = None) -> None:
+        self.select = select or {}
+        self.exclude = exclude or {}
+
+    @classmethod
+    def parse(cls, select_terms: Optional[List[str]] = None, exclude_terms: Optional[List[str]] = None) -> 'AttackSelector':
+        return cls(parse_terms(select_terms), parse_terms(exclude_terms))
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.select and not self.exclude
+
+    def matches_path(self, relative_path: str) -> bool:
+        """Decide what can be decided from the path alone, so unrelated files need not be parsed."""
+        if 'relative_path' in self.select and not _matches_any('relative_path', relative_path, self.select['relative_path']):
+            return False
+        return not _matches_any('relative_path', relative_path, self.exclude.get('relative_path', []))
+
+    def matches(self, attack: Dict[str, Any]) -> bool:
+        for field, patterns in self.select.items():
+            if not _matches_any(field, attack.get(field), patterns):
+                return False
+        return not any(_matches_any(field, attack.get(field), patterns) for field, patterns in self.exclude.items())
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from detection_engine import compile_indicators
+from helpers.model_payloads import build_model_input, check_supported_model, extract_output_text
+from runner import Runner, build_defended_message
+
+
+def make_record_id(relative_path: str, iteration: int) -> str:
+    """Stable 11-character record id for one (attack, iteration) pair."""
+    return hashlib.sha1(f'{relative_path}#{iteration}'.encode('utf-8')).hexdigest()[:11]
+
+
+def manifest_path_for(input_path: str) -> Path:
+    return Path(f'{input_path}.manifest.json')
+
+
+def default_manifest_path_for_output(output_path: str) -> Path:
+    # Bedrock names the output file after the input file, with an extra `.out` suffix
+    input_path = output_path[: -len('.out')] if output_path.endswith('.out') else output_path
+    return manifest_path_for(input_path)
+
+
+class BatchRequestExporter:
+    """Expands attacks x iterations into a Bedrock batch inference input file.
+
+    A manifest is written next to the JSONL file, mapping every record id back to its
+    attack so the output can be ingested without reloading the corpus.
+    """
+
+    def __init__(self, iterations: int = 3) -> None:
+        self.iterations = iterations
+
+    def export(
+        self,
+        input_path: str,
+        system_prompt: str,
+        pre_user_message: str,
+        post_user_message: str,
+        attacks_list: List[Dict[str, Any]],
+        model_id: str,
+    ) -> int:
+        # Checked before anything is written, so an unsupported model leaves no partial input file behind
+        check_supported_model(model_id)
+        manifest = {'model_id': model_id, 'iterations': self.iterations, 'attacks': []}
+        record_ids = set()
+
+        Path(input_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(input_path, 'w', encoding='utf-8') as f:
+            for attack in attacks_list:
+                relative_path = attack.get('relative_path', attack.get('file_path', attack['name']))
+                defended_message = build_defended_message(pre_user_message, attack['prompt'], post_user_message)
+                model_input = build_model_input(model_id, system_prompt, defended_message, attack.get('image_path'))
+
+                attack_records = []
+                for iteration in range(self.iterations):
+                    record_id = make_record_id(relative_path, iteration)
+                    if record_id in record_ids:
+                        raise ValueError(f'Duplicate batch record id {record_id} for {relative_path}')
+                    record_ids.add(record_id)
+                    attack_records.append(record_id)
+                    f.write(json.dumps({'recordId': record_id, 'modelInput': model_input}) + '\n')
+
+                manifest['attacks'].append(
+                    {
+                        'relative_path': relative_path,
+                        'name': attack['name'],
+                        'payload': attack['payload'],
+                        'payloads': attack.get('payloads'),
+                        'payload_patterns': attack.get('payload_patterns'),
+                        'type': attack.get('type'),
+                        'prompt_taxonomy': attack.get('prompt_taxonomy'),
+                        'image_path': attack.get('image_path'),
+                        'record_ids': attack_records,
+                    }
+                )
+
+        with open(manifest_path_for(input_path), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        return len(record_ids)
+
+
+class BatchResultIngestor:
+    """Scores a batch inference output file and aggregates it into the same stats as Runner."""
+
+    def __init__(self, detector: Any, formatter: Any) -> None:
+        self.detector = detector
+        self.formatter = formatter
+
+    def read_outputs(self, output_path: str) -> Dict[str, str]:
+        responses = {}
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if 'modelOutput' not in record:
+                    print(f'Record {record.get("recordId")} failed: {record.get("error", "no model output")}')
+                    continue
+                responses[record['recordId']] = extract_output_text(record['modelOutput'])
+        return responses
+
+    def ingest(self, output_path: str, manifest_path: str) -> Dict[str, Any]:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        responses = self.read_outputs(output_path)
+
+        iteration_results_per_attack = []
+        for attack in manifest['attacks']:
+            indicators = compile_indicators(attack)
+            iteration_results = []
+            for iteration, record_id in enumerate(attack['record_ids'], 1):
+                if record_id not in responses:
+                    continue
+                detection_result = self.detector.evaluate_response(responses[record_id], indicators)
+                iteration_results.append({'iteration': iteration, **detection_result})
+            iteration_results_per_attack.append(iteration_results)
+
+        missing = sum(len(attack['record_ids']) for attack in manifest['attacks']) - len(responses)
+        if missing > 0:
+            print(f'Warning: {missing} batch records have no model output and are not counted')
+
+        runner = Runner(self.detector, self.formatter, manifest['iterations'])
+        stats = runner.collect_results(manifest['attacks'], iteration_results_per_attack)
+        stats['model_id'] = manifest['model_id']
+        return stats
+
+
+class LocalBatchService:
+    """Directory-based stand-in for Bedrock batch inference.
+
+    Jobs live under `root_dir/<job_id>/` with the input file, a status file and an
+    `output/<input name>.out` file in the same JSONL format Bedrock writes to S3.
+    `respond(model_id, model_input)` plays the model and returns an InvokeModel response body.
+    """
+
+    def __init__(self, root_dir: str, respond: Callable[[str, Dict[str, Any]], Dict[str, Any]]) -> None:
+        self.root_dir = Path(root_dir)
+        self.respond = respond
+
+    def _job_dir(self, job_id: str) -> Path:
+        return self.root_dir / job_id
+
+    def _write_status(self, job_id: str, status: Dict[str, Any]) -> None:
+        with open(self._job_dir(job_id) / 'status.json', 'w', encoding='utf-8') as f:
+            json.dump(status, f)
+
+    def create_job(self, input_path: str, model_id: str) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self._job_dir(job_id)
+        (job_dir / 'output').mkdir(parents=True)
+        shutil.copy(input_path, job_dir / Path(input_path).name)
+        self._write_status(job_id, {'status': 'Submitted', 'model_id': model_id, 'input_file': Path(input_path).name})
+        return job_id
+
+    def get_status(self, job_id: str) -> Dict[str, Any]:
+        with open(self._job_dir(job_id) / 'status.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def get_output_path(self, job_id: str) -> Path:
+        return self._job_dir(job_id) / 'output' / f'{self.get_status(job_id)["input_file"]}.out'
+
+    def run_job(self, job_id: str) -> None:
+        status = self.get_status(job_id)
+        input_path = self._job_dir(job_id) / status['input_file']
+
+        with open(input_path, 'r', encoding='utf-8') as source, open(self.get_output_path(job_id), 'w', encoding='utf-8') as target:
+            for line in source:
+                record = json.loads(line)
+                try:
+                    record['modelOutput'] = self.respond(status['model_id'], record['modelInput'])
+                except Exception as e:
+                    record['error'] = {'errorMessage': str(e)}
+                target.write(json.dumps(record) + '\n')
+
+        self._write_status(job_id, {**status, 'status': 'Completed'})
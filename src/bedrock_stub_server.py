@@ -0,0 +1,289 @@
+"""Local stand-in for the Bedrock runtime API, for offline end-to-end and performance tests.
+
+Speaks enough of the Converse, ConverseStream, InvokeModel and InvokeModelWithResponseStream
+wire formats for the clients in helpers/. Responses, latency and throttling come from a
+FakeLLMClient. Requests are not authenticated, so any credentials work.
+
+    uv run python src/bedrock_stub_server.py --port 8599 --latency-ms 300 --throttle-rate 0.05
+    AWS_ENDPOINT_URL_BEDROCK_RUNTIME=http://127.0.0.1:8599 AWS_PROFILE= \\
+        AWS_ACCESS_KEY_ID=test AWS_SECRET_ACCESS_KEY=test uv run python src/main.py
+"""
+
+import argparse
+import base64
+import json
+import re
+import struct
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+
+from helpers.fake_llm_client import FakeLLMClient
+from helpers.rate_limiter import is_throttling_error
+
+ROUTE = re.compile(r'^/model/(?P<model_id>[^/]+)/(?P<operation>converse|converse-stream|invoke|invoke-with-response-stream)$')
+
+
+def encode_event(event_type: str, payload: Dict[str, Any]) -> bytes:
+    """Encode one message of the binary `application/vnd.amazon.eventstream` format."""
+    headers = b''
+    for name, value in ((':event-type', event_type), (':content-type', 'application/json'), (':message-type', 'event')):
+        encoded_name, encoded_value = name.encode('utf-8'), value.encode('utf-8')
+        # Header value type 7 is a string
+        headers += struct.pack('>B', len(encoded_name)) + encoded_name + struct.pack('>BH', 7, len(encoded_value)) + encoded_value
+    body = json.dumps(payload).encode('utf-8')
+    prelude = struct.pack('>II', 12 + len(headers) + len(body) + 4, len(headers))
+    message = prelude + struct.pack('>I', zlib.crc32(prelude)) + headers + body
+    return message + struct.pack('>I', zlib.crc32(message))
+
+
+def _text_parts(content: Any) -> List[str]:
+    if isinstance(content, str):
+        return [content]
+    return [part['text'] for part in content or [] if isinstance(part, dict) and 'text' in part]
+
+
+def extract_prompts(body: Dict[str, Any]) -> Tuple[str, str]:
+    """Return (system prompt, last user message text) from a Converse or model-native request body."""
+    system = body.get('system', '')
+    system_prompt = ' '.join(_text_parts(system))
+    user_messages = [message for message in body.get('messages', []) if message.get('role') == 'user']
+    user_prompt = ' '.join(_text_parts(user_messages[-1]['content'])) if user_messages else ''
+    return system_prompt, user_prompt
+
+
+def _converse_usage(system_prompt: str, user_prompt: str, text: str) -> Dict[str, int]:
+    input_tokens, output_tokens = (len(system_prompt) + len(user_prompt)) // 4, len(text) // 4
+    return {'inputTokens': input_tokens, 'outputTokens': output_tokens, 'totalTokens': input_tokens + output_tokens}
+
+
+class BedrockStubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive, so clients can reuse them like they do with AWS
+    protocol_version = 'HTTP/1.1'
+    server: 'BedrockStubServer'
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, error_type: str, message: str) -> None:
+        self._send_json(status, {'message': message}, {'x-amzn-ErrorType': error_type})
+
+    def _send_event_stream(self, events: Iterator[Tuple[str, Dict[str, Any]]]) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.amazon.eventstream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for event_type, payload in events:
+                message = encode_event(event_type, payload)
+                self.wfile.write(f'{len(message):x}\r\n'.encode('ascii') + message + b'\r\n')
+                self.wfile.flush()
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early, as the detector does once the verdict is known
+            self.server.count('streams_closed_early')
+            self.close_connection = True
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        route = ROUTE.match(self.path)
+        if not route:
+            self._send_error(404, 'UnknownOperationException', f'Unknown path {self.path}')
+            return
+
+        self.server.count('requests')
+        model_id, operation = unquote(route['model_id']), route['operation']
+        try:
+            request = json.loads(body or b'{}')
+        except json.JSONDecodeError as e:
+            self._send_error(400, 'ValidationException', f'Malformed request body: {e}')
+            return
+        system_prompt, user_prompt = extract_prompts(request)
+
+        try:
+            if operation == 'converse':
+                self._converse(model_id, system_prompt, user_prompt)
+            elif operation == 'invoke':
+                self._invoke(model_id, system_prompt, user_prompt)
+            elif operation == 'converse-stream':
+                self._converse_stream(model_id, system_prompt, user_prompt)
+            else:
+                self._invoke_stream(model_id, system_prompt, user_prompt)
+        except Exception as e:
+            if not is_throttling_error(e):
+                raise
+            self.server.count('throttled')
+            self._send_error(429, 'ThrottlingException', 'Too many requests, please wait before trying again.')
+
+    def _converse(self, model_id: str, system_prompt: str, user_prompt: str) -> None:
+        response = self.server.fake.invoke_model(model_id, system_prompt, user_prompt)
+        text = response['content'][0]['text']
+        self._send_json(
+            200,
+            {
+                'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+                'stopReason': 'end_turn',
+                'usage': _converse_usage(system_prompt, user_prompt, text),
+                'metrics': {'latencyMs': int(response['latency_ms'])},
+            },
+        )
+
+    def _invoke(self, model_id: str, system_prompt: str, user_prompt: str) -> None:
+        response = self.server.fake.invoke_model(model_id, system_prompt, user_prompt)
+        text = response['content'][0]['text']
+        usage = response['usage']
+        if 'anthropic' in model_id:
+            body = {
+                'id': 'msg_stub',
+                'type': 'message',
+                'role': 'assistant',
+                'model': model_id,
+                'content': [{'type': 'text', 'text': text}],
+                'stop_reason': 'end_turn',
+                'usage': usage,
+            }
+        else:
+            body = {
+                'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+                'stopReason': 'end_turn',
+                'usage': {'inputTokens': usage['input_tokens'], 'outputTokens': usage['output_tokens']},
+            }
+        self._send_json(200, body)
+
+    def _converse_stream(self, model_id: str, system_prompt: str, user_prompt: str) -> None:
+        chunks = self.server.fake.invoke_model_stream(model_id, system_prompt, user_prompt)
+        # Throttling is reported before any event is sent, like the real service
+        first_chunk = next(chunks, '')
+
+        def events():
+            text = ''
+            yield 'messageStart', {'role': 'assistant'}
+            for chunk in self._chain(first_chunk, chunks):
+                text += chunk
+                yield 'contentBlockDelta', {'contentBlockIndex': 0, 'delta': {'text': chunk}}
+            yield 'contentBlockStop', {'contentBlockIndex': 0}
+            yield 'messageStop', {'stopReason': 'end_turn'}
+            yield 'metadata', {'usage': _converse_usage(system_prompt, user_prompt, text), 'metrics': {'latencyMs': 0}}
+
+        self._send_event_stream(events())
+
+    def _invoke_stream(self, model_id: str, system_prompt: str, user_prompt: str) -> None:
+        chunks = self.server.fake.invoke_model_stream(model_id, system_prompt, user_prompt)
+        first_chunk = next(chunks, '')
+
+        def chunk_event(payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+            return 'chunk', {'bytes': base64.b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')}
+
+        def events():
+            message = {
+                'id': 'msg_stub',
+                'role': 'assistant',
+                'model': model_id,
+                'usage': {'input_tokens': (len(system_prompt) + len(user_prompt)) // 4},
+            }
+            yield chunk_event({'type': 'message_start', 'message': message})
+            yield chunk_event({'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}})
+            text = ''
+            for chunk in self._chain(first_chunk, chunks):
+                text += chunk
+                yield chunk_event({'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': chunk}})
+            yield chunk_event({'type': 'content_block_stop', 'index': 0})
+            yield chunk_event({'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'}, 'usage': {'output_tokens': len(text) // 4}})
+            yield chunk_event({'type': 'message_stop'})
+
+        self._send_event_stream(events())
+
+    @staticmethod
+    def _chain(first_chunk: str, chunks: Iterator[str]) -> Iterator[str]:
+        if first_chunk:
+            yield first_chunk
+        yield from chunks
+
+
+class BedrockStubServer(ThreadingHTTPServer):
+    """Threaded stub server. `stats` counts connections, requests, throttled requests and streams closed early."""
+
+    daemon_threads = True
+
+    def __init__(self, fake: Optional[FakeLLMClient] = None, host: str = '127.0.0.1', port: int = 0) -> None:
+        super().__init__((host, port), BedrockStubHandler)
+        self.fake = fake or FakeLLMClient()
+        self.stats = {'connections': 0, 'requests': 0, 'throttled': 0, 'streams_closed_early': 0}
+        self._stats_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def start(self) -> 'BedrockStubServer':
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, name='bedrock-stub-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'BedrockStubServer':
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Local stand-in for the Bedrock runtime API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8599)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Median response latency')
+    parser.add_argument('--latency-p95-ms', type=float, help='95th percentile latency (default: same as the median)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with ThrottlingException')
+    parser.add_argument('--compliance-rate', type=float, default=0.0, help='Fraction of responses that echo the prompt')
+    parser.add_argument('--response-chars', type=int, default=400)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeLLMClient(
+        latency_median_ms=args.latency_ms,
+        latency_p95_ms=args.latency_p95_ms,
+        throttle_rate=args.throttle_rate,
+        compliance_rate=args.compliance_rate,
+        response_chars=args.response_chars,
+        seed=args.seed,
+    )
+    server = BedrockStubServer(fake, args.host, args.port)
+    print(f'Bedrock stub listening on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,83 @@
-AWS_PROFILE = 'ideas2impact-dev'
+import os
+
+# Both can be overridden from the environment, e.g. to point the clients at bedrock_stub_server.py.
+# An unset AWS_PROFILE uses the ideas2impact-dev profile. An empty one uses the default credential chain
+# (environment variables, instance role, ...); bedrock_runtime drops it before botocore reads it.
+AWS_PROFILE = os.environ.get('AWS_PROFILE', 'ideas2impact-dev')
+BEDROCK_ENDPOINT_URL = os.environ.get('AWS_ENDPOINT_URL_BEDROCK_RUNTIME') or None
 AWS_REGION_FRANKFURT = 'eu-central-1'
+
+# botocore settings of the shared bedrock-runtime clients, overridable with `connection` in
+# prompt_to_test.yaml. The pool is never smaller than the configured concurrency.
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.environ.get('BEDROCK_MAX_POOL_CONNECTIONS', 50))
+BEDROCK_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('BEDROCK_CONNECT_TIMEOUT_SECONDS', 5))
+BEDROCK_READ_TIMEOUT_SECONDS = float(os.environ.get('BEDROCK_READ_TIMEOUT_SECONDS', 120))
+BEDROCK_TCP_KEEPALIVE = os.environ.get('BEDROCK_TCP_KEEPALIVE', 'true').lower() in ('1', 'true', 'yes')
+# Attempts include the first call. RateLimitedClient backs off on throttling as well, so botocore only retries briefly
+BEDROCK_RETRY_MODE = os.environ.get('BEDROCK_RETRY_MODE', 'adaptive')
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_MAX_ATTEMPTS', 3))
 MAX_TOKENS = 2048
 TEMPERATURE = 0.8
 TOP_K = 250
 TOP_P = 0.999
+
+# Default per-model budgets, overridable with `rate_limits` in prompt_to_test.yaml
+REQUESTS_PER_MINUTE = 100
+TOKENS_PER_MINUTE = 400_000
+RATE_LIMIT_MAX_RETRIES = 8
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 30.0
+
+# On-disk cache of model responses, see helpers/response_cache.py
+RESPONSE_CACHE_PATH = '.cache/llm_responses.sqlite'
+RESPONSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+RESPONSE_CACHE_MAX_AGE_DAYS = 30
+
+# Use cases are directories here holding a prompt_to_test.yaml; main.py --all runs every one of them
+USE_CASES_DIR = 'use_cases'
+
+# Journals of completed iterations, used to resume interrupted runs (main.py --resume)
+RUN_JOURNAL_DIR = '.runs'
+# A journal is deleted once its run completes; journals of interrupted runs are dropped after this many days
+RUN_JOURNAL_MAX_AGE_DAYS = 30
+
+# History of runs and per-attack verdicts, compared with main.py --diff, see results_store.py. The oldest
+# runs of each use case are dropped beyond RESULTS_STORE_KEEP_RUNS or RESULTS_STORE_MAX_AGE_DAYS.
+RESULTS_STORE_PATH = '.cache/results.sqlite'
+RESULTS_STORE_KEEP_RUNS = 1000
+RESULTS_STORE_MAX_AGE_DAYS = 365
+
+# Partial results of main.py --shard k/n runs, combined with --merge
+SHARD_RESULTS_DIR = 'shards'
+
+# Compiled attack index kept inside each attacks_dir, see attack_index.py
+ATTACK_INDEX_FILENAME = '.attack_index.sqlite'
+# Below this many changed files, YAML is parsed in-process instead of in a process pool
+ATTACK_INDEX_PARALLEL_THRESHOLD = 200
+
+# Streaming responses: stop reading once this many characters arrived without the payload
+STREAM_MAX_RESPONSE_CHARS = 4000
+
+# Bedrock prompt caching (`prompt_cache` in prompt_to_test.yaml). Shorter prefixes are not cached by the
+# models, so no checkpoint is sent for them. Cached tokens are billed at a fraction of the input price.
+PROMPT_CACHE_MIN_TOKENS = 1024
+CACHE_READ_PRICE_FACTOR = 0.1
+CACHE_WRITE_PRICE_FACTOR = 1.25
+
+# Approximate on-demand prices in USD per 1,000 (input, output) tokens, matched by substring of the
+# model id. Used for cost estimates only; check the Bedrock pricing page for your region.
+MODEL_PRICING_PER_1K_TOKENS = {
+    'nova-micro': (0.000035, 0.00014),
+    'nova-lite': (0.00006, 0.00024),
+    'nova-pro': (0.0008, 0.0032),
+    'claude-3-haiku': (0.00025, 0.00125),
+    'claude-3-5-haiku': (0.0008, 0.004),
+    'claude-3-5-sonnet': (0.003, 0.015),
+    'claude-3-7-sonnet': (0.003, 0.015),
+    'claude-sonnet-4': (0.003, 0.015),
+    'claude-opus-4': (0.015, 0.075),
+}
+
+# Run metrics exported with main.py --metrics-file / --metrics-push, see metrics.py
+METRICS_PREFIX = 'prompt_security'
+METRICS_LATENCY_BUCKETS_SECONDS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 60.0, 120.0)
@@ -0,0 +1,53 @@
+import math
+from statistics import NormalDist
+from typing import Any, Dict, Optional, Tuple
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Wilson score interval for a binomial success rate."""
+    if trials == 0:
+        return 0.0, 1.0
+
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    rate = successes / trials
+    denominator = 1 + z**2 / trials
+    center = (rate + z**2 / (2 * trials)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / trials + z**2 / (4 * trials**2)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class EarlyStopping:
+    """Decides when an attack has been sampled enough.
+
+    Modes:
+    - fixed: always run every iteration (default)
+    - any_breach: stop at the first successful injection
+    - wilson: stop once the Wilson interval of the success rate is entirely above or below `threshold`
+    """
+
+    MODES = ('fixed', 'any_breach', 'wilson')
+
+    def __init__(self, mode: str = 'fixed', threshold: float = 0.1, confidence: float = 0.95, min_iterations: int = 1) -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown early stopping mode '{mode}'. Expected one of: {', '.join(self.MODES)}")
+        self.mode = mode
+        self.threshold = threshold
+        self.confidence = confidence
+        self.min_iterations = min_iterations
+
+    @classmethod
+    def from_config(cls, early_stopping: Optional[Dict[str, Any]]) -> 'EarlyStopping':
+        return cls(**(early_stopping or {}))
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'fixed'
+
+    def is_decided(self, successes: int, trials: int) -> bool:
+        if not self.enabled or trials < self.min_iterations:
+            return False
+        if self.mode == 'any_breach':
+            return successes > 0
+
+        low, high = wilson_interval(successes, trials, self.confidence)
+        return low > self.threshold or high < self.threshold
@@ -1,70 +1,74 @@
-import base64
-from typing import Optional, Dict, Any
-
-import boto3
+from typing import Optional, Dict, Any, Generator
 
 from config import (
     AWS_PROFILE,
     AWS_REGION_FRANKFURT,
+    BEDROCK_ENDPOINT_URL,
     MAX_TOKENS,
+    PROMPT_CACHE_MIN_TOKENS,
     TEMPERATURE,
     TOP_K,
     TOP_P,
 )
-from helpers.llm_client import LLMClient
+from helpers.image_cache import image_cache
+from helpers.bedrock_runtime import ConnectionSettings, bedrock_runtime_clients
+from helpers.llm_client import LLMClient, ResponseStream
+
+CACHE_POINT = {'cachePoint': {'type': 'default'}}
 
 
 class BedrockConverseClient(LLMClient):
-    client: boto3.client = None
-
-    def __init__(self):
-        boto3.setup_default_session(profile_name=AWS_PROFILE)
-
-        self.client = boto3.client(service_name='bedrock-runtime', region_name=AWS_REGION_FRANKFURT)
-
-    def _encode_image(self, image_path: str) -> str:
-        """Encode image file to base64 string"""
-        with open(image_path, 'rb') as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-
-    def _get_media_type(self, image_path: str) -> str:
-        """Get media type based on file extension"""
-        extension = image_path.lower().split('.')[-1]
-        media_types = {
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'png': 'image/png',
-            'gif': 'image/gif',
-            'webp': 'image/webp',
-        }
-        return media_types.get(extension, 'image/jpeg')
+    # The pooled bedrock-runtime client; boto3 is only imported when it is created (see bedrock_runtime)
+    client: Any = None
 
-    def invoke_model(
+    def __init__(
         self,
-        model_id: str,
-        system_prompt: str,
-        user_prompt: str,
-        image_path: Optional[str] = None,
-    ) -> Dict[str, Any]:
+        endpoint_url: Optional[str] = BEDROCK_ENDPOINT_URL,
+        profile_name: Optional[str] = AWS_PROFILE,
+        connection_settings: Optional[ConnectionSettings] = None,
+        prompt_cache: Optional[Dict[str, Any]] = None,
+    ):
+        self.client = bedrock_runtime_clients.get(profile_name, AWS_REGION_FRANKFURT, endpoint_url, connection_settings)
+        # Prompt caching: `system_prompt` checkpoints the system prompt, `user_prefixes` are invariant
+        # starts of user prompts (such as the rendered pre_user_message) to checkpoint after
+        prompt_cache = prompt_cache or {}
+        self.cache_system_prompt = bool(prompt_cache.get('system_prompt'))
+        self.cache_user_prefixes = tuple(sorted(prompt_cache.get('user_prefixes') or (), key=len, reverse=True))
+        self.cache_min_tokens = prompt_cache.get('min_tokens', PROMPT_CACHE_MIN_TOKENS)
+
+    def _cached_prefix_length(self, system_prompt: str, user_prompt: str) -> int:
+        """Length of the configured prefix that starts `user_prompt` and is long enough to cache, or 0."""
+        for prefix in self.cache_user_prefixes:
+            if prefix and user_prompt.startswith(prefix) and len(prefix) < len(user_prompt):
+                # A checkpoint caches everything before it, the system prompt included
+                if (len(system_prompt or '') + len(prefix)) / 4 >= self.cache_min_tokens:
+                    return len(prefix)
+                return 0
+        return 0
+
+    def _build_request(self, model_id: str, system_prompt: str, user_prompt: str, image_path: Optional[str]) -> Dict[str, Any]:
         # Build user content with image first, then text
         user_content = []
 
         # Add image first if provided
         if image_path:
-            image_base64 = self._encode_image(image_path)
-            media_type = self._get_media_type(image_path)
+            image = image_cache.get(image_path)
 
             user_content.append(
                 {
                     'image': {
-                        'format': media_type.split('/')[-1],
-                        'source': {'bytes': base64.b64decode(image_base64)},
+                        'format': image.format,
+                        'source': {'bytes': image.data},
                     }
                 }
             )
 
-        # Add text after image
-        user_content.append({'text': user_prompt})
+        # Add text after image. An image comes first and changes per attack, so there is no invariant prefix to cache
+        prefix_length = 0 if image_path else self._cached_prefix_length(system_prompt, user_prompt)
+        if prefix_length:
+            user_content.extend([{'text': user_prompt[:prefix_length]}, CACHE_POINT, {'text': user_prompt[prefix_length:]}])
+        else:
+            user_content.append({'text': user_prompt})
 
         # Prepare messages for Converse API
         messages = [
@@ -78,6 +82,8 @@ class BedrockConverseClient(LLMClient):
         system_messages = []
         if system_prompt:
             system_messages = [{'text': system_prompt}]
+            if self.cache_system_prompt and len(system_prompt) / 4 >= self.cache_min_tokens:
+                system_messages.append(CACHE_POINT)
 
         # Configure inference parameters
         inference_config = {
@@ -92,16 +98,65 @@ class BedrockConverseClient(LLMClient):
         if 'anthropic' in model_id.lower():
             additional_model_request_fields = {'top_k': TOP_K}
 
+        return {
+            'modelId': model_id,
+            'messages': messages,
+            'system': system_messages,
+            'inferenceConfig': inference_config,
+            'additionalModelRequestFields': additional_model_request_fields,
+        }
+
+    def invoke_model(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> Dict[str, Any]:
         # Use Converse API
-        response = self.client.converse(
-            modelId=model_id,
-            messages=messages,
-            system=system_messages,
-            inferenceConfig=inference_config,
-            additionalModelRequestFields=additional_model_request_fields,
-        )
-
-        return {'content': [{'text': response['output']['message']['content'][0]['text']}]}
+        response = self.client.converse(**self._build_request(model_id, system_prompt, user_prompt, image_path))
+
+        return {
+            'content': [{'text': response['output']['message']['content'][0]['text']}],
+            **self._usage_and_latency(response),
+        }
+
+    @staticmethod
+    def _usage_and_latency(response: Dict[str, Any]) -> Dict[str, Any]:
+        # A Converse response and the `metadata` event that ends a stream report them alike
+        usage = response.get('usage', {})
+        return {
+            'usage': {
+                'input_tokens': usage.get('inputTokens'),
+                'output_tokens': usage.get('outputTokens'),
+                'cache_read_tokens': usage.get('cacheReadInputTokens'),
+                'cache_write_tokens': usage.get('cacheWriteInputTokens'),
+            },
+            'latency_ms': response.get('metrics', {}).get('latencyMs'),
+        }
+
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> ResponseStream:
+        return ResponseStream(self._stream(self._build_request(model_id, system_prompt, user_prompt, image_path)))
+
+    def _stream(self, request: Dict[str, Any]) -> Generator[str, None, Optional[Dict[str, Any]]]:
+        stream = self.client.converse_stream(**request)['stream']
+        metadata = {}
+        try:
+            for event in stream:
+                text = event.get('contentBlockDelta', {}).get('delta', {}).get('text')
+                if text:
+                    yield text
+                metadata = event.get('metadata', metadata)
+        finally:
+            # Closing the connection early stops the model from generating the rest of the response
+            stream.close()
+        return self._usage_and_latency(metadata) if metadata else None
 
     def get_client_type(self) -> str:
         return 'Bedrock Converse API'
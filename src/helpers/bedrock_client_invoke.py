@@ -1,51 +1,26 @@
-import base64
 import json
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Dict, Generator, Optional
 
-import boto3
-
-from config import (
-    AWS_PROFILE,
-    AWS_REGION_FRANKFURT,
-    MAX_TOKENS,
-    TEMPERATURE,
-    TOP_K,
-    TOP_P,
-)
-from helpers.llm_client import LLMClient
+from config import AWS_PROFILE, AWS_REGION_FRANKFURT, BEDROCK_ENDPOINT_URL
+from helpers.bedrock_runtime import ConnectionSettings, bedrock_runtime_clients
+from helpers.llm_client import LLMClient, ResponseStream
+from helpers.model_payloads import build_anthropic_body
 
 
 class BedrockInvokeClient(LLMClient):
-    client: boto3.client = None
-
-    def __init__(self):
-        boto3.setup_default_session(profile_name=AWS_PROFILE)
-        self.client = boto3.client(service_name='bedrock-runtime', region_name=AWS_REGION_FRANKFURT)
-
-    def _encode_image(self, image_path: str) -> str:
-        """Encode image file to base64 string"""
-        with open(image_path, 'rb') as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+    # The pooled bedrock-runtime client; boto3 is only imported when it is created (see bedrock_runtime)
+    client: Any = None
 
-    def _get_media_type(self, image_path: str) -> str:
-        """Get media type based on file extension"""
-        extension = image_path.lower().split('.')[-1]
-        media_types = {
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'png': 'image/png',
-            'gif': 'image/gif',
-            'webp': 'image/webp',
-        }
-        return media_types.get(extension, 'image/jpeg')
-
-    def invoke_model(
+    def __init__(
         self,
-        model_id: str,
-        system_prompt: str,
-        user_prompt: str,
-        image_path: Optional[str] = None,
-    ) -> Dict[str, Any]:
+        endpoint_url: Optional[str] = BEDROCK_ENDPOINT_URL,
+        profile_name: Optional[str] = AWS_PROFILE,
+        connection_settings: Optional[ConnectionSettings] = None,
+    ):
+        self.client = bedrock_runtime_clients.get(profile_name, AWS_REGION_FRANKFURT, endpoint_url, connection_settings)
+
+    def _check_supported_model(self, model_id: str) -> None:
         # Validate that the model is supported by this client
         if 'anthropic' not in model_id.lower():
             raise ValueError(
@@ -54,53 +29,21 @@ class BedrockInvokeClient(LLMClient):
                 f'Use BedrockConverseClient for other model families.'
             )
 
-        # Build user content with image first, then text
-        user_content = []
-
-        # Add image first if provided
-        if image_path:
-            image_base64 = self._encode_image(image_path)
-            media_type = self._get_media_type(image_path)
-
-            user_content.append(
-                {
-                    'type': 'image',
-                    'source': {
-                        'type': 'base64',
-                        'media_type': media_type,
-                        'data': image_base64,
-                    },
-                }
-            )
-
-        # Add text after image
-        user_content.append({'type': 'text', 'text': user_prompt})
+    def invoke_model(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        self._check_supported_model(model_id)
 
-        body = json.dumps(
-            {
-                'system': system_prompt,
-                'anthropic_version': 'bedrock-2023-05-31',
-                'max_tokens': MAX_TOKENS,
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': user_content,
-                    },
-                    {
-                        'role': 'assistant',
-                        'content': '',
-                    },
-                ],
-                'temperature': TEMPERATURE,
-                'top_k': TOP_K,
-                'top_p': TOP_P,
-                'stop_sequences': ['\n\nHuman:', '\n\nAssistant', '</function_calls>'],
-            }
-        )
+        body = json.dumps(build_anthropic_body(system_prompt, user_prompt, image_path))
 
         accept = 'application/json'
         content_type = 'application/json'
 
+        start = time.perf_counter()
         response = self.client.invoke_model(
             modelId=model_id,
             body=body,
@@ -109,7 +52,46 @@ class BedrockInvokeClient(LLMClient):
         )
 
         completion = json.loads(response.get('body').read())
+        # The Anthropic body already carries `usage`; InvokeModel reports no latency, so measure it
+        completion['latency_ms'] = (time.perf_counter() - start) * 1000
         return completion
 
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> ResponseStream:
+        return ResponseStream(self._stream(model_id, system_prompt, user_prompt, image_path))
+
+    def _stream(
+        self, model_id: str, system_prompt: str, user_prompt: str, image_path: Optional[str]
+    ) -> Generator[str, None, Optional[Dict[str, Any]]]:
+        self._check_supported_model(model_id)
+
+        response = self.client.invoke_model_with_response_stream(
+            modelId=model_id,
+            body=json.dumps(build_anthropic_body(system_prompt, user_prompt, image_path)),
+            accept='application/json',
+            contentType='application/json',
+        )
+        stream = response['body']
+        # Input tokens arrive with message_start, output tokens with message_delta; latency is measured by the stream
+        usage = {}
+        try:
+            for event in stream:
+                chunk = json.loads(event['chunk']['bytes']) if 'chunk' in event else {}
+                if chunk.get('type') == 'content_block_delta' and chunk['delta'].get('text'):
+                    yield chunk['delta']['text']
+                elif chunk.get('type') == 'message_start':
+                    usage.update(chunk['message'].get('usage') or {})
+                elif chunk.get('type') == 'message_delta':
+                    usage.update(chunk.get('usage') or {})
+        finally:
+            # Closing the connection early stops the model from generating the rest of the response
+            stream.close()
+        return {'usage': usage} if usage else None
+
     def get_client_type(self) -> str:
         return 'Bedrock Invoke API'
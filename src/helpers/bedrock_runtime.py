@@ -0,0 +1,93 @@
+import os
+import threading
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional, Tuple
+
+from config import (
+    BEDROCK_CONNECT_TIMEOUT_SECONDS,
+    BEDROCK_MAX_ATTEMPTS,
+    BEDROCK_MAX_POOL_CONNECTIONS,
+    BEDROCK_READ_TIMEOUT_SECONDS,
+    BEDROCK_RETRY_MODE,
+    BEDROCK_TCP_KEEPALIVE,
+)
+
+
+@dataclass(frozen=True)
+class ConnectionSettings:
+    max_pool_connections: int = BEDROCK_MAX_POOL_CONNECTIONS
+    connect_timeout: float = BEDROCK_CONNECT_TIMEOUT_SECONDS
+    read_timeout: float = BEDROCK_READ_TIMEOUT_SECONDS
+    tcp_keepalive: bool = BEDROCK_TCP_KEEPALIVE
+    retry_mode: str = BEDROCK_RETRY_MODE
+    max_attempts: int = BEDROCK_MAX_ATTEMPTS
+
+    @classmethod
+    def from_config(cls, connection: Optional[Dict[str, Any]], concurrency: int = 1) -> 'ConnectionSettings':
+        """Build settings from the `connection` section of prompt_to_test.yaml, sizing the pool for `concurrency`."""
+        connection = dict(connection or {})
+        unknown = set(connection) - {field.name for field in fields(cls)}
+        if unknown:
+            raise ValueError(f'Unknown connection settings: {", ".join(sorted(unknown))}')
+        if 'max_pool_connections' not in connection:
+            connection['max_pool_connections'] = max(BEDROCK_MAX_POOL_CONNECTIONS, concurrency)
+        return cls(**connection)
+
+    def to_botocore_config(self) -> Any:
+        # Imported here so reading settings, --list and --dry-run never load botocore
+        from botocore.config import Config
+
+        return Config(
+            max_pool_connections=self.max_pool_connections,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            tcp_keepalive=self.tcp_keepalive,
+            retries={'mode': self.retry_mode, 'total_max_attempts': self.max_attempts},
+        )
+
+
+class BedrockRuntimeClients:
+    """Process-wide bedrock-runtime clients, one per profile, region, endpoint and connection settings.
+
+    botocore clients are thread-safe once created, so every Bedrock client and worker thread
+    shares one connection pool instead of paying its own TLS handshakes. Creating them is not,
+    hence the lock.
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[Tuple[Any, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        profile_name: Optional[str],
+        region_name: str,
+        endpoint_url: Optional[str] = None,
+        settings: Optional[ConnectionSettings] = None,
+    ) -> Any:
+        settings = settings or ConnectionSettings()
+        key = (profile_name or None, region_name, endpoint_url, settings)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                import boto3
+
+                if not profile_name and os.environ.get('AWS_PROFILE') == '':
+                    # botocore reads AWS_PROFILE itself and fails on an empty one, so drop it to use the default credential chain
+                    del os.environ['AWS_PROFILE']
+                session = boto3.Session(profile_name=profile_name or None)
+                client = session.client(
+                    service_name='bedrock-runtime',
+                    region_name=region_name,
+                    endpoint_url=endpoint_url,
+                    config=settings.to_botocore_config(),
+                )
+                self._clients[key] = client
+            return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+
+bedrock_runtime_clients = BedrockRuntimeClients()
@@ -0,0 +1,124 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Generator, Optional
+
+from helpers.llm_client import LLMClient, ResponseStream
+from helpers.rate_limiter import ThrottlingError
+
+FILLER = 'I am sorry, but I cannot help with that request. As an AI assistant I follow my instructions. '
+
+
+class FakeLLMClient(LLMClient):
+    """Deterministic stand-in for a model, for benchmarks and offline runs.
+
+    Latency follows a log-normal distribution given by its median and p95. A fraction of calls
+    raise ThrottlingError, and a fraction "comply" by echoing the user prompt, so payloads that
+    appear in the attack show up in the response. Every random choice is derived from the seed,
+    the request and how many times that request was made, so results do not depend on thread
+    scheduling.
+    """
+
+    def __init__(
+        self,
+        latency_median_ms: float = 0.0,
+        latency_p95_ms: Optional[float] = None,
+        throttle_rate: float = 0.0,
+        compliance_rate: float = 0.0,
+        response_chars: int = 400,
+        stream_chunk_chars: int = 40,
+        seed: int = 0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.latency_median_ms = latency_median_ms
+        # sigma of the log-normal so that exp(mu + 1.645 sigma) is the p95
+        p95 = latency_p95_ms if latency_p95_ms is not None else latency_median_ms
+        self.latency_sigma = math.log(p95 / latency_median_ms) / 1.645 if latency_median_ms > 0 and p95 > latency_median_ms else 0.0
+        self.throttle_rate = throttle_rate
+        self.compliance_rate = compliance_rate
+        self.response_chars = response_chars
+        self.stream_chunk_chars = stream_chunk_chars
+        self.seed = seed
+        self.sleep = sleep
+        self.calls = 0
+        self.throttles = 0
+        self._occurrences = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _random_for(self, model_id: str, system_prompt: str, user_prompt: str) -> random.Random:
+        request = f'{self.seed}\0{model_id}\0{system_prompt}\0{user_prompt}'
+        with self._lock:
+            occurrence = self._occurrences[request]
+            self._occurrences[request] += 1
+            self.calls += 1
+        digest = hashlib.sha256(f'{request}\0{occurrence}'.encode('utf-8')).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    def _latency_ms(self, rng: random.Random) -> float:
+        if self.latency_median_ms <= 0:
+            return 0.0
+        return self.latency_median_ms * math.exp(self.latency_sigma * rng.gauss(0, 1))
+
+    def _response_text(self, rng: random.Random, user_prompt: str) -> str:
+        text = user_prompt.strip() if rng.random() < self.compliance_rate else ''
+        filler = FILLER * (self.response_chars // len(FILLER) + 1)
+        return (f'{text} {filler}' if text else filler)[: max(self.response_chars, len(text))]
+
+    def _start_call(self, model_id: str, system_prompt: str, user_prompt: str) -> random.Random:
+        rng = self._random_for(model_id, system_prompt, user_prompt)
+        if rng.random() < self.throttle_rate:
+            with self._lock:
+                self.throttles += 1
+            raise ThrottlingError(f'Simulated throttling for {model_id}')
+        return rng
+
+    def invoke_model(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        rng = self._start_call(model_id, system_prompt, user_prompt)
+        latency_ms = self._latency_ms(rng)
+        if latency_ms:
+            self.sleep(latency_ms / 1000)
+        text = self._response_text(rng, user_prompt)
+
+        return {'content': [{'text': text}], 'usage': self._usage(system_prompt, user_prompt, text), 'latency_ms': latency_ms}
+
+    @staticmethod
+    def _usage(system_prompt: str, user_prompt: str, text: str) -> Dict[str, int]:
+        return {'input_tokens': (len(system_prompt) + len(user_prompt)) // 4, 'output_tokens': len(text) // 4}
+
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> ResponseStream:
+        """The simulated latency is spread evenly over the chunks, so closing the stream early saves time."""
+        return ResponseStream(self._stream(model_id, system_prompt, user_prompt))
+
+    def _stream(self, model_id: str, system_prompt: str, user_prompt: str) -> Generator[str, None, Dict[str, Any]]:
+        rng = self._start_call(model_id, system_prompt, user_prompt)
+        latency_ms = self._latency_ms(rng)
+        text = self._response_text(rng, user_prompt)
+        chunks = [text[i : i + self.stream_chunk_chars] for i in range(0, len(text), self.stream_chunk_chars)] or ['']
+
+        for chunk in chunks:
+            if latency_ms:
+                self.sleep(latency_ms / len(chunks) / 1000)
+            yield chunk
+        return {'usage': self._usage(system_prompt, user_prompt, text), 'latency_ms': latency_ms}
+
+    def get_client_type(self) -> str:
+        return 'Fake LLM Client'
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'fake_calls': self.calls, 'fake_throttles': self.throttles}
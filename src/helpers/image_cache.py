@@ -0,0 +1,74 @@
+import base64
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+MEDIA_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+
+def get_media_type(image_path: str) -> str:
+    """Get media type based on file extension"""
+    extension = image_path.lower().split('.')[-1]
+    return MEDIA_TYPES.get(extension, 'image/jpeg')
+
+
+@dataclass(frozen=True)
+class ImagePayload:
+    data: bytes
+    base64: str
+    sha256: str
+    media_type: str
+
+    @property
+    def format(self) -> str:
+        return self.media_type.split('/')[-1]
+
+
+class ImageCache:
+    """Process-wide cache of image bytes and their base64 form.
+
+    Paths are re-read only when their mtime or size changes, and files with identical
+    content share a single payload.
+    """
+
+    def __init__(self) -> None:
+        self._paths: Dict[str, Tuple[int, int, str, str]] = {}
+        self._payloads: Dict[Tuple[str, str], ImagePayload] = {}
+        self._lock = threading.Lock()
+
+    def get(self, image_path: str) -> ImagePayload:
+        path = os.path.abspath(image_path)
+        stat = os.stat(path)
+
+        with self._lock:
+            entry = self._paths.get(path)
+            if entry and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                return self._payloads[entry[2:]]
+
+        with open(path, 'rb') as image_file:
+            data = image_file.read()
+        payload_key = (hashlib.sha256(data).hexdigest(), get_media_type(path))
+
+        with self._lock:
+            payload = self._payloads.get(payload_key)
+            if payload is None:
+                payload = ImagePayload(data, base64.b64encode(data).decode('utf-8'), *payload_key)
+                self._payloads[payload_key] = payload
+            self._paths[path] = (stat.st_mtime_ns, stat.st_size, *payload_key)
+        return payload
+
+    def clear(self) -> None:
+        with self._lock:
+            self._paths.clear()
+            self._payloads.clear()
+
+
+image_cache = ImageCache()
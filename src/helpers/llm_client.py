@@ -1,5 +1,54 @@
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Optional
+
+
+class ResponseStream:
+    """The text chunks of a streamed response, and the usage and latency of the model call behind it.
+
+    `chunks` may return a dict with `usage` and `latency_ms`, like the response of `invoke_model`, once it is
+    read to the end. A stream closed early has no usage, as models report it last, and its latency is measured
+    from the first read. Without a `model_call`, such as a cached response, both stay None.
+    """
+
+    def __init__(self, chunks: Iterable[str], model_call: bool = True) -> None:
+        self._chunks = iter(chunks)
+        self.model_call = model_call
+        self.usage: Optional[Dict[str, Any]] = None
+        self.latency_ms: Optional[float] = None
+        self._start: Optional[float] = None
+        self._finished = False
+
+    @property
+    def response(self) -> Dict[str, Any]:
+        return {'usage': self.usage, 'latency_ms': self.latency_ms}
+
+    def __iter__(self) -> 'ResponseStream':
+        return self
+
+    def __next__(self) -> str:
+        if self._start is None:
+            self._start = time.perf_counter()
+        try:
+            return next(self._chunks)
+        except StopIteration as stop:
+            self._finish(stop.value or {})
+            raise
+
+    def close(self) -> None:
+        """Stop reading the response."""
+        if hasattr(self._chunks, 'close'):
+            self._chunks.close()
+        self._finish({})
+
+    def _finish(self, response: Dict[str, Any]) -> None:
+        if self._finished or not self.model_call:
+            return
+        self._finished = True
+        self.usage = response.get('usage')
+        self.latency_ms = response.get('latency_ms')
+        if self.latency_ms is None and self._start is not None:
+            self.latency_ms = (time.perf_counter() - self._start) * 1000
 
 
 class LLMClient(ABC):
@@ -13,6 +62,29 @@ class LLMClient(ABC):
     ) -> Dict[str, Any]:
         pass
 
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> ResponseStream:
+        """Stream the response text as it is generated. Closing the stream stops reading the response.
+
+        Clients without a streaming API yield the whole response as one chunk.
+        """
+
+        def chunks():
+            response = self.invoke_model(model_id, system_prompt, user_prompt, image_path)
+            yield response.get('content')[0]['text']
+            return response
+
+        return ResponseStream(chunks())
+
     @abstractmethod
     def get_client_type(self) -> str:
         pass
+
+    def get_stats(self) -> Dict[str, int]:
+        """Counters collected by this client during the run (throttles, retries, ...)."""
+        return {}
@@ -1,11 +1,43 @@
+import importlib
+from typing import Any, Dict, Optional, Tuple
+
+from helpers.bedrock_runtime import ConnectionSettings
 from helpers.llm_client import LLMClient
-from helpers.bedrock_client_invoke import BedrockInvokeClient
-from helpers.bedrock_client_converse import BedrockConverseClient
 
+# name -> (module, class, constructor options it accepts). Modules are only imported when their
+# client is created, so commands that never call a model do not load boto3.
+LLM_CLIENT_PROVIDERS: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    'converse': ('helpers.bedrock_client_converse', 'BedrockConverseClient', ('connection_settings', 'prompt_cache')),
+    'invoke': ('helpers.bedrock_client_invoke', 'BedrockInvokeClient', ('connection_settings',)),
+    'fake': ('helpers.fake_llm_client', 'FakeLLMClient', ()),
+}
+
+
+def register_llm_client(name: str, module: str, class_name: str, options: Tuple[str, ...] = ()) -> None:
+    LLM_CLIENT_PROVIDERS[name] = (module, class_name, options)
+
+
+def supports_option(client_type: str, name: str) -> bool:
+    return name in LLM_CLIENT_PROVIDERS[client_type][2]
+
+
+def create_llm_client(
+    client_type: str,
+    connection_settings: Optional[ConnectionSettings] = None,
+    prompt_cache: Optional[Dict[str, Any]] = None,
+) -> LLMClient:
+    """Bedrock clients of the same profile, endpoint and settings share one pooled bedrock-runtime client.
+
+    `connection_settings` always has defaults, so clients without a connection pool drop it silently.
+    An explicitly requested `prompt_cache` the client cannot use is reported.
+    """
+    if client_type not in LLM_CLIENT_PROVIDERS:
+        raise ValueError(f'Unknown client type: {client_type}')
+
+    module, class_name, accepted_options = LLM_CLIENT_PROVIDERS[client_type]
+    options = {'connection_settings': connection_settings, 'prompt_cache': prompt_cache}
+    if prompt_cache and 'prompt_cache' not in accepted_options:
+        print(f'The {client_type} client does not support prompt_cache, ignoring it')
 
-def create_llm_client(client_type: str) -> LLMClient:
-    if client_type == 'invoke':
-        return BedrockInvokeClient()
-    elif client_type == 'converse':
-        return BedrockConverseClient()
-    raise ValueError(f'Unknown client type: {client_type}')
+    client_class = getattr(importlib.import_module(module), class_name)
+    return client_class(**{name: value for name, value in options.items() if name in accepted_options})
@@ -0,0 +1,93 @@
+from typing import Any, Dict, Optional
+
+from config import MAX_TOKENS, TEMPERATURE, TOP_K, TOP_P
+from helpers.image_cache import image_cache
+
+STOP_SEQUENCES = ['\n\nHuman:', '\n\nAssistant', '</function_calls>']
+
+
+def build_anthropic_body(system_prompt: str, user_prompt: str, image_path: Optional[str] = None) -> Dict[str, Any]:
+    """InvokeModel request body for Anthropic models (Messages API)"""
+    # Build user content with image first, then text
+    user_content = []
+
+    if image_path:
+        image = image_cache.get(image_path)
+
+        user_content.append(
+            {
+                'type': 'image',
+                'source': {
+                    'type': 'base64',
+                    'media_type': image.media_type,
+                    'data': image.base64,
+                },
+            }
+        )
+
+    user_content.append({'type': 'text', 'text': user_prompt})
+
+    return {
+        'system': system_prompt,
+        'anthropic_version': 'bedrock-2023-05-31',
+        'max_tokens': MAX_TOKENS,
+        'messages': [
+            {
+                'role': 'user',
+                'content': user_content,
+            },
+            {
+                'role': 'assistant',
+                'content': '',
+            },
+        ],
+        'temperature': TEMPERATURE,
+        'top_k': TOP_K,
+        'top_p': TOP_P,
+        'stop_sequences': STOP_SEQUENCES,
+    }
+
+
+def build_nova_body(system_prompt: str, user_prompt: str, image_path: Optional[str] = None) -> Dict[str, Any]:
+    """InvokeModel request body for Amazon Nova models (messages-v1 schema)"""
+    user_content = []
+
+    if image_path:
+        image = image_cache.get(image_path)
+        user_content.append({'image': {'format': image.format, 'source': {'bytes': image.base64}}})
+
+    user_content.append({'text': user_prompt})
+
+    body = {
+        'schemaVersion': 'messages-v1',
+        'messages': [{'role': 'user', 'content': user_content}],
+        'inferenceConfig': {
+            'maxTokens': MAX_TOKENS,
+            'temperature': TEMPERATURE,
+            'topP': TOP_P,
+            'stopSequences': STOP_SEQUENCES,
+        },
+    }
+    if system_prompt:
+        body['system'] = [{'text': system_prompt}]
+    return body
+
+
+def check_supported_model(model_id: str) -> None:
+    """Raise ValueError for a model that `build_model_input` has no request format for."""
+    if not any(family in model_id.lower() for family in ('anthropic', 'nova')):
+        raise ValueError(f"No InvokeModel request format for model '{model_id}'. Supported model families: Anthropic, Amazon Nova.")
+
+
+def build_model_input(model_id: str, system_prompt: str, user_prompt: str, image_path: Optional[str] = None) -> Dict[str, Any]:
+    check_supported_model(model_id)
+    if 'anthropic' in model_id.lower():
+        return build_anthropic_body(system_prompt, user_prompt, image_path)
+    return build_nova_body(system_prompt, user_prompt, image_path)
+
+
+def extract_output_text(model_output: Dict[str, Any]) -> str:
+    """Response text from an InvokeModel response body (Anthropic or Nova)"""
+    if 'content' in model_output:
+        return ''.join(block.get('text', '') for block in model_output['content'])
+    return ''.join(block.get('text', '') for block in model_output['output']['message']['content'])
@@ -0,0 +1,268 @@
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Generator, Optional
+
+from config import (
+    MAX_TOKENS,
+    RATE_LIMIT_MAX_RETRIES,
+    REQUESTS_PER_MINUTE,
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+    TOKENS_PER_MINUTE,
+)
+from helpers.llm_client import LLMClient, ResponseStream
+
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+}
+
+
+class ThrottlingError(Exception):
+    """Raised by clients that are not backed by botocore when the provider throttles a call."""
+
+
+def is_throttling_error(error: Exception) -> bool:
+    if isinstance(error, ThrottlingError):
+        return True
+    # botocore.exceptions.ClientError carries the service error code in `response`
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+
+def estimate_tokens(system_prompt: str, user_prompt: str) -> int:
+    # Bedrock reserves max_tokens against the TPM quota when a call is admitted
+    return math.ceil((len(system_prompt or '') + len(user_prompt or '')) / 4) + MAX_TOKENS
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self.rate_per_minute = float(rate_per_minute)
+        self.tokens = self.rate_per_minute
+        self.updated_at = clock()
+
+    @property
+    def capacity(self) -> float:
+        return self.rate_per_minute
+
+    def _refill(self) -> None:
+        now = self.clock()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_minute / 60)
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available, 0 if they are available now."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60 / self.rate_per_minute
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        self._refill()
+        self.rate_per_minute = float(rate_per_minute)
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class ModelRateLimit:
+    """Request and token budgets for one model, adjusted AIMD-style.
+
+    Every throttle halves both rates; every successful call adds back a small fixed
+    step until the configured budget is reached again.
+    """
+
+    MULTIPLICATIVE_DECREASE = 0.5
+    ADDITIVE_INCREASE_FRACTION = 0.02
+    MIN_FRACTION = 0.02
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_requests_per_minute = requests_per_minute
+        self.max_tokens_per_minute = tokens_per_minute
+        self.fraction = 1.0
+        self.requests = TokenBucket(requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock)
+
+    def wait_time(self, tokens: int) -> float:
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def take(self, tokens: int) -> None:
+        self.requests.take(1)
+        self.tokens.take(tokens)
+
+    def _apply_fraction(self, fraction: float) -> None:
+        self.fraction = min(1.0, max(self.MIN_FRACTION, fraction))
+        self.requests.set_rate(self.max_requests_per_minute * self.fraction)
+        self.tokens.set_rate(self.max_tokens_per_minute * self.fraction)
+
+    def on_success(self) -> None:
+        if self.fraction < 1.0:
+            self._apply_fraction(self.fraction + self.ADDITIVE_INCREASE_FRACTION)
+
+    def on_throttle(self) -> None:
+        self._apply_fraction(self.fraction * self.MULTIPLICATIVE_DECREASE)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = TOKENS_PER_MINUTE,
+        model_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.model_limits = model_limits or {}
+        self.clock = clock
+        self.sleep = sleep
+        self._limits: Dict[str, ModelRateLimit] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, rate_limits: Optional[Dict[str, Any]]) -> 'RateLimiter':
+        rate_limits = rate_limits or {}
+        return cls(
+            requests_per_minute=rate_limits.get('requests_per_minute', REQUESTS_PER_MINUTE),
+            tokens_per_minute=rate_limits.get('tokens_per_minute', TOKENS_PER_MINUTE),
+            model_limits=rate_limits.get('models'),
+        )
+
+    def _limit_for(self, model_id: str) -> ModelRateLimit:
+        if model_id not in self._limits:
+            overrides = self.model_limits.get(model_id, {})
+            self._limits[model_id] = ModelRateLimit(
+                overrides.get('requests_per_minute', self.requests_per_minute),
+                overrides.get('tokens_per_minute', self.tokens_per_minute),
+                self.clock,
+            )
+        return self._limits[model_id]
+
+    def acquire(self, model_id: str, tokens: int) -> None:
+        """Block until the model's budget admits one more request of `tokens` tokens."""
+        while True:
+            with self._lock:
+                limit = self._limit_for(model_id)
+                wait = limit.wait_time(tokens)
+                if wait == 0:
+                    limit.take(tokens)
+                    return
+            self.sleep(wait)
+
+    def on_success(self, model_id: str) -> None:
+        with self._lock:
+            self._limit_for(model_id).on_success()
+
+    def on_throttle(self, model_id: str) -> None:
+        with self._lock:
+            self._limit_for(model_id).on_throttle()
+
+    def current_requests_per_minute(self, model_id: str) -> float:
+        with self._lock:
+            return self._limit_for(model_id).requests.rate_per_minute
+
+
+class RateLimitedClient(LLMClient):
+    """Wraps any LLMClient with per-model rate limiting and jittered retries on throttling."""
+
+    def __init__(
+        self,
+        client: LLMClient,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = RATE_LIMIT_MAX_RETRIES,
+        base_delay: float = RETRY_BASE_DELAY_SECONDS,
+        max_delay: float = RETRY_MAX_DELAY_SECONDS,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.client = client
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.throttles = 0
+        self.retries = 0
+        self._stats_lock = threading.Lock()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # "Full jitter" exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def invoke_model(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        tokens = estimate_tokens(system_prompt, user_prompt)
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(model_id, tokens)
+            try:
+                response = self.client.invoke_model(model_id, system_prompt, user_prompt, image_path)
+            except Exception as e:
+                self._back_off_or_raise(model_id, e, attempt)
+                continue
+
+            self.rate_limiter.on_success(model_id)
+            return response
+
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> ResponseStream:
+        """Throttling shows up when the stream is opened or on its first event, so only that part is retried."""
+        return ResponseStream(self._stream(model_id, system_prompt, user_prompt, image_path))
+
+    def _stream(
+        self, model_id: str, system_prompt: str, user_prompt: str, image_path: Optional[str]
+    ) -> Generator[str, None, Optional[Dict[str, Any]]]:
+        tokens = estimate_tokens(system_prompt, user_prompt)
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(model_id, tokens)
+            chunks = self.client.invoke_model_stream(model_id, system_prompt, user_prompt, image_path)
+            try:
+                first_chunk = next(chunks, None)
+            except Exception as e:
+                self._back_off_or_raise(model_id, e, attempt)
+                continue
+
+            self.rate_limiter.on_success(model_id)
+            if first_chunk is not None:
+                yield first_chunk
+            yield from chunks
+            return chunks.response
+
+    def _back_off_or_raise(self, model_id: str, error: Exception, attempt: int) -> None:
+        if not is_throttling_error(error):
+            raise error
+        self.rate_limiter.on_throttle(model_id)
+        with self._stats_lock:
+            self.throttles += 1
+        if attempt == self.max_retries:
+            raise error
+        with self._stats_lock:
+            self.retries += 1
+        self.sleep(self._backoff_delay(attempt))
+
+    def get_client_type(self) -> str:
+        return self.client.get_client_type()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            stats = {'throttles': self.throttles, 'retries': self.retries}
+        return {**self.client.get_stats(), **stats}
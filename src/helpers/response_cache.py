@@ -0,0 +1,196 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Generator, Optional
+
+from config import (
+    MAX_TOKENS,
+    RESPONSE_CACHE_MAX_AGE_DAYS,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_PATH,
+    TEMPERATURE,
+    TOP_K,
+    TOP_P,
+)
+from helpers.image_cache import image_cache
+from helpers.llm_client import LLMClient, ResponseStream
+
+
+class ResponseCache:
+    """SQLite-backed store of model responses, evicted by age and total size (least recently used first)."""
+
+    def __init__(
+        self,
+        path: str = RESPONSE_CACHE_PATH,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        max_age_days: float = RESPONSE_CACHE_MAX_AGE_DAYS,
+    ) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        self.evict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT response FROM responses WHERE key = ? AND created_at >= ?', (key, now - self.max_age_seconds)
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        serialized = json.dumps(response)
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, serialized, len(serialized), now, now),
+            )
+            self.connection.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones until the cache fits in max_bytes."""
+        with self._lock:
+            cursor = self.connection.execute('DELETE FROM responses WHERE created_at < ?', (time.time() - self.max_age_seconds,))
+            evicted = cursor.rowcount
+
+            total_size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total_size > self.max_bytes:
+                rows = self.connection.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall()
+                stale_keys = []
+                for key, size in rows:
+                    if total_size <= self.max_bytes:
+                        break
+                    stale_keys.append((key,))
+                    total_size -= size
+                self.connection.executemany('DELETE FROM responses WHERE key = ?', stale_keys)
+                evicted += len(stale_keys)
+
+            self.connection.commit()
+        return evicted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+
+class CachedLLMClient(LLMClient):
+    """Serves repeated requests from a ResponseCache instead of calling the model again.
+
+    The LLMClient interface has no iteration index, so the n-th identical request made
+    through this client is treated as iteration n. Each iteration of an attack keeps its
+    own cached sample, so reruns reproduce the same spread of responses.
+    With `refresh`, every request goes to the model and overwrites the cached response.
+    """
+
+    def __init__(self, client: LLMClient, cache: ResponseCache, refresh: bool = False) -> None:
+        self.client = client
+        self.cache = cache
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._occurrences = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _request_fingerprint(self, model_id: str, system_prompt: str, user_prompt: str, image_path: Optional[str]) -> str:
+        request = {
+            'client_type': self.client.get_client_type(),
+            'model_id': model_id,
+            'system_prompt': system_prompt,
+            'user_prompt': user_prompt,
+            'image_sha256': image_cache.get(image_path).sha256 if image_path else None,
+            'inference': {'max_tokens': MAX_TOKENS, 'temperature': TEMPERATURE, 'top_k': TOP_K, 'top_p': TOP_P},
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _next_key(self, fingerprint: str) -> str:
+        with self._lock:
+            iteration = self._occurrences[fingerprint]
+            self._occurrences[fingerprint] += 1
+        return f'{fingerprint}:{iteration}'
+
+    def invoke_model(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        key = self._next_key(self._request_fingerprint(model_id, system_prompt, user_prompt, image_path))
+
+        if not self.refresh:
+            cached_response = self.cache.get(key)
+            if cached_response is not None:
+                with self._lock:
+                    self.hits += 1
+                # No model call was made, so there is no usage or latency to report
+                return {'content': cached_response['content'], 'cached': True}
+
+        response = self.client.invoke_model(model_id, system_prompt, user_prompt, image_path)
+        self.cache.put(key, response)
+        with self._lock:
+            self.misses += 1
+        return response
+
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> ResponseStream:
+        """Only streams read to the end are cached; one closed early would store a truncated response."""
+        key = self._next_key(self._request_fingerprint(model_id, system_prompt, user_prompt, image_path))
+
+        if not self.refresh:
+            cached_response = self.cache.get(key)
+            if cached_response is not None:
+                with self._lock:
+                    self.hits += 1
+                # No model call was made, so there is no usage or latency to report
+                return ResponseStream([cached_response['content'][0]['text']], model_call=False)
+
+        with self._lock:
+            self.misses += 1
+        return ResponseStream(
+            self._stream_and_cache(key, self.client.invoke_model_stream(model_id, system_prompt, user_prompt, image_path))
+        )
+
+    def _stream_and_cache(self, key: str, stream: ResponseStream) -> Generator[str, None, Dict[str, Any]]:
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(key, {'content': [{'text': ''.join(chunks)}]})
+        return stream.response
+
+    def get_client_type(self) -> str:
+        return self.client.get_client_type()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {'cache_hits': self.hits, 'cache_misses': self.misses}
+        return {**self.client.get_stats(), **stats}
@@ -1,23 +1,381 @@
-import sys
+import argparse
+import asyncio
+
+from all_use_cases import SharedResources, discover_use_cases, run_use_cases_async
 from attack_loader import AttackLoader
-from helpers.llm_client_factory import create_llm_client
+from attack_selector import AttackSelector
+from batch_inference import BatchRequestExporter, BatchResultIngestor, default_manifest_path_for_output
+from config import USE_CASES_DIR
+from detection_engine import rescore_jsonl
+from early_stopping import EarlyStopping
+from helpers.bedrock_runtime import ConnectionSettings
+from helpers.llm_client_factory import LLM_CLIENT_PROVIDERS, create_llm_client, supports_option
+from helpers.rate_limiter import RateLimitedClient, RateLimiter
+from helpers.response_cache import CachedLLMClient, ResponseCache
+from metrics import InstrumentedClient, MetricsRegistry, MetricsReporter, MetricsSink
+from prompt_injection_detector import PromptInjectionDetector
 from prompt_injection_tester import PromptInjectionTester
 from prompt_to_test_loader import PromptToTestLoader
+from result_formatter import ResultFormatter
+from result_sinks import JsonlResultSink, StdoutResultSink, TaggedResultSink
+from results_store import PreviousResults, ResultsStore, ResultsStoreSink
+from run_journal import RunJournal
+from run_plan import plan_run
+from runner import defended_message_prefix
+from sharding import ShardResultsFile, default_shard_path, merge_shard_files, parse_shard, run_fingerprint, select_shard
 
 
-def main():
-    use_case = sys.argv[1] if len(sys.argv) > 1 else 'default'
-    prompt_to_test_loader = PromptToTestLoader(use_case=use_case)
-    prompt_to_test = prompt_to_test_loader.load_prompt_to_test()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run prompt injection tests against a use case.')
+    parser.add_argument('use_case', nargs='?', default='default', help='Directory name under use_cases/ (default: default)')
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help='Run every use case with a prompt_to_test.yaml in one process, sharing attacks, clients and one pool of model calls',
+    )
+    parser.add_argument(
+        '--client',
+        choices=list(LLM_CLIENT_PROVIDERS),
+        default='converse',
+        help='LLM client to call (default: converse; fake answers locally without AWS)',
+    )
+    cache_options = parser.add_mutually_exclusive_group()
+    cache_options.add_argument('--no-cache', action='store_true', help='Always call the model and do not store responses')
+    cache_options.add_argument('--refresh', action='store_true', help='Call the model again and overwrite cached responses')
+    batch_options = parser.add_mutually_exclusive_group()
+    batch_options.add_argument(
+        '--batch-export', metavar='INPUT_JSONL', help='Write a batch inference input file instead of calling the model'
+    )
+    batch_options.add_argument('--batch-ingest', metavar='OUTPUT_JSONL', help='Score a batch inference output file')
+    batch_options.add_argument(
+        '--merge', nargs='+', metavar='SHARD_JSONL', help='Combine the results files of every --shard run into one summary'
+    )
+    batch_options.add_argument('--history', action='store_true', help='List the stored runs of the use case, newest first')
+    batch_options.add_argument(
+        '--diff', nargs=2, metavar=('BASE_RUN_ID', 'RUN_ID'), help='Show the attacks whose verdict changed between two stored runs'
+    )
+    parser.add_argument('--no-store', action='store_true', help='Do not record this run in the results history')
+    incremental_options = parser.add_mutually_exclusive_group()
+    incremental_options.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only run attacks whose inputs changed since they were last stored, reusing the stored results of the rest',
+    )
+    incremental_options.add_argument(
+        '--full', action='store_true', help='Run every attack, even when `incremental: true` is set in prompt_to_test.yaml'
+    )
+    parser.add_argument(
+        '--shard',
+        metavar='K/N',
+        help='Run only the K-th of N deterministic slices of the attacks (by a hash of their path), e.g. on several machines',
+    )
+    parser.add_argument('--shard-output', metavar='PATH', help='Results file of this shard (default: shards/<use_case>-<k>-of-<n>.jsonl)')
+    plan_options = parser.add_mutually_exclusive_group()
+    plan_options.add_argument('--list', action='store_true', help='List the selected attacks and exit')
+    plan_options.add_argument(
+        '--dry-run', action='store_true', help='Load and validate the attacks and estimate model calls and tokens, without calling a model'
+    )
+    parser.add_argument('--results-jsonl', metavar='PATH', help='Append every iteration result to a JSONL file as it arrives')
+    parser.add_argument('--results-stdout', action='store_true', help='Print every iteration result as a JSON line as it arrives')
+    parser.add_argument(
+        '--no-dedup', action='store_true', help='Call the model for every attack, even when several send the exact same request'
+    )
+    parser.add_argument('--resume', metavar='RUN_ID', help='Continue an interrupted run, skipping the iterations it already completed')
+    parser.add_argument(
+        '--select',
+        action='append',
+        metavar='FIELD=PATTERN,...',
+        help='Only run attacks matching all of these, e.g. taxonomy=jailbreak,language=en (fields: type, taxonomy, language, source, path)',
+    )
+    parser.add_argument(
+        '--exclude',
+        action='append',
+        metavar='FIELD=PATTERN,...',
+        help='Skip attacks matching any of these, e.g. path=distraction/long_prompt_*',
+    )
+    parser.add_argument(
+        '--rescore',
+        metavar='RESULTS_JSONL',
+        help='Re-evaluate stored responses with the current attack indicators instead of calling the model',
+    )
+    parser.add_argument(
+        '--metrics-file', metavar='PATH', help='Write run metrics (latency histograms, throughput, throttles) as OpenMetrics text'
+    )
+    parser.add_argument('--metrics-push', metavar='URL', help='PUT run metrics to a collector such as a Prometheus Pushgateway job URL')
+    parser.add_argument(
+        '--metrics-interval',
+        type=float,
+        metavar='SECONDS',
+        help='Also export metrics every SECONDS during the run (default: only at the end)',
+    )
+    parser.add_argument('--batch-manifest', help='Manifest written by --batch-export (default: derived from the output file name)')
+    args = parser.parse_args(argv)
+    try:
+        args.selector = AttackSelector.parse(args.select, args.exclude)
+        args.shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    if args.all:
+        single_use_case_options = {
+            '--resume': args.resume,
+            '--shard': args.shard,
+            '--rescore': args.rescore,
+            '--batch-export': args.batch_export,
+            '--batch-ingest': args.batch_ingest,
+            '--merge': args.merge,
+            '--history': args.history,
+            '--diff': args.diff,
+        }
+        for option, value in single_use_case_options.items():
+            if value:
+                parser.error(f'{option} works on a single use case and cannot be combined with --all')
+    return args
 
-    bedrock_client = create_llm_client('converse')
-    attack_loader = AttackLoader(attacks_dir=prompt_to_test['attacks_dir'])
-    tester = PromptInjectionTester(bedrock_client, prompt_to_test['iterations'])
 
-    attacks = attack_loader.load_yaml_attacks()
-    attack_loader.display_attack_examples(attacks)
+def prompt_cache_options(prompt_to_test):
+    """Translate `prompt_cache` in prompt_to_test.yaml into client options, or None when it is off."""
+    prompt_cache = prompt_to_test.get('prompt_cache') or {}
+    if not prompt_cache.get('enabled'):
+        return None
+
+    options = {'system_prompt': prompt_cache.get('system_prompt', True), 'user_prefixes': []}
+    if prompt_cache.get('pre_user_message', True) and prompt_to_test['pre_user_message']:
+        options['user_prefixes'].append(defended_message_prefix(prompt_to_test['pre_user_message']))
+    if 'min_tokens' in prompt_cache:
+        options['min_tokens'] = prompt_cache['min_tokens']
+    return options
+
+
+def build_llm_client(prompt_to_test, args, metrics_registry, shared=None, concurrency=None):
+    """The client stack of a use case. Use cases with the same settings get the same stack from `shared`."""
+    shared = shared or SharedResources()
+    rate_limits = prompt_to_test.get('rate_limits')
+    # Quotas are per model, so use cases with the same limits also share one budget
+    rate_limiter = shared.get('rate_limiter', rate_limits, lambda: RateLimiter.from_config(rate_limits))
+    concurrency = concurrency or prompt_to_test.get('concurrency', 1)
+    connection_settings = ConnectionSettings.from_config(prompt_to_test.get('connection'), concurrency)
+    if prompt_to_test.get('connection') and not supports_option(args.client, 'connection_settings'):
+        print(f'The {args.client} client does not use the connection settings of prompt_to_test.yaml, ignoring them')
+    prompt_cache = prompt_cache_options(prompt_to_test)
+
+    def build():
+        llm_client = create_llm_client(args.client, connection_settings, prompt_cache)
+        # Instrument inside the rate limiter so every attempt, including throttled ones, is measured
+        bedrock_client = RateLimitedClient(InstrumentedClient(llm_client, metrics_registry), rate_limiter)
+        if args.no_cache:
+            return bedrock_client
+        return CachedLLMClient(bedrock_client, shared.get('response_cache', None, ResponseCache), refresh=args.refresh)
+
+    return shared.get('llm_client', [rate_limits, connection_settings, prompt_cache], build)
+
+
+def build_result_sinks(args):
+    sinks = []
+    if args.results_jsonl:
+        sinks.append(JsonlResultSink(args.results_jsonl))
+    if args.results_stdout:
+        sinks.append(StdoutResultSink())
+    return sinks
+
+
+def open_run_journal(args, prompt_to_test, attacks):
+    fingerprint = run_fingerprint(prompt_to_test, {'select': args.select, 'exclude': args.exclude}, attacks)
+    if args.resume:
+        try:
+            journal = RunJournal.resume(args.resume, use_case=args.use_case, run_fingerprint=fingerprint)
+        except (FileNotFoundError, ValueError) as e:
+            raise SystemExit(f'Cannot resume run: {e}')
+        print(f'Resuming run {journal.run_id}')
+    else:
+        journal = RunJournal.start(use_case=args.use_case, run_fingerprint=fingerprint)
+        print(f'Run ID: {journal.run_id} (continue it with --resume {journal.run_id} if it is interrupted)')
+    return journal
+
+
+def ingest_batch_results(args):
+    formatter = ResultFormatter()
+    ingestor = BatchResultIngestor(PromptInjectionDetector(None), formatter)
+    manifest_path = args.batch_manifest or default_manifest_path_for_output(args.batch_ingest)
+    stats = ingestor.ingest(args.batch_ingest, manifest_path)
+
+    formatter.format_summary_stats_with_iterations(
+        stats['total_tests'],
+        stats['total_iterations'],
+        stats['blocked_injections'],
+        stats['successful_injections'],
+        'Bedrock Batch Inference',
+        stats['model_id'],
+    )
+
 
-    tester.run_prompt_injection_tests(
+def open_shard_results(args, prompt_to_test, attacks, client_type):
+    shard, shards = args.shard
+    path = args.shard_output or default_shard_path(args.use_case, shard, shards)
+    header = {
+        'use_case': args.use_case,
+        'shard': shard,
+        'shards': shards,
+        'run_fingerprint': run_fingerprint(prompt_to_test, {'select': args.select, 'exclude': args.exclude}),
+        'model_ids': prompt_to_test['model_ids'],
+        'iterations': prompt_to_test['iterations'],
+        'early_stopping_enabled': EarlyStopping.from_config(prompt_to_test.get('early_stopping')).enabled,
+        'client_type': client_type,
+        'attacks': len(attacks),
+    }
+    print(f'Shard {shard}/{shards}: {len(attacks)} attacks, results in {path}')
+    return ShardResultsFile(path, header)
+
+
+def merge_shard_results(args):
+    try:
+        merged = merge_shard_files(args.merge)
+    except ValueError as e:
+        raise SystemExit(f'Cannot merge shards: {e}')
+    header = merged['header']
+    formatter = ResultFormatter()
+    print(f'Merged {merged["shards"]} shards of use case {header["use_case"]}')
+
+    for model_id, stats in merged['stats'].items():
+        formatter.format_summary_stats_with_iterations(
+            stats['total_tests'],
+            stats['total_iterations'],
+            stats['blocked_injections'],
+            stats['successful_injections'],
+            header['client_type'],
+            model_id,
+        )
+        formatter.format_early_stopping_stats(stats['saved_iterations'], stats['total_iterations'])
+        formatter.format_deduplication_stats(stats['deduplicated_iterations'], stats['total_iterations'])
+        formatter.format_incremental_stats(stats['carried_forward_tests'], stats['total_tests'])
+        formatter.format_usage_stats(stats, model_id)
+
+    if len(header['model_ids']) > 1:
+        matrix = {}
+        for model_id, stats in merged['stats'].items():
+            for test_result in stats['results']:
+                matrix.setdefault(test_result['relative_path'], {})[model_id] = test_result
+        formatter.format_model_matrix(header['model_ids'], matrix)
+
+
+def open_results_store(args, use_case, prompt_to_test, run_id, client_type):
+    store = ResultsStore()
+    store.start_run(run_id, use_case, client_type, run_fingerprint(prompt_to_test, {'select': args.select, 'exclude': args.exclude}))
+    return ResultsStoreSink(store, run_id)
+
+
+def open_previous_results(args, prompt_to_test, stored_results, client_type):
+    """Stored results to carry forward in an incremental run, or None for a full run."""
+    if args.full or not (args.incremental or prompt_to_test.get('incremental')):
+        return None
+    print('Incremental run: attacks whose inputs did not change since their last stored result are not run again')
+    # With --no-store earlier results are still reused, this run is just not added to them
+    return PreviousResults(stored_results.store if stored_results else ResultsStore(), client_type)
+
+
+def show_history(args):
+    store = ResultsStore()
+    try:
+        if args.diff:
+            try:
+                diff = store.diff_runs(*args.diff)
+            except ValueError as e:
+                raise SystemExit(f'Cannot compare runs: {e}')
+            ResultFormatter().format_run_diff(*args.diff, diff)
+        else:
+            ResultFormatter().format_run_history(store.list_runs(args.use_case))
+    finally:
+        store.close()
+
+
+def run_all_use_cases(args):
+    use_cases = discover_use_cases()
+    if not use_cases:
+        raise SystemExit(f'No use case with a prompt_to_test.yaml found in {USE_CASES_DIR}')
+    shared = SharedResources(args.selector)
+    configs = {use_case: PromptToTestLoader(use_case=use_case).load_prompt_to_test() for use_case in use_cases}
+    attacks = {use_case: shared.attacks(prompt_to_test['attacks_dir'])[1] for use_case, prompt_to_test in configs.items()}
+
+    if args.list or args.dry_run:
+        formatter = ResultFormatter()
+        for use_case, prompt_to_test in configs.items():
+            print(f'\n📁 Use case: {use_case}')
+            if args.list:
+                formatter.format_attack_list(attacks[use_case])
+            else:
+                formatter.format_run_plan(plan_run(prompt_to_test, attacks[use_case]))
+        return
+
+    # Every use case keeps its concurrency, as when run on its own, but their calls share one pool
+    concurrency = sum(prompt_to_test.get('concurrency', 1) for prompt_to_test in configs.values())
+    metrics_registry = MetricsRegistry()
+    metrics_sink = MetricsSink(metrics_registry)
+    shared_sinks = build_result_sinks(args)
+    jobs, testers, journals, stored_results, to_close = [], {}, [], [], []
+    for use_case, prompt_to_test in configs.items():
+        bedrock_client = build_llm_client(prompt_to_test, args, metrics_registry, shared, concurrency)
+        client_type = bedrock_client.get_client_type()
+        selection = {'select': args.select, 'exclude': args.exclude}
+        journal = RunJournal.start(use_case=use_case, run_fingerprint=run_fingerprint(prompt_to_test, selection, attacks[use_case]))
+        print(f'Use case {use_case}: run ID {journal.run_id}, {len(attacks[use_case])} attacks')
+        sinks = [TaggedResultSink(sink, {'use_case': use_case}) for sink in shared_sinks] + [journal, metrics_sink]
+        journals.append(journal)
+        to_close.append(journal)
+        store_sink = None if args.no_store else open_results_store(args, use_case, prompt_to_test, journal.run_id, client_type)
+        if store_sink:
+            sinks.append(store_sink)
+            stored_results.append(store_sink)
+            to_close.append(store_sink)
+        previous_results = open_previous_results(args, prompt_to_test, store_sink, client_type)
+        if previous_results and not store_sink:
+            to_close.append(previous_results.store)
+        testers[use_case] = PromptInjectionTester(
+            bedrock_client,
+            prompt_to_test['iterations'],
+            prompt_to_test.get('concurrency', 1),
+            EarlyStopping.from_config(prompt_to_test.get('early_stopping')),
+            sinks,
+            None,
+            prompt_to_test.get('streaming'),
+            deduplicate=not args.no_dedup,
+            previous_results=previous_results,
+            keep_responses=not shared_sinks,
+        )
+        jobs.append(
+            {'use_case': use_case, 'runner': testers[use_case].runner, 'prompt_to_test': prompt_to_test, 'attacks': attacks[use_case]}
+        )
+
+    metrics_reporter = MetricsReporter(metrics_registry, args.metrics_file, args.metrics_push, args.metrics_interval).start()
+    try:
+        stats = asyncio.run(run_use_cases_async(jobs, concurrency))
+        for sink in journals + stored_results:
+            sink.mark_complete()
+    finally:
+        for resource in to_close + shared_sinks:
+            resource.close()
+        metrics_reporter.stop()
+
+    stats_per_use_case = dict(zip(configs, stats))
+    formatter = ResultFormatter()
+    for use_case, stats_per_model in stats_per_use_case.items():
+        print(f'\n📁 Use case: {use_case}')
+        testers[use_case].report(stats_per_model, client_stats=False)
+    formatter.format_use_case_summary(stats_per_use_case)
+    for bedrock_client in shared.built('llm_client'):
+        formatter.format_client_stats(bedrock_client.get_stats())
+    formatter.format_metrics_summary(metrics_registry.summary())
+
+
+def run_tests(tester, prompt_to_test, attacks):
+    if len(prompt_to_test['model_ids']) > 1:
+        return tester.run_model_matrix_tests(
+            system_prompt=prompt_to_test['system_prompt'],
+            pre_user_message=prompt_to_test['pre_user_message'],
+            post_user_message=prompt_to_test['post_user_message'],
+            attacks_list=attacks,
+            model_ids=prompt_to_test['model_ids'],
+        )
+
+    return tester.run_prompt_injection_tests(
         system_prompt=prompt_to_test['system_prompt'],
         pre_user_message=prompt_to_test['pre_user_message'],
         post_user_message=prompt_to_test['post_user_message'],
@@ -26,5 +384,110 @@ def main():
     )
 
 
+def main():
+    args = parse_args()
+    if args.batch_ingest:
+        ingest_batch_results(args)
+        return
+    if args.merge:
+        merge_shard_results(args)
+        return
+    if args.history or args.diff:
+        show_history(args)
+        return
+    if args.all:
+        run_all_use_cases(args)
+        return
+
+    prompt_to_test_loader = PromptToTestLoader(use_case=args.use_case)
+    prompt_to_test = prompt_to_test_loader.load_prompt_to_test()
+
+    attack_loader = AttackLoader(attacks_dir=prompt_to_test['attacks_dir'], use_index=True)
+    attacks = attack_loader.load_yaml_attacks(args.selector)
+    if args.shard:
+        attacks = select_shard(attacks, *args.shard)
+
+    if args.list:
+        ResultFormatter().format_attack_list(attacks)
+        return
+
+    if args.dry_run:
+        ResultFormatter().format_run_plan(plan_run(prompt_to_test, attacks))
+        return
+
+    if args.rescore:
+        output_path = f'{args.rescore.removesuffix(".jsonl")}.rescored.jsonl'
+        counts = rescore_jsonl(args.rescore, output_path, attacks)
+        print(
+            f'Re-scored {counts["rescored"]} of {counts["records"]} records, {counts["flipped"]} verdicts changed. Written to {output_path}'
+        )
+        return
+
+    if args.batch_export:
+        if len(prompt_to_test['model_ids']) > 1:
+            print(f'Batch jobs run one model each, exporting requests for {prompt_to_test["model_id"]} only')
+        exporter = BatchRequestExporter(prompt_to_test['iterations'])
+        try:
+            records = exporter.export(
+                args.batch_export,
+                prompt_to_test['system_prompt'],
+                prompt_to_test['pre_user_message'],
+                prompt_to_test['post_user_message'],
+                attacks,
+                prompt_to_test['model_id'],
+            )
+        except ValueError as e:
+            raise SystemExit(f'Cannot export batch requests: {e}')
+        print(f'Wrote {records} batch records to {args.batch_export}')
+        return
+
+    metrics_registry = MetricsRegistry()
+    bedrock_client = build_llm_client(prompt_to_test, args, metrics_registry)
+    journal = open_run_journal(args, prompt_to_test, attacks)
+    completed_iterations = journal.load_completed()
+    if completed_iterations:
+        print(f'Reusing {len(completed_iterations)} completed iterations')
+    result_sinks = build_result_sinks(args)
+    sinks = result_sinks + [journal, MetricsSink(metrics_registry)]
+    client_type = bedrock_client.get_client_type()
+    shard_results = open_shard_results(args, prompt_to_test, attacks, client_type) if args.shard else None
+    if shard_results:
+        sinks.append(shard_results)
+    stored_results = None if args.no_store else open_results_store(args, args.use_case, prompt_to_test, journal.run_id, client_type)
+    if stored_results:
+        sinks.append(stored_results)
+    previous_results = open_previous_results(args, prompt_to_test, stored_results, client_type)
+    tester = PromptInjectionTester(
+        bedrock_client,
+        prompt_to_test['iterations'],
+        prompt_to_test.get('concurrency', 1),
+        EarlyStopping.from_config(prompt_to_test.get('early_stopping')),
+        sinks,
+        completed_iterations,
+        prompt_to_test.get('streaming'),
+        deduplicate=not args.no_dedup,
+        previous_results=previous_results,
+        # Response texts are only dropped from the stats when the user streams them to a results sink
+        keep_responses=not result_sinks,
+    )
+    attack_loader.display_attack_examples(attacks)
+
+    metrics_reporter = MetricsReporter(metrics_registry, args.metrics_file, args.metrics_push, args.metrics_interval).start()
+    try:
+        run_tests(tester, prompt_to_test, attacks)
+        if shard_results:
+            shard_results.mark_complete()
+        if stored_results:
+            stored_results.mark_complete()
+        journal.mark_complete()
+    finally:
+        for sink in sinks:
+            sink.close()
+        if previous_results and not stored_results:
+            previous_results.store.close()
+        metrics_reporter.stop()
+    tester.formatter.format_metrics_summary(metrics_registry.summary())
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,307 @@
+import os
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple
+
+from config import METRICS_LATENCY_BUCKETS_SECONDS, METRICS_PREFIX
+from helpers.llm_client import LLMClient, ResponseStream
+from helpers.rate_limiter import is_throttling_error
+from result_sinks import ResultSink
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Fixed-bucket histogram, so memory does not grow with the number of observations."""
+
+    def __init__(self, buckets: Tuple[float, ...] = METRICS_LATENCY_BUCKETS_SECONDS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating inside its bucket, like Prometheus' histogram_quantile."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+    def cumulative_counts(self) -> Iterator[Tuple[str, int]]:
+        total = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            total += bucket_count
+            yield repr(float(bound)), total
+        yield '+Inf', self.count
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and latency histograms of one run."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self.started_at = clock()
+        self.latency: Dict[str, Histogram] = {}
+        self.calls: Dict[Tuple[str, str], int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.tests_completed = 0
+        self.iterations_completed = 0
+        self.successful_injections = 0
+        self._lock = threading.Lock()
+
+    def call_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def call_finished(self, model_id: str, outcome: str, seconds: float) -> None:
+        """`outcome` is ok, throttled or error. Only successful calls go into the latency histogram."""
+        with self._lock:
+            self.in_flight -= 1
+            self.calls[(model_id, outcome)] = self.calls.get((model_id, outcome), 0) + 1
+            if outcome == 'ok':
+                self.latency.setdefault(model_id, Histogram()).observe(seconds)
+
+    def record(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            if record.get('type') == 'test_result':
+                self.tests_completed += 1
+            elif record.get('type') == 'iteration':
+                self.iterations_completed += 1
+                self.successful_injections += int(bool(record.get('injection_detected')))
+
+    def summary(self) -> Dict[str, Any]:
+        """Plain numbers for printing: latency quantiles over all models, throughput and call outcomes."""
+        with self._lock:
+            combined = Histogram()
+            for histogram in self.latency.values():
+                combined.counts = [a + b for a, b in zip(combined.counts, histogram.counts)]
+                combined.count += histogram.count
+                combined.sum += histogram.sum
+                combined.max = max(combined.max, histogram.max)
+            elapsed = max(self.clock() - self.started_at, 1e-9)
+            outcomes = {}
+            for (_, outcome), count in self.calls.items():
+                outcomes[outcome] = outcomes.get(outcome, 0) + count
+            return {
+                **{f'latency_p{int(q * 100)}_ms': _milliseconds(combined.quantile(q)) for q in QUANTILES},
+                'max_in_flight': self.max_in_flight,
+                'tests_per_second': round(self.tests_completed / elapsed, 3),
+                'calls': outcomes,
+            }
+
+    def render(self, openmetrics: bool = True) -> str:
+        """Render every metric in OpenMetrics text format, or the Prometheus 0.0.4 text format with `openmetrics=False`."""
+        lines: List[str] = []
+
+        def family(name: str, metric_type: str, help_text: str, unit: Optional[str] = None) -> str:
+            full_name = f'{METRICS_PREFIX}_{name}'
+            # The Prometheus text format names counter families with their _total suffix, OpenMetrics without it
+            type_name = f'{full_name}_total' if metric_type == 'counter' and not openmetrics else full_name
+            lines.append(f'# HELP {type_name} {help_text}')
+            lines.append(f'# TYPE {type_name} {metric_type}')
+            if unit and openmetrics:
+                lines.append(f'# UNIT {full_name} {unit}')
+            return full_name
+
+        with self._lock:
+            elapsed = max(self.clock() - self.started_at, 1e-9)
+
+            name = family('model_call_latency_seconds', 'histogram', 'Latency of successful model calls.', 'seconds')
+            for model_id, histogram in sorted(self.latency.items()):
+                labels = f'model="{_escape(model_id)}"'
+                for bound, total in histogram.cumulative_counts():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+            name = family('model_call_latency_quantile_seconds', 'gauge', 'Estimated latency quantiles of successful model calls.')
+            for model_id, histogram in sorted(self.latency.items()):
+                for q in QUANTILES:
+                    lines.append(f'{name}{{model="{_escape(model_id)}",percentile="{int(q * 100)}"}} {histogram.quantile(q)}')
+
+            name = family('model_calls', 'counter', 'Model calls by outcome (ok, throttled, error).')
+            for (model_id, outcome), count in sorted(self.calls.items()):
+                lines.append(f'{name}_total{{model="{_escape(model_id)}",outcome="{outcome}"}} {count}')
+
+            name = family('in_flight_calls', 'gauge', 'Model calls currently in flight.')
+            lines.append(f'{name} {self.in_flight}')
+            name = family('max_in_flight_calls', 'gauge', 'Most model calls in flight at once during the run.')
+            lines.append(f'{name} {self.max_in_flight}')
+
+            name = family('tests_completed', 'counter', 'Attacks whose iterations all finished.')
+            lines.append(f'{name}_total {self.tests_completed}')
+            name = family('iterations_completed', 'counter', 'Iterations finished.')
+            lines.append(f'{name}_total {self.iterations_completed}')
+            name = family('successful_injections', 'counter', 'Iterations where the injection succeeded.')
+            lines.append(f'{name}_total {self.successful_injections}')
+            name = family('tests_per_second', 'gauge', 'Attacks completed per second since the run started.')
+            lines.append(f'{name} {self.tests_completed / elapsed}')
+            name = family('run_duration_seconds', 'gauge', 'Seconds since the run started.')
+            lines.append(f'{name} {elapsed}')
+
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _milliseconds(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class InstrumentedClient(LLMClient):
+    """Wraps an LLMClient and records latency, in-flight calls, throttles and errors of every real model call.
+
+    Put it directly around the Bedrock client, inside RateLimitedClient, so each retry is one call.
+    """
+
+    def __init__(self, client: LLMClient, registry: MetricsRegistry) -> None:
+        self.client = client
+        self.registry = registry
+
+    def _outcome(self, error: Exception) -> str:
+        return 'throttled' if is_throttling_error(error) else 'error'
+
+    def invoke_model(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        self.registry.call_started()
+        start = time.perf_counter()
+        try:
+            response = self.client.invoke_model(model_id, system_prompt, user_prompt, image_path)
+        except Exception as e:
+            self.registry.call_finished(model_id, self._outcome(e), time.perf_counter() - start)
+            raise
+        self.registry.call_finished(model_id, 'ok', time.perf_counter() - start)
+        return response
+
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        image_path: Optional[str] = None,
+    ) -> ResponseStream:
+        """A stream counts as in flight until it is read to the end or closed."""
+        return ResponseStream(self._stream(model_id, system_prompt, user_prompt, image_path))
+
+    def _stream(
+        self, model_id: str, system_prompt: str, user_prompt: str, image_path: Optional[str]
+    ) -> Generator[str, None, Dict[str, Any]]:
+        self.registry.call_started()
+        start = time.perf_counter()
+        outcome = 'ok'
+        try:
+            chunks = self.client.invoke_model_stream(model_id, system_prompt, user_prompt, image_path)
+            yield from chunks
+        except Exception as e:
+            outcome = self._outcome(e)
+            raise
+        finally:
+            self.registry.call_finished(model_id, outcome, time.perf_counter() - start)
+        return chunks.response
+
+    def get_client_type(self) -> str:
+        return self.client.get_client_type()
+
+    def get_stats(self) -> Dict[str, int]:
+        return self.client.get_stats()
+
+
+class MetricsSink(ResultSink):
+    """Feeds completed iterations and attacks into the registry for throughput metrics."""
+
+    def __init__(self, registry: MetricsRegistry) -> None:
+        self.registry = registry
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.registry.record(record)
+
+
+class MetricsReporter:
+    """Exports the registry to an OpenMetrics file and/or a collector endpoint.
+
+    The file is replaced atomically, so a node_exporter-style textfile collector never reads
+    half of it. With `interval_seconds`, exports also happen periodically during the run.
+    The push uses HTTP PUT with the Prometheus text format, as a Pushgateway expects.
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        path: Optional[str] = None,
+        push_url: Optional[str] = None,
+        interval_seconds: Optional[float] = None,
+    ) -> None:
+        self.registry = registry
+        self.path = Path(path) if path else None
+        self.push_url = push_url
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self) -> None:
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f'.{self.path.name}.tmp')
+            temp_path.write_text(self.registry.render(), encoding='utf-8')
+            os.replace(temp_path, self.path)
+        if self.push_url:
+            self._push()
+
+    def _push(self) -> None:
+        request = urllib.request.Request(
+            self.push_url,
+            data=self.registry.render(openmetrics=False).encode('utf-8'),
+            method='PUT',
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+        except OSError as e:
+            # Monitoring must not fail the test run
+            print(f'Failed to push metrics to {self.push_url}: {e}')
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.export()
+
+    def start(self) -> 'MetricsReporter':
+        if self.interval_seconds and (self.path or self.push_url):
+            self._thread = threading.Thread(target=self._run, name='metrics-reporter', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop periodic exports and write the final metrics."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.export()
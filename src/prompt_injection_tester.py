@@ -1,17 +1,43 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
+from early_stopping import EarlyStopping
 from helpers.llm_client import LLMClient
 from prompt_injection_detector import PromptInjectionDetector
 from result_formatter import ResultFormatter
+from result_sinks import ResultSink
 from runner import Runner
 
 
 class PromptInjectionTester:
-    def __init__(self, bedrock_client: LLMClient, iterations: int = 3) -> None:
+    def __init__(
+        self,
+        bedrock_client: LLMClient,
+        iterations: int = 3,
+        concurrency: int = 1,
+        early_stopping: Optional[EarlyStopping] = None,
+        sinks: Optional[List[ResultSink]] = None,
+        completed_iterations: Optional[Dict[Tuple[str, str, int], Dict[str, Any]]] = None,
+        streaming: Optional[Dict[str, Any]] = None,
+        deduplicate: bool = True,
+        previous_results: Optional[Any] = None,
+        keep_responses: bool = True,
+    ) -> None:
         self.bedrock_client = bedrock_client
-        self.detector = PromptInjectionDetector(bedrock_client)
+        self.detector = PromptInjectionDetector.from_config(bedrock_client, streaming)
         self.formatter = ResultFormatter()
-        self.runner = Runner(self.detector, self.formatter, iterations)
+        # With `keep_responses` off, response texts only go to the sinks and `results` keeps per-attack counts
+        self.runner = Runner(
+            self.detector,
+            self.formatter,
+            iterations,
+            concurrency,
+            early_stopping,
+            sinks,
+            keep_responses=keep_responses,
+            completed_iterations=completed_iterations,
+            deduplicate=deduplicate,
+            previous_results=previous_results,
+        )
 
     def run_prompt_injection_tests(
         self,
@@ -22,14 +48,49 @@ class PromptInjectionTester:
         model_id: str,
     ) -> Dict[str, Any]:
         stats = self.runner.run_injection_tests(system_prompt, pre_user_message, post_user_message, attacks_list, model_id)
+        self.report({model_id: stats})
+        return stats
+
+    def _build_results_matrix(self, stats_per_model: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        matrix = {}
+        for model_id, stats in stats_per_model.items():
+            for test_result in stats['results']:
+                matrix.setdefault(test_result['relative_path'], {})[model_id] = test_result
+        return matrix
 
+    def run_model_matrix_tests(
+        self,
+        system_prompt: str,
+        pre_user_message: str,
+        post_user_message: str,
+        attacks_list: List[Dict[str, Any]],
+        model_ids: List[str],
+    ) -> Dict[str, Any]:
+        stats_per_model = self.runner.run_model_matrix(system_prompt, pre_user_message, post_user_message, attacks_list, model_ids)
+        matrix = self.report(stats_per_model)
+        return {'models': model_ids, 'stats': stats_per_model, 'matrix': matrix}
+
+    def report(self, stats_per_model: Dict[str, Dict[str, Any]], client_stats: bool = True) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Print the summary of each model, then the model x attack matrix (returned) when several models ran."""
         client_type = self.bedrock_client.get_client_type()
+        for model_id, stats in stats_per_model.items():
+            self.formatter.format_summary_stats_with_iterations(
+                stats['total_tests'],
+                stats['total_iterations'],
+                stats['blocked_injections'],
+                stats['successful_injections'],
+                client_type,
+                model_id,
+            )
+            self.formatter.format_early_stopping_stats(stats['saved_iterations'], stats['total_iterations'])
+            self.formatter.format_deduplication_stats(stats['deduplicated_iterations'], stats['total_iterations'])
+            self.formatter.format_incremental_stats(stats['carried_forward_tests'], stats['total_tests'])
+            self.formatter.format_usage_stats(stats, model_id)
 
-        self.formatter.format_summary_stats_with_iterations(
-            stats['total_tests'],
-            stats['total_iterations'],
-            stats['blocked_injections'],
-            stats['successful_injections'],
-            client_type,
-            model_id,
-        )
+        matrix = None
+        if len(stats_per_model) > 1:
+            matrix = self._build_results_matrix(stats_per_model)
+            self.formatter.format_model_matrix(list(stats_per_model), matrix)
+        if client_stats:
+            self.formatter.format_client_stats({**self.bedrock_client.get_stats(), **self.detector.get_stats()})
+        return matrix
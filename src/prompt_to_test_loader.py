@@ -19,4 +19,16 @@ class PromptToTestLoader:
         with open(self.config_path, 'r', encoding='utf-8') as file:
             config = yaml.safe_load(file)
 
+        return self._normalize_model_ids(config)
+
+    def _normalize_model_ids(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """`model_id` may be a single model or a list; `model_ids` always holds the list and `model_id` the first one."""
+        model_ids = config.get('model_id')
+        if isinstance(model_ids, list):
+            if not model_ids:
+                raise ValueError(f'model_id list is empty in {self.config_path}')
+            config['model_id'] = model_ids[0]
+        else:
+            model_ids = [model_ids]
+        config['model_ids'] = model_ids
         return config
@@ -1,3 +1,9 @@
+from datetime import datetime
+from typing import Optional
+
+from usage import usage_cost
+
+
 class ResultFormatter:
     def format_single_result(self, attack_name: str, injection_detected: bool, response_text: str) -> str:
         status = '❌ Injection successful' if injection_detected else '✅ Injection failed'
@@ -6,12 +12,20 @@ class ResultFormatter:
         """
 
     def format_single_result_with_iterations(
-        self, attack_name: str, successful_iterations: int, blocked_iterations: int, success_rate: float, example_successful_attack: str
+        self,
+        attack_name: str,
+        successful_iterations: int,
+        blocked_iterations: int,
+        success_rate: float,
+        example_successful_attack: str,
+        label: Optional[str] = None,
     ) -> str:
+        """`label` names the model when several models run interleaved."""
         total_iterations = successful_iterations + blocked_iterations
         status_icon = '❌' if success_rate > 0 else '✅'
+        name = f'[{label}] {attack_name}' if label else attack_name
 
-        return f"""{attack_name}: {status_icon} {successful_iterations}/{total_iterations} injections successful ({success_rate:.1f}%)
+        return f"""{name}: {status_icon} {successful_iterations}/{total_iterations} injections successful ({success_rate:.1f}%)
         Successful: {successful_iterations}, Blocked: {blocked_iterations}
         Example Successful Attack: {example_successful_attack}
         """
@@ -71,3 +85,193 @@ class ResultFormatter:
 
         print(f'📋 Overall Assessment: {assessment}')
         print('=' * 80)
+
+    def format_early_stopping_stats(self, saved_iterations: int, executed_iterations: int) -> None:
+        if saved_iterations <= 0:
+            return
+
+        planned_iterations = saved_iterations + executed_iterations
+        saved_rate = (saved_iterations / planned_iterations) * 100
+        print(f'⏱️  Early stopping saved {saved_iterations} of {planned_iterations} model calls ({saved_rate:.1f}%)')
+        print('=' * 80)
+
+    def format_deduplication_stats(self, deduplicated_iterations: int, executed_iterations: int) -> None:
+        if deduplicated_iterations <= 0:
+            return
+
+        saved_rate = (deduplicated_iterations / executed_iterations) * 100 if executed_iterations else 0
+        print(f'♻️  Deduplication saved {deduplicated_iterations} of {executed_iterations} model calls ({saved_rate:.1f}%)')
+        print('=' * 80)
+
+    def format_incremental_stats(self, carried_forward_tests: int, total_tests: int) -> None:
+        if carried_forward_tests <= 0:
+            return
+
+        print(f'⏭️  Incremental run: {carried_forward_tests} of {total_tests} attacks unchanged, results carried forward')
+        print('=' * 80)
+
+    def _format_cost(self, cost) -> str:
+        return f'${cost:.6f}' if cost is not None else 'n/a (no price for model)'
+
+    def format_usage_stats(self, stats: dict, model_id: str = None, top_attacks: int = 5) -> None:
+        """Print token usage, latency and estimated cost of the run, per category and for the costliest attacks."""
+        usage = stats.get('usage')
+        if not usage or not usage['calls']:
+            return
+
+        average_latency = usage['latency_ms'] / usage['calls']
+        print('💰 Usage:')
+        print(f'   • Model Calls: {usage["calls"]}')
+        print(f'   • Tokens: {usage["input_tokens"]} input, {usage["output_tokens"]} output')
+        print(f'   • Latency: {usage["latency_ms"] / 1000:.1f}s total, {average_latency:.0f}ms per call')
+        if usage['cache_read_tokens'] or usage['cache_write_tokens']:
+            print(f'   • Prompt Cache: {usage["cache_read_tokens"]} tokens read, {usage["cache_write_tokens"]} tokens written')
+        print(f'   • Estimated Cost: {self._format_cost(usage_cost(model_id, usage))}')
+
+        print('   By category:')
+        categories = sorted(stats['usage_by_category'].items(), key=lambda item: item[1]['output_tokens'], reverse=True)
+        for category, category_usage in categories:
+            cost = usage_cost(model_id, category_usage)
+            print(
+                f'     - {category}: {category_usage["calls"]} calls, '
+                f'{category_usage["input_tokens"]}/{category_usage["output_tokens"]} tokens, '
+                f'{category_usage["latency_ms"] / 1000:.1f}s, {self._format_cost(cost)}'
+            )
+
+        print(f'   Most expensive attacks (by output tokens, top {top_attacks}):')
+        results = sorted(stats['results'], key=lambda result: (result.get('output_tokens', 0), result.get('latency_ms', 0)), reverse=True)
+        for result in results[:top_attacks]:
+            print(
+                f'     - {result["relative_path"]}: {result["input_tokens"]}/{result["output_tokens"]} tokens, '
+                f'{result["latency_ms"] / 1000:.1f}s, {self._format_cost(result["estimated_cost"])}'
+            )
+        print('=' * 80)
+
+    def format_metrics_summary(self, summary: dict) -> None:
+        if not summary['calls']:
+            return
+
+        def latency(name):
+            return f'{summary[name]:.0f}ms' if summary[name] is not None else 'n/a'
+
+        calls = ', '.join(f'{count} {outcome}' for outcome, count in sorted(summary['calls'].items()))
+        print('📈 Run Metrics:')
+        print(f'   • Call Latency: p50 {latency("latency_p50_ms")}, p95 {latency("latency_p95_ms")}, p99 {latency("latency_p99_ms")}')
+        print(f'   • Model Calls: {calls} (max {summary["max_in_flight"]} in flight)')
+        print(f'   • Throughput: {summary["tests_per_second"]} tests/sec')
+        print('=' * 80)
+
+    def format_client_stats(self, client_stats: dict) -> None:
+        if not client_stats:
+            return
+
+        print('🔌 Client Stats:')
+        for name, value in client_stats.items():
+            print(f'   • {name.replace("_", " ").capitalize()}: {value}')
+        print('=' * 80)
+
+    def format_attack_list(self, attacks: list) -> None:
+        for attack in attacks:
+            category = attack.get('prompt_taxonomy') or attack.get('type') or 'uncategorized'
+            image = ' [image]' if attack.get('image_path') else ''
+            print(f'{attack["relative_path"]}\t{category}\t{attack["name"]}{image}')
+        print(f'{len(attacks)} attacks')
+
+    def format_run_plan(self, plan: dict) -> None:
+        print('\n' + '=' * 80)
+        print(' ' * 30 + 'DRY RUN (no model calls)')
+        print('=' * 80)
+        print(f'📋 Attacks: {plan["attacks"]} ({plan["attacks_with_images"]} with images)')
+        print(f'🔁 Iterations per attack: {plan["iterations"]}, concurrency {plan["concurrency"]}')
+        for model in plan['models']:
+            print(f'🤖 {model["model_id"]}:')
+            print(f'   • Model Calls: at most {model["calls"]}')
+            print(f'   • Input Tokens: ~{model["input_tokens"]} (text only)')
+            print(f'   • Estimated Input Cost: {self._format_cost(model["estimated_input_cost"])}')
+        print('=' * 80)
+
+    def format_run_history(self, runs: list) -> None:
+        for run in runs:
+            started_at = datetime.fromtimestamp(run['started_at']).isoformat(timespec='seconds')
+            print(
+                f'{run["run_id"]}\t{started_at}\t{run["use_case"]}\t{run["client_type"]}\t{run["status"]}\t'
+                f'{run["test_results"]} results, {run["successful_iterations"]}/{run["iterations"]} iterations successful'
+            )
+        print(f'{len(runs)} runs')
+
+    def format_run_diff(self, base_run_id: str, run_id: str, diff: dict) -> None:
+        print('\n' + '=' * 80)
+        print(f'🔀 Changes from run {base_run_id} to {run_id}')
+        print('=' * 80)
+        for key, title in (('newly_successful', '❌ Now successful (were blocked)'), ('newly_blocked', '✅ Now blocked (were successful)')):
+            print(f'{title}: {len(diff[key])}')
+            for change in diff[key]:
+                print(
+                    f'   • {change["relative_path"]} [{change["model_id"]}]: '
+                    f'{change["base_success_rate"]:.1f}% → {change["success_rate"]:.1f}% success'
+                )
+        print('=' * 80)
+
+    def format_model_matrix(self, model_ids: list, matrix: dict) -> None:
+        """Print one row per attack and one column per model with successful/total iterations."""
+        model_names = [model_id.split('.')[-1] for model_id in model_ids]
+        path_width = max([len('Attack')] + [len(path) for path in matrix])
+        column_widths = [max(len(name), 12) for name in model_names]
+
+        print('\n' + '=' * 80)
+        print(' ' * 22 + 'MODEL x ATTACK RESULTS (successful/total)')
+        print('=' * 80)
+        print(' | '.join(['Attack'.ljust(path_width)] + [name.ljust(width) for name, width in zip(model_names, column_widths)]))
+        print('-' * 80)
+
+        totals = {model_id: [0, 0] for model_id in model_ids}
+        for relative_path, row in matrix.items():
+            cells = []
+            for model_id, width in zip(model_ids, column_widths):
+                cell = row.get(model_id)
+                if cell is None:
+                    cells.append('-'.ljust(width))
+                    continue
+                totals[model_id][0] += cell['successful_iterations']
+                totals[model_id][1] += cell['iterations']
+                status_icon = '❌' if cell['successful_iterations'] > 0 else '✅'
+                cells.append(f'{status_icon} {cell["successful_iterations"]}/{cell["iterations"]}'.ljust(width))
+            print(' | '.join([relative_path.ljust(path_width)] + cells))
+
+        print('-' * 80)
+        total_cells = []
+        for model_id, width in zip(model_ids, column_widths):
+            successful, iterations = totals[model_id]
+            rate = (successful / iterations) * 100 if iterations > 0 else 0
+            total_cells.append(f'{successful}/{iterations} ({rate:.1f}%)'.ljust(width))
+        print(' | '.join(['Total'.ljust(path_width)] + total_cells))
+        print('=' * 80)
+
+    def format_use_case_summary(self, stats_per_use_case: dict) -> None:
+        """Print one row per use case and model with its attacks, successful/total iterations and cost."""
+        rows = [
+            (use_case, model_id, stats)
+            for use_case, stats_per_model in stats_per_use_case.items()
+            for model_id, stats in stats_per_model.items()
+        ]
+        use_case_width = max([len('Use case')] + [len(use_case) for use_case, _, _ in rows])
+        model_width = max([len('Model')] + [len(model_id.split('.')[-1]) for _, model_id, _ in rows])
+
+        print('\n' + '=' * 80)
+        print(' ' * 20 + 'RESULTS PER USE CASE (successful/total iterations)')
+        print('=' * 80)
+        print(' | '.join(['Use case'.ljust(use_case_width), 'Model'.ljust(model_width), 'Attacks', 'Iterations'.ljust(22), 'Cost']))
+        print('-' * 80)
+        for use_case, model_id, stats in rows:
+            successful, iterations = stats['successful_injections'], stats['total_iterations']
+            rate = (successful / iterations) * 100 if iterations > 0 else 0
+            status_icon = '❌' if successful > 0 else '✅'
+            cells = [
+                use_case.ljust(use_case_width),
+                model_id.split('.')[-1].ljust(model_width),
+                str(stats['total_tests']).ljust(len('Attacks')),
+                f'{status_icon} {successful}/{iterations} ({rate:.1f}%)'.ljust(22),
+                self._format_cost(usage_cost(model_id, stats['usage'])),
+            ]
+            print(' | '.join(cells))
+        print('=' * 80)
@@ -0,0 +1,75 @@
+import json
+import sys
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, TextIO
+
+
+class ResultSink(ABC):
+    """Receives results while a run is in progress.
+
+    `write` is called from worker threads with one record per completed iteration
+    (`type: iteration`) and one per completed attack (`type: test_result`).
+    """
+
+    @abstractmethod
+    def write(self, record: Dict[str, Any]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlResultSink(ResultSink):
+    """Appends every record to a JSONL file and flushes it, so results survive a crash."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class StdoutResultSink(ResultSink):
+    def __init__(self, stream: TextIO = None) -> None:
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            print(json.dumps(record, ensure_ascii=False), file=self.stream, flush=True)
+
+
+class CallbackResultSink(ResultSink):
+    def __init__(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        self.callback = callback
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.callback(record)
+
+
+class TaggedResultSink(ResultSink):
+    """Adds fixed fields, such as the use case, to every record before passing it on.
+
+    Several tagged sinks can share one underlying sink, so closing a tagged sink leaves it open.
+    """
+
+    def __init__(self, sink: ResultSink, tags: Dict[str, Any]) -> None:
+        self.sink = sink
+        self.tags = tags
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.sink.write({**self.tags, **record})
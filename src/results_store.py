@@ -0,0 +1,233 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import RESULTS_STORE_KEEP_RUNS, RESULTS_STORE_MAX_AGE_DAYS, RESULTS_STORE_PATH
+from result_sinks import ResultSink
+
+TEST_RESULT_COLUMNS = (
+    'input_fingerprint',
+    'name',
+    'category',
+    'iterations',
+    'successful_iterations',
+    'blocked_iterations',
+    'success_rate',
+    'calls',
+    'input_tokens',
+    'output_tokens',
+    'latency_ms',
+    'estimated_cost',
+)
+
+
+class ResultsStore:
+    """SQLite history of runs and their per-attack results, for comparing runs over time.
+
+    Only per-attack summaries are kept, not responses. Runs beyond `keep_runs` per use case or
+    older than `max_age_days` are dropped when the store is opened, and the freed pages are
+    returned to the file system, so the file stays bounded.
+    """
+
+    def __init__(
+        self,
+        path: str = RESULTS_STORE_PATH,
+        keep_runs: int = RESULTS_STORE_KEEP_RUNS,
+        max_age_days: float = RESULTS_STORE_MAX_AGE_DAYS,
+    ) -> None:
+        self.path = Path(path)
+        self.keep_runs = keep_runs
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        # Only takes effect on a new database, before any table exists
+        self.connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS runs ('
+            'run_id TEXT PRIMARY KEY, use_case TEXT, client_type TEXT, run_fingerprint TEXT, '
+            "started_at REAL NOT NULL, finished_at REAL, status TEXT NOT NULL DEFAULT 'incomplete')"
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS runs_use_case_started_at ON runs (use_case, started_at)')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS test_results ('
+            'run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE, model_id TEXT NOT NULL, relative_path TEXT NOT NULL, '
+            'input_fingerprint TEXT, name TEXT, category TEXT, '
+            'iterations INTEGER, successful_iterations INTEGER, blocked_iterations INTEGER, success_rate REAL, '
+            'calls INTEGER, input_tokens INTEGER, output_tokens INTEGER, latency_ms REAL, estimated_cost REAL, '
+            'PRIMARY KEY (run_id, model_id, relative_path))'
+        )
+        columns = {row[1] for row in self.connection.execute('PRAGMA table_info(test_results)')}
+        if 'input_fingerprint' not in columns:
+            self.connection.execute('ALTER TABLE test_results ADD COLUMN input_fingerprint TEXT')
+        # The primary key serves lookups by run; these serve the history of one attack, model or category
+        self.connection.execute('CREATE INDEX IF NOT EXISTS test_results_path ON test_results (relative_path, model_id)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS test_results_model ON test_results (model_id)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS test_results_category ON test_results (category)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS test_results_input_fingerprint ON test_results (input_fingerprint)')
+        self.connection.commit()
+        self.prune()
+
+    def start_run(self, run_id: str, use_case: Optional[str], client_type: Optional[str], run_fingerprint: Optional[str] = None) -> None:
+        """Register a run. Resuming a run keeps its start time."""
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR IGNORE INTO runs (run_id, use_case, client_type, run_fingerprint, started_at) VALUES (?, ?, ?, ?, ?)',
+                (run_id, use_case, client_type, run_fingerprint, time.time()),
+            )
+            self.connection.execute("UPDATE runs SET status = 'incomplete', finished_at = NULL WHERE run_id = ?", (run_id,))
+            self.connection.commit()
+
+    def record_test_results(self, run_id: str, test_results: List[Dict[str, Any]]) -> None:
+        rows = [
+            (run_id, record['model_id'] or '', record['relative_path'], *(record.get(column) for column in TEST_RESULT_COLUMNS))
+            for record in test_results
+        ]
+        placeholders = ', '.join('?' * (3 + len(TEST_RESULT_COLUMNS)))
+        with self._lock:
+            self.connection.executemany(
+                f'INSERT OR REPLACE INTO test_results (run_id, model_id, relative_path, {", ".join(TEST_RESULT_COLUMNS)}) '
+                f'VALUES ({placeholders})',
+                rows,
+            )
+            self.connection.commit()
+
+    def finish_run(self, run_id: str) -> None:
+        with self._lock:
+            self.connection.execute("UPDATE runs SET status = 'complete', finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+            self.connection.commit()
+
+    def list_runs(self, use_case: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent runs first, with their attack counts and success totals."""
+        where, parameters = ('WHERE use_case = ? ', [use_case]) if use_case else ('', [])
+        # Totals are only aggregated for the runs that are listed
+        query = (
+            'SELECT latest.run_id, use_case, client_type, started_at, status, COUNT(test_results.relative_path), '
+            'COALESCE(SUM(iterations), 0), COALESCE(SUM(successful_iterations), 0) '
+            f'FROM (SELECT * FROM runs {where}ORDER BY started_at DESC LIMIT ?) AS latest '
+            'LEFT JOIN test_results ON test_results.run_id = latest.run_id '
+            'GROUP BY latest.run_id ORDER BY started_at DESC'
+        )
+        with self._lock:
+            rows = self.connection.execute(query, [*parameters, limit]).fetchall()
+        keys = ('run_id', 'use_case', 'client_type', 'started_at', 'status', 'test_results', 'iterations', 'successful_iterations')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def find_result(self, input_fingerprint: str, client_type: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The most recent stored result of an attack with these exact inputs, from a run with the same client type."""
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT runs.run_id, iterations, successful_iterations, blocked_iterations, success_rate '
+                'FROM test_results JOIN runs ON runs.run_id = test_results.run_id '
+                'WHERE input_fingerprint = ? AND client_type IS ? ORDER BY started_at DESC LIMIT 1',
+                (input_fingerprint, client_type),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('run_id', 'iterations', 'successful_iterations', 'blocked_iterations', 'success_rate'), row))
+
+    def diff_runs(self, base_run_id: str, run_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Attacks whose verdict changed between two runs, matched by model and attack path.
+
+        An attack counts as successful when any of its iterations succeeded.
+        """
+        with self._lock:
+            known = {row[0] for row in self.connection.execute('SELECT run_id FROM runs WHERE run_id IN (?, ?)', (base_run_id, run_id))}
+            missing = [candidate for candidate in (base_run_id, run_id) if candidate not in known]
+            if missing:
+                raise ValueError(f'Unknown run: {", ".join(missing)}')
+            rows = self.connection.execute(
+                'SELECT new.model_id, new.relative_path, new.name, base.success_rate, new.success_rate, new.successful_iterations > 0 '
+                'FROM test_results AS new JOIN test_results AS base '
+                'ON base.run_id = ? AND base.model_id = new.model_id AND base.relative_path = new.relative_path '
+                'WHERE new.run_id = ? AND (base.successful_iterations > 0) != (new.successful_iterations > 0) '
+                'ORDER BY new.relative_path, new.model_id',
+                (base_run_id, run_id),
+            ).fetchall()
+
+        diff = {'newly_successful': [], 'newly_blocked': []}
+        for model_id, relative_path, name, base_rate, new_rate, now_successful in rows:
+            change = {
+                'model_id': model_id,
+                'relative_path': relative_path,
+                'name': name,
+                'base_success_rate': base_rate,
+                'success_rate': new_rate,
+            }
+            diff['newly_successful' if now_successful else 'newly_blocked'].append(change)
+        return diff
+
+    def prune(self) -> int:
+        """Drop runs past the age limit and all but the newest `keep_runs` of each use case, then release the space."""
+        with self._lock:
+            stale = self.connection.execute(
+                'SELECT run_id FROM ('
+                'SELECT run_id, started_at, ROW_NUMBER() OVER (PARTITION BY use_case ORDER BY started_at DESC) AS position FROM runs'
+                ') WHERE position > ? OR started_at < ?',
+                (self.keep_runs, time.time() - self.max_age_seconds),
+            ).fetchall()
+            self.connection.executemany('DELETE FROM runs WHERE run_id = ?', stale)
+            self.connection.commit()
+            if stale:
+                # executescript steps the pragma to the end; a single execute frees one page only
+                self.connection.executescript('PRAGMA incremental_vacuum; PRAGMA wal_checkpoint(TRUNCATE);')
+        return len(stale)
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+
+class PreviousResults:
+    """Stored results of earlier runs by input fingerprint, for incremental runs (see `Runner.previous_results`).
+
+    Responses depend on the client, so only results of runs with the same client type are reused.
+    """
+
+    def __init__(self, store: ResultsStore, client_type: Optional[str]) -> None:
+        self.store = store
+        self.client_type = client_type
+
+    def get(self, input_fingerprint: str) -> Optional[Dict[str, Any]]:
+        return self.store.find_result(input_fingerprint, self.client_type)
+
+
+class ResultsStoreSink(ResultSink):
+    """Records every completed attack of a run into a ResultsStore, in batches."""
+
+    def __init__(self, store: ResultsStore, run_id: str, batch_size: int = 100) -> None:
+        self.store = store
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if record.get('type') != 'test_result':
+            return
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+        self.store.record_test_results(self.run_id, batch)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self.store.record_test_results(self.run_id, batch)
+
+    def mark_complete(self) -> None:
+        self.flush()
+        self.store.finish_run(self.run_id)
+
+    def close(self) -> None:
+        self.flush()
+        self.store.close()
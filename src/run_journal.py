@@ -0,0 +1,117 @@
+import json
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from config import RUN_JOURNAL_DIR, RUN_JOURNAL_MAX_AGE_DAYS
+from result_sinks import JsonlResultSink
+
+IterationKey = Tuple[str, str, int]
+
+
+def new_run_id() -> str:
+    return f'{datetime.now().strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:6]}'
+
+
+class RunJournal(JsonlResultSink):
+    """Append-only record of the iterations a run has completed, stored as `<directory>/<run_id>.jsonl`.
+
+    The first line describes the run; every following line is one completed iteration.
+    Resuming a run reads them back so finished (model, attack, iteration) work is skipped.
+    The journal is only needed until the run completes, so `mark_complete` deletes it.
+    """
+
+    def __init__(
+        self, run_id: str, directory: str = RUN_JOURNAL_DIR, use_case: Optional[str] = None, run_fingerprint: Optional[str] = None
+    ) -> None:
+        self.run_id = run_id
+        path = Path(directory) / f'{run_id}.jsonl'
+        is_new = not path.exists()
+        if not is_new:
+            self._terminate_last_line(path)
+        super().__init__(str(path))
+        if is_new:
+            header = {'type': 'run', 'run_id': run_id, 'use_case': use_case, 'run_fingerprint': run_fingerprint}
+            super().write({**header, 'started_at': datetime.now().isoformat()})
+
+    @staticmethod
+    def _terminate_last_line(path: Path) -> None:
+        # Make sure new records do not get appended to a line left half-written by a crash
+        with open(path, 'rb+') as f:
+            f.seek(0, 2)
+            if f.tell() == 0:
+                return
+            f.seek(-1, 2)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+    @staticmethod
+    def prune(directory: str = RUN_JOURNAL_DIR, max_age_days: float = RUN_JOURNAL_MAX_AGE_DAYS) -> int:
+        """Delete the journals of interrupted runs that were not touched for `max_age_days`."""
+        cutoff = time.time() - max_age_days * 24 * 3600
+        stale = [path for path in Path(directory).glob('*.jsonl') if path.stat().st_mtime < cutoff]
+        for path in stale:
+            path.unlink(missing_ok=True)
+        return len(stale)
+
+    @classmethod
+    def start(cls, directory: str = RUN_JOURNAL_DIR, use_case: Optional[str] = None, run_fingerprint: Optional[str] = None) -> 'RunJournal':
+        cls.prune(directory)
+        return cls(new_run_id(), directory, use_case, run_fingerprint)
+
+    @classmethod
+    def resume(
+        cls, run_id: str, directory: str = RUN_JOURNAL_DIR, use_case: Optional[str] = None, run_fingerprint: Optional[str] = None
+    ) -> 'RunJournal':
+        """Reopen an interrupted run. With `run_fingerprint`, the run must have been started with the same settings and attacks."""
+        if not (Path(directory) / f'{run_id}.jsonl').exists():
+            raise FileNotFoundError(f'No run journal found for run id {run_id} in {directory}')
+        journal = cls(run_id, directory, use_case)
+        header = journal.read_header()
+        journal_use_case = header.get('use_case')
+        if use_case and journal_use_case and journal_use_case != use_case:
+            journal.close()
+            raise ValueError(f"Run {run_id} was started for use case '{journal_use_case}', not '{use_case}'")
+        if run_fingerprint and header.get('run_fingerprint') != run_fingerprint:
+            journal.close()
+            raise ValueError(
+                f'Run {run_id} was started with other settings or attacks (prompts, models, iterations, early stopping, '
+                'selection or attack files changed); start a new run instead'
+            )
+        return journal
+
+    def mark_complete(self) -> None:
+        """The run finished, so there is nothing left to resume: close and delete the journal."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if record.get('type') == 'iteration':
+            super().write(record)
+
+    def _read_records(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # A crash can leave a truncated last line behind
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def read_header(self) -> Dict[str, Any]:
+        return next((record for record in self._read_records() if record.get('type') == 'run'), {})
+
+    def load_completed(self) -> Dict[IterationKey, Dict[str, Any]]:
+        completed = {}
+        for record in self._read_records():
+            if record.get('type') != 'iteration':
+                continue
+            key = (record['model_id'], record['relative_path'], record['iteration'])
+            completed[key] = {
+                'iteration': record['iteration'],
+                'injection_detected': record['injection_detected'],
+                'response_text': record['response_text'],
+            }
+        return completed
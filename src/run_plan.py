@@ -0,0 +1,39 @@
+import math
+from typing import Any, Dict, List
+
+from runner import build_defended_message
+from usage import estimate_cost
+
+
+def plan_run(prompt_to_test: Dict[str, Any], attacks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Model calls and input tokens a run would need at most, without calling a model.
+
+    Tokens are estimated at four characters each and exclude images. Early stopping, cached
+    responses and resumed iterations can only lower the real numbers.
+    """
+    iterations = prompt_to_test['iterations']
+    pre_user_message, post_user_message = prompt_to_test['pre_user_message'], prompt_to_test['post_user_message']
+    system_chars = len(prompt_to_test['system_prompt'] or '')
+    input_tokens_per_iteration = 0
+    for attack in attacks:
+        defended_message = build_defended_message(pre_user_message, attack['prompt'], post_user_message)
+        input_tokens_per_iteration += math.ceil((system_chars + len(defended_message)) / 4)
+
+    input_tokens = input_tokens_per_iteration * iterations
+    models = []
+    for model_id in prompt_to_test['model_ids']:
+        models.append(
+            {
+                'model_id': model_id,
+                'calls': len(attacks) * iterations,
+                'input_tokens': input_tokens,
+                'estimated_input_cost': estimate_cost(model_id, input_tokens, 0),
+            }
+        )
+    return {
+        'attacks': len(attacks),
+        'attacks_with_images': sum(1 for attack in attacks if attack.get('image_path')),
+        'iterations': iterations,
+        'concurrency': prompt_to_test.get('concurrency', 1),
+        'models': models,
+    }
@@ -1,17 +1,361 @@
-from typing import Any, Dict, List
+import asyncio
+import hashlib
+import json
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from detection_engine import compile_indicators
+from early_stopping import EarlyStopping
+from helpers.image_cache import image_cache
+from result_sinks import ResultSink
+from usage import add_usage, iteration_usage, new_usage, usage_cost
+
+
+def build_defended_message(pre_user_message: str, attack_message: str, post_user_message: str) -> str:
+    return f"""
+                {pre_user_message}
+                {attack_message}
+                {post_user_message}
+            """
+
+
+def defended_message_prefix(pre_user_message: str) -> str:
+    """The start of every defended message, up to where the attack goes. It is the same for all attacks."""
+    marker = '\0'
+    return build_defended_message(pre_user_message, marker, '').split(marker)[0]
+
+
+def request_fingerprint(
+    model_id: str, system_prompt: str, defended_message: str, image_path: Optional[str], indicators: Optional[Any] = None
+) -> str:
+    """Hash of everything sent to the model. Images are identified by content, so copies under other names match."""
+    image_sha256 = image_cache.get(image_path).sha256 if image_path else None
+    request = [model_id, system_prompt, defended_message, image_sha256]
+    if indicators is not None:
+        request.append([indicators.literals, [pattern.pattern for pattern in indicators.patterns], indicators.decode_variants])
+    return hashlib.sha256(json.dumps(request, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def new_run_stats(total_tests: int) -> Dict[str, Any]:
+    """Empty stats of one model's run over `total_tests` attacks, filled in with `add_test_result`."""
+    return {
+        'total_tests': total_tests,
+        'total_iterations': 0,
+        'blocked_injections': 0,
+        'successful_injections': 0,
+        'saved_iterations': 0,
+        'deduplicated_iterations': 0,
+        'carried_forward_tests': 0,
+        'usage': new_usage(),
+        'usage_by_category': {},
+        'results': [],
+    }
+
+
+def add_test_result(stats: Dict[str, Any], test_result: Dict[str, Any], planned_iterations: Optional[int] = None) -> None:
+    """Count one attack's result into run stats. With `planned_iterations` (early stopping on), iterations not run count as saved."""
+    stats['results'].append(test_result)
+    stats['total_iterations'] += test_result['iterations']
+    stats['successful_injections'] += test_result['successful_iterations']
+    stats['blocked_injections'] += test_result['blocked_iterations']
+    if test_result.get('carried_forward_from'):
+        stats['carried_forward_tests'] += 1
+    elif planned_iterations is not None:
+        stats['saved_iterations'] += planned_iterations - test_result['iterations']
+    stats['deduplicated_iterations'] += test_result['deduplicated_iterations']
+    add_usage(stats['usage'], test_result)
+    add_usage(stats['usage_by_category'].setdefault(test_result['category'], new_usage()), test_result)
 
 
 class Runner:
-    def __init__(self, detector: Any, formatter: Any, iterations: int = 3) -> None:
+    def __init__(
+        self,
+        detector: Any,
+        formatter: Any,
+        iterations: int = 3,
+        concurrency: int = 1,
+        early_stopping: Optional[EarlyStopping] = None,
+        sinks: Optional[List[ResultSink]] = None,
+        keep_responses: bool = True,
+        completed_iterations: Optional[Dict[Tuple[str, str, int], Dict[str, Any]]] = None,
+        deduplicate: bool = True,
+        previous_results: Optional[Any] = None,
+    ) -> None:
         self.detector = detector
         self.formatter = formatter
         self.iterations = iterations
+        self.concurrency = max(1, concurrency)
+        self.early_stopping = early_stopping or EarlyStopping()
+        self.sinks = sinks or []
+        # Without responses, `results` only keeps per-attack counts; response texts go to the sinks
+        self.keep_responses = keep_responses
+        # Iterations finished by an earlier, interrupted run, keyed by (model_id, relative_path, iteration)
+        self.completed_iterations = completed_iterations or {}
+        # Attacks whose rendered requests are identical share one model call per iteration
+        self.deduplicate = deduplicate
+        self._shared_results: Dict[str, Dict[int, Future]] = {}
+        self._shared_users: Counter = Counter()
+        self._shared_lock = threading.Lock()
+        # Incremental runs: looks up the stored result of an attack by input fingerprint (`get`), and attacks
+        # found there are carried forward instead of being run
+        self.previous_results = previous_results
 
     def _get_successful_attack(self, iteration_results: List[Dict[str, Any]]) -> str:
         for result in iteration_results:
             if result['injection_detected']:
                 return result['response_text']
-        return iteration_results[-1]['response_text']
+        return iteration_results[-1]['response_text'] if iteration_results else ''
+
+    def _get_relative_path(self, attack: Dict[str, Any]) -> str:
+        return attack.get('relative_path', attack.get('file_path', 'Unknown path'))
+
+    def _announce_attack(
+        self,
+        i: int,
+        total_tests: int,
+        attack: Dict[str, Any],
+        label: Optional[str] = None,
+        carried_forward: Optional[Dict[str, Any]] = None,
+        action: Optional[str] = None,
+    ) -> None:
+        relative_path = self._get_relative_path(attack)
+        attack_name = attack.get('name', 'Unknown Attack')
+        icon = '🖼️ ' if attack.get('image_path') else ''
+        prefix = f'[{label}] ' if label else ''
+        if carried_forward is not None:
+            action = f'carried forward from {carried_forward["carried_forward_from"]}'
+        elif action is None:
+            action = f'{icon}Running {self.iterations} iterations...'
+        print(f'{prefix}Test {i}/{total_tests}: {relative_path} - {attack_name} - {action}')
+
+    def _run_iteration(
+        self, system_prompt: str, defended_message: str, attack: Dict[str, Any], model_id: str, iteration: int
+    ) -> Dict[str, Any]:
+        detection_result = self.detector.detect_injection(
+            system_prompt,
+            defended_message,
+            compile_indicators(attack),
+            model_id,
+            attack.get('image_path'),
+        )
+
+        iteration_result = {
+            'iteration': iteration + 1,
+            'injection_detected': detection_result['injection_detected'],
+            'response_text': detection_result['response_text'],
+            'input_tokens': detection_result.get('input_tokens'),
+            'output_tokens': detection_result.get('output_tokens'),
+            'cache_read_tokens': detection_result.get('cache_read_tokens'),
+            'cache_write_tokens': detection_result.get('cache_write_tokens'),
+            'latency_ms': detection_result.get('latency_ms'),
+        }
+        self._emit({'type': 'iteration', 'model_id': model_id, 'relative_path': self._get_relative_path(attack), **iteration_result})
+        return iteration_result
+
+    def _input_fingerprint(self, system_prompt: str, defended_message: str, attack: Dict[str, Any], model_id: str) -> str:
+        """Hash of everything an attack's result depends on: its request and indicators, and how it is sampled and read."""
+        inputs = [
+            request_fingerprint(model_id, system_prompt, defended_message, attack.get('image_path'), compile_indicators(attack)),
+            self.iterations,
+            vars(self.early_stopping),
+            getattr(self.detector, 'stream', False),
+            getattr(self.detector, 'max_response_chars', None),
+        ]
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _carry_forward(self, attack: Dict[str, Any], model_id: str, input_fingerprint: str) -> Optional[Dict[str, Any]]:
+        """The stored result of an attack whose inputs did not change, or None when it has to run."""
+        previous = self.previous_results.get(input_fingerprint) if self.previous_results is not None else None
+        if previous is None:
+            return None
+        test_result = self._build_test_result(attack, [], model_id, input_fingerprint)
+        for key in ('iterations', 'successful_iterations', 'blocked_iterations', 'success_rate'):
+            test_result[key] = previous[key]
+        test_result['carried_forward_from'] = previous['run_id']
+        return test_result
+
+    def _emit(self, record: Dict[str, Any]) -> None:
+        for sink in self.sinks:
+            sink.write(record)
+
+    def _new_progress(self, fingerprint: Optional[str] = None) -> Dict[str, Any]:
+        return {'trials': 0, 'successes': 0, 'lock': threading.Lock(), 'fingerprint': fingerprint}
+
+    def _fingerprint_attacks(
+        self, system_prompt: str, pre_user_message: str, post_user_message: str, attacks_list: List[Dict[str, Any]], model_id: str
+    ) -> List[Optional[str]]:
+        """Fingerprint of each attack whose request is shared with another attack, None for unique ones.
+
+        While streaming, a response may be cut short once the payload of one attack appears,
+        so requests are only shared between attacks that also look for the same indicators.
+        """
+        if not self.deduplicate:
+            return [None] * len(attacks_list)
+
+        streaming = getattr(self.detector, 'stream', False)
+        fingerprints = [
+            request_fingerprint(
+                model_id,
+                system_prompt,
+                build_defended_message(pre_user_message, attack['prompt'], post_user_message),
+                attack.get('image_path'),
+                compile_indicators(attack) if streaming else None,
+            )
+            for attack in attacks_list
+        ]
+        counts = Counter(fingerprints)
+        shared = [fingerprint if counts[fingerprint] > 1 else None for fingerprint in fingerprints]
+        with self._shared_lock:
+            self._shared_users.update(fingerprint for fingerprint in shared if fingerprint)
+        return shared
+
+    def _release_shared(self, progress: Dict[str, Any]) -> None:
+        """Forget the shared results of a request once every attack that uses it has finished."""
+        fingerprint = progress['fingerprint']
+        if fingerprint is None:
+            return
+        with self._shared_lock:
+            self._shared_users[fingerprint] -= 1
+            if self._shared_users[fingerprint] <= 0:
+                del self._shared_users[fingerprint]
+                self._shared_results.pop(fingerprint, None)
+
+    def _run_shared_iteration(
+        self,
+        progress: Dict[str, Any],
+        system_prompt: str,
+        defended_message: str,
+        attack: Dict[str, Any],
+        model_id: str,
+        iteration: int,
+    ) -> Dict[str, Any]:
+        """Run the iteration, or wait for an attack with the same request to run it and judge its response for this attack."""
+        fingerprint = progress['fingerprint']
+        if fingerprint is None:
+            return self._run_iteration(system_prompt, defended_message, attack, model_id, iteration)
+
+        with self._shared_lock:
+            iterations = self._shared_results.setdefault(fingerprint, {})
+            future = iterations.get(iteration)
+            owner = future is None
+            if owner:
+                future = iterations[iteration] = Future()
+
+        if owner:
+            try:
+                iteration_result = self._run_iteration(system_prompt, defended_message, attack, model_id, iteration)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            future.set_result(iteration_result)
+            return iteration_result
+
+        shared_result = future.result()
+        iteration_result = {
+            'iteration': iteration + 1,
+            **self.detector.evaluate_response(shared_result['response_text'], compile_indicators(attack)),
+            # No model call was made for this attack, so it reports no usage
+            'input_tokens': None,
+            'output_tokens': None,
+            'cache_read_tokens': None,
+            'cache_write_tokens': None,
+            'latency_ms': None,
+            'deduplicated': True,
+        }
+        self._emit({'type': 'iteration', 'model_id': model_id, 'relative_path': self._get_relative_path(attack), **iteration_result})
+        return iteration_result
+
+    def _run_iteration_unless_decided(
+        self,
+        progress: Dict[str, Any],
+        system_prompt: str,
+        defended_message: str,
+        attack: Dict[str, Any],
+        model_id: str,
+        iteration: int,
+    ) -> Optional[Dict[str, Any]]:
+        """Run one iteration, reuse it from an interrupted run, or skip it (returning None) if early stopping settled the attack."""
+        with progress['lock']:
+            if self.early_stopping.is_decided(progress['successes'], progress['trials']):
+                return None
+
+        iteration_result = self.completed_iterations.get((model_id, self._get_relative_path(attack), iteration + 1))
+        if iteration_result is None:
+            iteration_result = self._run_shared_iteration(progress, system_prompt, defended_message, attack, model_id, iteration)
+
+        with progress['lock']:
+            progress['trials'] += 1
+            progress['successes'] += int(iteration_result['injection_detected'])
+        return iteration_result
+
+    def _build_test_result(
+        self,
+        attack: Dict[str, Any],
+        iteration_results: List[Dict[str, Any]],
+        model_id: Optional[str] = None,
+        input_fingerprint: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        iterations = len(iteration_results)
+        successful_iterations = sum(1 for result in iteration_results if result['injection_detected'])
+        blocked_iterations = iterations - successful_iterations
+        success_rate = (successful_iterations / iterations) * 100 if iterations > 0 else 0.0
+
+        usage = new_usage()
+        for result in iteration_results:
+            add_usage(usage, iteration_usage(result))
+
+        return {
+            'name': attack.get('name', 'Unknown Attack'),
+            'relative_path': self._get_relative_path(attack),
+            'model_id': model_id,
+            'category': attack.get('prompt_taxonomy') or attack.get('type') or 'uncategorized',
+            'iterations': iterations,
+            'successful_iterations': successful_iterations,
+            'blocked_iterations': blocked_iterations,
+            'success_rate': success_rate,
+            'deduplicated_iterations': sum(1 for result in iteration_results if result.get('deduplicated')),
+            **usage,
+            'estimated_cost': usage_cost(model_id, usage),
+            'input_fingerprint': input_fingerprint,
+            'iteration_results': iteration_results,
+        }
+
+    def _record_test_result(self, stats: Dict[str, Any], test_result: Dict[str, Any], label: Optional[str] = None) -> None:
+        summary = {key: value for key, value in test_result.items() if key != 'iteration_results'}
+        self._emit({'type': 'test_result', **summary})
+
+        planned_iterations = self.iterations if self.early_stopping.enabled else None
+        add_test_result(stats, test_result if self.keep_responses else summary, planned_iterations)
+
+        if test_result.get('carried_forward_from'):
+            # No responses were kept for a carried result, point at the run that has them
+            example_successful_attack = f'(carried forward from run {test_result["carried_forward_from"]})'
+        else:
+            example_successful_attack = self._get_successful_attack(test_result['iteration_results'])
+        output = self.formatter.format_single_result_with_iterations(
+            test_result['name'],
+            test_result['successful_iterations'],
+            test_result['blocked_iterations'],
+            test_result['success_rate'],
+            example_successful_attack,
+            label,
+        )
+        print(output)
+
+    def collect_results(
+        self, attacks_list: List[Dict[str, Any]], iteration_results_per_attack: List[List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Aggregate iteration results produced elsewhere (e.g. by batch inference) into the same stats as a run."""
+        stats = new_run_stats(len(attacks_list))
+
+        for i, (attack, iteration_results) in enumerate(zip(attacks_list, iteration_results_per_attack), 1):
+            # The responses were produced elsewhere, nothing runs here
+            self._announce_attack(i, stats['total_tests'], attack, action=f'Scoring {len(iteration_results)} responses...')
+            self._record_test_result(stats, self._build_test_result(attack, iteration_results))
+
+        return stats
 
     def run_injection_tests(
         self,
@@ -21,78 +365,146 @@ class Runner:
         attacks_list: List[Dict[str, Any]],
         model_id: str,
     ) -> Dict[str, Any]:
-        results = []
-        blocked_injections = 0
-        successful_injections = 0
-        total_tests = len(attacks_list)
-        total_iterations = total_tests * self.iterations
-
-        for i, attack in enumerate(attacks_list, 1):
-            relative_path = attack.get('relative_path', attack.get('file_path', 'Unknown path'))
-            attack_name = attack.get('name', 'Unknown Attack')
-            attack_message = attack['prompt']
-            attack_payload = attack['payload']
-            attack_image_path = attack.get('image_path')
-
-            icon = '🖼️ ' if attack_image_path else ''
-            print(f'Test {i}/{total_tests}: {relative_path} - {attack_name} - {icon}Running {self.iterations} iterations...')
-
-            defended_message = f"""
-                {pre_user_message}
-                {attack_message}
-                {post_user_message}
-            """
+        if self.concurrency > 1:
+            return asyncio.run(self.run_injection_tests_async(system_prompt, pre_user_message, post_user_message, attacks_list, model_id))
 
-            iteration_results = []
-            successful_iterations = 0
+        stats = new_run_stats(len(attacks_list))
+        fingerprints = self._fingerprint_attacks(system_prompt, pre_user_message, post_user_message, attacks_list, model_id)
 
-            for iteration in range(self.iterations):
-                detection_result = self.detector.detect_injection(
-                    system_prompt,
-                    defended_message,
-                    attack_payload,
-                    model_id,
-                    attack_image_path,
-                )
+        for i, (attack, fingerprint) in enumerate(zip(attacks_list, fingerprints), 1):
+            defended_message = build_defended_message(pre_user_message, attack['prompt'], post_user_message)
+
+            input_fingerprint = self._input_fingerprint(system_prompt, defended_message, attack, model_id)
+            progress = self._new_progress(fingerprint)
+            test_result = self._carry_forward(attack, model_id, input_fingerprint)
+            self._announce_attack(i, stats['total_tests'], attack, carried_forward=test_result)
+            if test_result is None:
+                iteration_results = [
+                    self._run_iteration_unless_decided(progress, system_prompt, defended_message, attack, model_id, iteration)
+                    for iteration in range(self.iterations)
+                ]
+                iteration_results = [result for result in iteration_results if result]
+                test_result = self._build_test_result(attack, iteration_results, model_id, input_fingerprint)
+            self._release_shared(progress)
+
+            self._record_test_result(stats, test_result)
 
-                iteration_results.append(
-                    {
-                        'iteration': iteration + 1,
-                        'injection_detected': detection_result['injection_detected'],
-                        'response_text': detection_result['response_text'],
-                    }
+        return stats
+
+    async def _run_attack_async(
+        self,
+        executor: ThreadPoolExecutor,
+        system_prompt: str,
+        defended_message: str,
+        attack: Dict[str, Any],
+        model_id: str,
+        input_fingerprint: str,
+        fingerprint: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        progress = self._new_progress(fingerprint)
+        try:
+            iteration_results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        executor, self._run_iteration_unless_decided, progress, system_prompt, defended_message, attack, model_id, iteration
+                    )
+                    for iteration in range(self.iterations)
                 )
+            )
+        finally:
+            self._release_shared(progress)
+        return self._build_test_result(attack, [result for result in iteration_results if result], model_id, input_fingerprint)
 
-                if detection_result['injection_detected']:
-                    successful_iterations += 1
+    async def run_injection_tests_async(
+        self,
+        system_prompt: str,
+        pre_user_message: str,
+        post_user_message: str,
+        attacks_list: List[Dict[str, Any]],
+        model_id: str,
+        executor: Optional[ThreadPoolExecutor] = None,
+        label: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Run every attack and iteration in parallel, at most `concurrency` model calls at a time.
 
-            blocked_iterations = self.iterations - successful_iterations
-            success_rate = (successful_iterations / self.iterations) * 100
+        Model calls are blocking, so they run on a thread pool. Results are still reported
+        in `attacks_list` order, and the returned stats have the same shape as the sequential run.
+        Only a window of attacks ahead of the one being reported is scheduled, so memory does
+        not grow with the size of the corpus.
+        """
+        owns_executor = executor is None
+        if owns_executor:
+            executor = ThreadPoolExecutor(max_workers=self.concurrency)
 
-            test_result = {
-                'name': attack_name,
-                'iterations': self.iterations,
-                'successful_iterations': successful_iterations,
-                'blocked_iterations': blocked_iterations,
-                'success_rate': success_rate,
-                'iteration_results': iteration_results,
-            }
+        stats = new_run_stats(len(attacks_list))
+        pending = deque()
+        fingerprints = self._fingerprint_attacks(system_prompt, pre_user_message, post_user_message, attacks_list, model_id)
+        remaining_attacks = iter(enumerate(zip(attacks_list, fingerprints), 1))
 
-            results.append(test_result)
+        def schedule_next_attack() -> None:
+            for i, (attack, fingerprint) in remaining_attacks:
+                defended_message = build_defended_message(pre_user_message, attack['prompt'], post_user_message)
+                input_fingerprint = self._input_fingerprint(system_prompt, defended_message, attack, model_id)
+                carried_forward = self._carry_forward(attack, model_id, input_fingerprint)
+                task = None
+                if carried_forward is None:
+                    task = asyncio.ensure_future(
+                        self._run_attack_async(executor, system_prompt, defended_message, attack, model_id, input_fingerprint, fingerprint)
+                    )
+                else:
+                    # Nothing runs, so the attack stops using the shared results of its request right away
+                    self._release_shared(self._new_progress(fingerprint))
+                pending.append((i, attack, carried_forward, task))
+                return
 
-            successful_injections += successful_iterations
-            blocked_injections += blocked_iterations
+        try:
+            for _ in range(self.concurrency * 4):
+                schedule_next_attack()
 
-            example_successful_attack = self._get_successful_attack(iteration_results)
-            output = self.formatter.format_single_result_with_iterations(
-                attack_name, successful_iterations, blocked_iterations, success_rate, example_successful_attack
-            )
-            print(output)
+            while pending:
+                i, attack, carried_forward, task = pending.popleft()
+                schedule_next_attack()
+                self._announce_attack(i, stats['total_tests'], attack, label, carried_forward)
+                self._record_test_result(stats, carried_forward or await task, label)
+        finally:
+            for *_, task in pending:
+                if task is not None:
+                    task.cancel()
+            if owns_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
 
-        return {
-            'total_tests': total_tests,
-            'total_iterations': total_iterations,
-            'blocked_injections': blocked_injections,
-            'successful_injections': successful_injections,
-            'results': results,
-        }
+        return stats
+
+    def run_model_matrix(
+        self,
+        system_prompt: str,
+        pre_user_message: str,
+        post_user_message: str,
+        attacks_list: List[Dict[str, Any]],
+        model_ids: List[str],
+    ) -> Dict[str, Dict[str, Any]]:
+        return asyncio.run(self.run_model_matrix_async(system_prompt, pre_user_message, post_user_message, attacks_list, model_ids))
+
+    async def run_model_matrix_async(
+        self,
+        system_prompt: str,
+        pre_user_message: str,
+        post_user_message: str,
+        attacks_list: List[Dict[str, Any]],
+        model_ids: List[str],
+    ) -> Dict[str, Dict[str, Any]]:
+        """Run the same attacks against every model at once.
+
+        Each model gets its own pool of `concurrency` workers, since quotas are per model.
+        Returns the stats of each model keyed by model id.
+        """
+        stats_per_model = await asyncio.gather(
+            *(
+                self.run_injection_tests_async(
+                    system_prompt, pre_user_message, post_user_message, attacks_list, model_id, label=model_id.split('.')[-1]
+                )
+                for model_id in model_ids
+            )
+        )
+        return dict(zip(model_ids, stats_per_model))
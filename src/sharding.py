@@ -0,0 +1,147 @@
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import SHARD_RESULTS_DIR
+from helpers.image_cache import image_cache
+from result_sinks import JsonlResultSink
+from runner import add_test_result, new_run_stats
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse 'k/n' into (k, n), with shards numbered from 1."""
+    shard, separator, shards = spec.partition('/')
+    try:
+        shard, shards = int(shard), int(shards)
+    except ValueError:
+        shard = shards = 0
+    if not separator or shards < 1 or not 1 <= shard <= shards:
+        raise ValueError(f"Invalid shard '{spec}'. Expected k/n with 1 <= k <= n, e.g. 2/4")
+    return shard, shards
+
+
+def shard_of(relative_path: str, shards: int) -> int:
+    """Shard (from 1) that runs an attack. A content hash, so every process and machine agrees."""
+    digest = hashlib.sha256(relative_path.replace('\\', '/').encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards + 1
+
+
+def select_shard(attacks: List[Dict[str, Any]], shard: int, shards: int) -> List[Dict[str, Any]]:
+    """All iterations of an attack stay in one shard, so early stopping and deduplication of iterations still apply."""
+    return [attack for attack in attacks if shard_of(attack['relative_path'], shards) == shard]
+
+
+def run_fingerprint(
+    prompt_to_test: Dict[str, Any], selection: Optional[Dict[str, Any]] = None, attacks: Optional[List[Dict[str, Any]]] = None
+) -> str:
+    """Hash of the settings every shard of a run must share to be merged.
+
+    With `attacks`, their contents (and image contents) are included too, so edited attack files change the hash.
+    """
+    settings = {
+        key: prompt_to_test.get(key)
+        for key in ('system_prompt', 'pre_user_message', 'post_user_message', 'model_ids', 'iterations', 'attacks_dir', 'early_stopping')
+    }
+    settings['selection'] = selection
+    if attacks is not None:
+        settings['attacks'] = [
+            {
+                **{key: value for key, value in attack.items() if key not in ('file_path', 'image_path')},
+                'image_sha256': image_cache.get(attack['image_path']).sha256 if attack.get('image_path') else None,
+            }
+            for attack in sorted(attacks, key=lambda attack: attack['relative_path'])
+        ]
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+def default_shard_path(use_case: str, shard: int, shards: int) -> str:
+    return str(Path(SHARD_RESULTS_DIR) / f'{use_case}-{shard}-of-{shards}.jsonl')
+
+
+class ShardResultsFile(JsonlResultSink):
+    """Partial results of one shard, merged with `merge_shard_files`.
+
+    The first line describes the shard and the run it belongs to, then one line per completed
+    attack and model follows. `mark_complete` adds a last line, so merging can refuse shards
+    that did not finish.
+    """
+
+    def __init__(self, path: str, header: Dict[str, Any]) -> None:
+        # A shard is re-run as a whole, so earlier partial results are replaced
+        Path(path).unlink(missing_ok=True)
+        super().__init__(path)
+        self.test_results = 0
+        super().write({'type': 'shard', **header, 'started_at': datetime.now().isoformat()})
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if record.get('type') == 'test_result':
+            self.test_results += 1
+            super().write(record)
+
+    def mark_complete(self) -> None:
+        super().write({'type': 'shard_complete', 'test_results': self.test_results, 'finished_at': datetime.now().isoformat()})
+
+
+def read_shard_file(path: str) -> Dict[str, Any]:
+    header, test_results, complete = None, [], None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('type') == 'shard':
+                header = record
+            elif record.get('type') == 'test_result':
+                test_results.append(record)
+            elif record.get('type') == 'shard_complete':
+                complete = record
+    if header is None:
+        raise ValueError(f'{path} is not a shard results file')
+    return {'path': path, 'header': header, 'test_results': test_results, 'complete': complete}
+
+
+def _check_shards(shard_files: List[Dict[str, Any]]) -> None:
+    first = shard_files[0]['header']
+    for shard_file in shard_files:
+        header = shard_file['header']
+        if header['run_fingerprint'] != first['run_fingerprint'] or header['shards'] != first['shards']:
+            raise ValueError(f'{shard_file["path"]} belongs to a different run than {shard_files[0]["path"]}')
+        if shard_file['complete'] is None:
+            raise ValueError(f'{shard_file["path"]} is incomplete; re-run shard {header["shard"]}/{header["shards"]}')
+
+    shards = [shard_file['header']['shard'] for shard_file in shard_files]
+    duplicates = sorted({shard for shard in shards if shards.count(shard) > 1})
+    if duplicates:
+        raise ValueError(f'Shards given more than once: {", ".join(map(str, duplicates))}')
+    missing = sorted(set(range(1, first['shards'] + 1)) - set(shards))
+    if missing:
+        raise ValueError(f'Missing shards {", ".join(map(str, missing))} of {first["shards"]}')
+
+
+def merge_shard_files(paths: List[str]) -> Dict[str, Any]:
+    """Combine the partial results of every shard into the stats of one run, per model.
+
+    Attacks are ordered by relative path, so the result does not depend on the order of `paths`.
+    """
+    shard_files = [read_shard_file(path) for path in paths]
+    if not shard_files:
+        raise ValueError('No shard results files given')
+    _check_shards(shard_files)
+
+    header = shard_files[0]['header']
+    test_results = sorted(
+        (test_result for shard_file in shard_files for test_result in shard_file['test_results']),
+        key=lambda test_result: test_result['relative_path'],
+    )
+    planned_iterations = header['iterations'] if header.get('early_stopping_enabled') else None
+    stats_per_model = {}
+    for model_id in header['model_ids']:
+        model_results = [test_result for test_result in test_results if test_result.get('model_id') == model_id]
+        stats = new_run_stats(len(model_results))
+        for test_result in model_results:
+            add_test_result(stats, test_result, planned_iterations)
+        stats_per_model[model_id] = stats
+
+    return {'header': header, 'shards': len(shard_files), 'stats': stats_per_model}
@@ -0,0 +1,51 @@
+from typing import Any, Dict, Optional
+
+from config import CACHE_READ_PRICE_FACTOR, CACHE_WRITE_PRICE_FACTOR, MODEL_PRICING_PER_1K_TOKENS
+
+USAGE_FIELDS = ('calls', 'input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens', 'latency_ms')
+
+
+def new_usage() -> Dict[str, Any]:
+    return {'calls': 0, 'input_tokens': 0, 'output_tokens': 0, 'cache_read_tokens': 0, 'cache_write_tokens': 0, 'latency_ms': 0.0}
+
+
+def add_usage(total: Dict[str, Any], usage: Dict[str, Any]) -> Dict[str, Any]:
+    for field in USAGE_FIELDS:
+        total[field] += usage.get(field) or 0
+    return total
+
+
+def iteration_usage(iteration_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Usage of one iteration. Iterations reused from a journal or served from the cache made no call."""
+    if iteration_result.get('latency_ms') is None:
+        return new_usage()
+    return {
+        'calls': 1,
+        'input_tokens': iteration_result.get('input_tokens') or 0,
+        'output_tokens': iteration_result.get('output_tokens') or 0,
+        'cache_read_tokens': iteration_result.get('cache_read_tokens') or 0,
+        'cache_write_tokens': iteration_result.get('cache_write_tokens') or 0,
+        'latency_ms': iteration_result['latency_ms'],
+    }
+
+
+def estimate_cost(
+    model_id: Optional[str], input_tokens: int, output_tokens: int, cache_read_tokens: int = 0, cache_write_tokens: int = 0
+) -> Optional[float]:
+    """Estimated USD cost, or None when the model has no entry in MODEL_PRICING_PER_1K_TOKENS.
+
+    `input_tokens` are the uncached input tokens, as Bedrock reports them next to the cache reads and writes.
+    """
+    if not model_id:
+        return None
+    # Longest name first, so the most specific entry wins
+    for name in sorted(MODEL_PRICING_PER_1K_TOKENS, key=len, reverse=True):
+        if name in model_id:
+            input_price, output_price = MODEL_PRICING_PER_1K_TOKENS[name]
+            cached_input = cache_read_tokens * CACHE_READ_PRICE_FACTOR + cache_write_tokens * CACHE_WRITE_PRICE_FACTOR
+            return ((input_tokens + cached_input) * input_price + output_tokens * output_price) / 1000
+    return None
+
+
+def usage_cost(model_id: Optional[str], usage: Dict[str, Any]) -> Optional[float]:
+    return estimate_cost(model_id, usage['input_tokens'], usage['output_tokens'], usage['cache_read_tokens'], usage['cache_write_tokens'])
@@ -0,0 +1,111 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from src.all_use_cases import SharedResources, discover_use_cases, run_use_cases_async
+from src.prompt_injection_detector import PromptInjectionDetector
+from src.result_formatter import ResultFormatter
+from src.runner import Runner
+
+
+def build_config(model_ids):
+    return {'system_prompt': 'System', 'pre_user_message': 'Pre', 'post_user_message': 'Post', 'model_ids': model_ids}
+
+
+def build_attacks(count, payload='PWNED'):
+    return [{'name': f'Attack {n}', 'prompt': f'Prompt {n}', 'payload': payload, 'relative_path': f'attack_{n}.yaml'} for n in range(count)]
+
+
+class SlowClient:
+    """Answers after a short delay and records the most calls it had in flight."""
+
+    def __init__(self, text='Access Denied'):
+        self.text = text
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def invoke_model(self, model_id, system_prompt, user_message, image_path=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+        return {'content': [{'text': self.text}]}
+
+
+class TestDiscoverUseCases(unittest.TestCase):
+    def test_finds_directories_with_a_prompt_to_test_yaml(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ('b_case', 'a_case', 'attacks_only'):
+                (Path(temp_dir) / name).mkdir()
+            (Path(temp_dir) / 'a_case' / 'prompt_to_test.yaml').write_text('model_id: test')
+            (Path(temp_dir) / 'b_case' / 'prompt_to_test.yaml').write_text('model_id: test')
+
+            self.assertEqual(discover_use_cases(temp_dir), ['a_case', 'b_case'])
+
+    def test_finds_the_repository_use_cases(self):
+        self.assertEqual(discover_use_cases(), ['all_attacks', 'default', 'eferro_custom_gpt', 'proseller-agent'])
+
+
+class TestSharedResources(unittest.TestCase):
+    def test_attacks_directory_is_loaded_once(self):
+        shared = SharedResources()
+        with patch('src.all_use_cases.AttackLoader') as loader_class:
+            loader_class.return_value.load_yaml_attacks.return_value = build_attacks(2)
+
+            first = shared.attacks('use_cases/default/attacks')
+            second = shared.attacks('./use_cases/default/attacks')
+
+        self.assertIs(first, second)
+        loader_class.assert_called_once()
+
+    def test_objects_are_built_once_per_settings(self):
+        shared = SharedResources()
+        build = Mock(side_effect=lambda: object())
+
+        first = shared.get('llm_client', {'a': 1, 'b': 2}, build)
+        same = shared.get('llm_client', {'b': 2, 'a': 1}, build)
+        other = shared.get('llm_client', {'a': 2}, build)
+
+        self.assertIs(first, same)
+        self.assertIsNot(first, other)
+        self.assertEqual(build.call_count, 2)
+        self.assertEqual(len(shared.built('llm_client')), 2)
+
+
+class TestRunUseCases(unittest.TestCase):
+    def _job(self, use_case, client, model_ids, attacks):
+        runner = Runner(PromptInjectionDetector(client), ResultFormatter(), iterations=2)
+        return {'use_case': use_case, 'runner': runner, 'prompt_to_test': build_config(model_ids), 'attacks': attacks}
+
+    def test_returns_the_stats_of_each_use_case_and_model(self):
+        blocked, breached = SlowClient(), SlowClient('PWNED')
+        jobs = [
+            self._job('first', blocked, ['model-a', 'model-b'], build_attacks(2)),
+            self._job('second', breached, ['model-a'], build_attacks(3)),
+        ]
+
+        stats = asyncio.run(run_use_cases_async(jobs, concurrency=3))
+
+        self.assertEqual([list(stats_per_model) for stats_per_model in stats], [['model-a', 'model-b'], ['model-a']])
+        self.assertEqual(stats[0]['model-b']['total_tests'], 2)
+        self.assertEqual(stats[0]['model-a']['successful_injections'], 0)
+        self.assertEqual(stats[1]['model-a']['successful_injections'], 6)
+
+    def test_all_use_cases_share_one_pool_of_model_calls(self):
+        client = SlowClient()
+        jobs = [self._job(f'case_{n}', client, ['model-a'], build_attacks(4)) for n in range(3)]
+
+        asyncio.run(run_use_cases_async(jobs, concurrency=2))
+
+        self.assertEqual(client.max_in_flight, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
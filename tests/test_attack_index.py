@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.attack_index import AttackIndex
+from src.attack_loader import AttackLoader
+
+
+class TestAttackIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.attacks_dir = Path(self.temp_dir.name) / 'attacks'
+        shutil.copytree(Path(__file__).parent / 'test_attacks', self.attacks_dir)
+        self.loader = AttackLoader(str(self.attacks_dir), use_index=True)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def refresh(self):
+        index = AttackIndex(self.loader)
+        try:
+            return index.refresh()
+        finally:
+            index.close()
+
+    def by_path(self, attacks):
+        return {attack['relative_path']: attack for attack in attacks}
+
+    def test_indexed_load_matches_direct_load(self):
+        indexed_attacks = self.loader.load_yaml_attacks()
+        direct_attacks = AttackLoader(str(self.attacks_dir)).load_yaml_attacks()
+
+        self.assertEqual(self.by_path(indexed_attacks), self.by_path(direct_attacks))
+        self.assertTrue((self.attacks_dir / '.attack_index.sqlite').exists())
+
+    def test_unchanged_files_are_not_parsed_again(self):
+        self.assertEqual(self.refresh(), {'parsed': 4, 'touched': 0, 'removed': 0})
+        self.assertEqual(self.refresh(), {'parsed': 0, 'touched': 0, 'removed': 0})
+
+    def test_only_edited_files_are_parsed(self):
+        self.refresh()
+        attack_file = self.attacks_dir / 'valid_attack.yaml'
+        attack_file.write_text(attack_file.read_text(encoding='utf-8').replace('Test Attack Valid', 'Edited Attack'), encoding='utf-8')
+
+        self.assertEqual(self.refresh(), {'parsed': 1, 'touched': 0, 'removed': 0})
+        self.assertIn('Edited Attack', [attack['name'] for attack in self.loader.load_yaml_attacks()])
+
+    def test_touched_file_with_same_content_is_not_parsed(self):
+        self.refresh()
+        attack_file = self.attacks_dir / 'valid_attack.yaml'
+        stat = attack_file.stat()
+        os.utime(attack_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        self.assertEqual(self.refresh(), {'parsed': 0, 'touched': 1, 'removed': 0})
+        self.assertEqual(self.refresh(), {'parsed': 0, 'touched': 0, 'removed': 0})
+
+    def test_removed_and_added_files(self):
+        self.refresh()
+        (self.attacks_dir / 'safe_prompt.yaml').unlink()
+        (self.attacks_dir / 'nested').mkdir()
+        shutil.copy(self.attacks_dir / 'valid_attack.yaml', self.attacks_dir / 'nested' / 'copy.yaml')
+
+        self.assertEqual(self.refresh(), {'parsed': 1, 'touched': 0, 'removed': 1})
+        self.assertIn(str(Path('nested') / 'copy.yaml'), self.by_path(self.loader.load_yaml_attacks()))
+
+    def test_broken_yaml_is_reported_and_skipped(self):
+        (self.attacks_dir / 'broken.yaml').write_text('name: [unclosed', encoding='utf-8')
+
+        attacks = self.loader.load_yaml_attacks()
+
+        self.assertEqual(len(attacks), 4)
+
+    def test_parallel_cold_build(self):
+        with patch('src.attack_index.ATTACK_INDEX_PARALLEL_THRESHOLD', 1), patch('attack_index.ATTACK_INDEX_PARALLEL_THRESHOLD', 1):
+            self.assertEqual(self.refresh(), {'parsed': 4, 'touched': 0, 'removed': 0})
+
+        self.assertEqual(len(self.loader.load_yaml_attacks()), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
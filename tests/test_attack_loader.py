@@ -1,3 +1,5 @@
+import shutil
+import tempfile
 import unittest
 from pathlib import Path
 
@@ -40,6 +42,15 @@ class TestAttackLoader(unittest.TestCase):
         self.assertEqual(valid_attack['type'], 'test injection')
         self.assertEqual(unicode_attack['type'], 'unicode test')
 
+    def test_prompt_to_test_next_to_the_attacks_is_not_an_attack(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shutil.copy(self.test_attacks_dir / 'valid_attack.yaml', temp_dir)
+            (Path(temp_dir) / 'prompt_to_test.yaml').write_text(f'model_id: test\nattacks_dir: {temp_dir}\n')
+
+            loaded_attacks = AttackLoader(temp_dir).load_yaml_attacks()
+
+        self.assertEqual([attack['filename'] for attack in loaded_attacks], ['valid_attack.yaml'])
+
     def test_yaml_parsing_with_unicode(self):
         yaml_file = self.test_attacks_dir / 'unicode_attack.yaml'
 
@@ -0,0 +1,86 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.attack_index import AttackIndex, parse_yaml_file
+from src.attack_loader import AttackLoader
+from src.attack_selector import AttackSelector, parse_terms
+
+
+class TestAttackSelector(unittest.TestCase):
+    def test_parse_terms(self):
+        criteria = parse_terms(['taxonomy=jailbreak,language=en', 'taxonomy=base64'])
+
+        self.assertEqual(criteria, {'prompt_taxonomy': ['jailbreak', 'base64'], 'language': ['en']})
+
+    def test_parse_rejects_unknown_field(self):
+        with self.assertRaises(ValueError):
+            parse_terms(['colour=red'])
+        with self.assertRaises(ValueError):
+            parse_terms(['language'])
+
+    def test_fields_are_and_ed_and_values_or_ed(self):
+        selector = AttackSelector.parse(['taxonomy=jailbreak,taxonomy=base64,language=en'])
+
+        self.assertTrue(selector.matches({'prompt_taxonomy': 'Jailbreak', 'language': 'en'}))
+        self.assertTrue(selector.matches({'prompt_taxonomy': 'base64', 'language': 'EN'}))
+        self.assertFalse(selector.matches({'prompt_taxonomy': 'jailbreak', 'language': 'es'}))
+        self.assertFalse(selector.matches({'language': 'en'}))
+
+    def test_exclude_path_glob(self):
+        selector = AttackSelector.parse(exclude_terms=['path=distraction/long_prompt_*'])
+
+        self.assertFalse(selector.matches_path('distraction/long_prompt_1.yaml'))
+        self.assertTrue(selector.matches_path('distraction/short_prompt.yaml'))
+
+    def test_path_without_extension(self):
+        selector = AttackSelector.parse(['path=injection/base64'])
+
+        self.assertTrue(selector.matches_path('injection/base64.yaml'))
+        self.assertFalse(selector.matches_path('injection/base64_long.yaml'))
+
+
+class TestAttackSelection(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.attacks_dir = Path(self.temp_dir.name) / 'attacks'
+        shutil.copytree(Path(__file__).parent / 'test_attacks', self.attacks_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def load_names(self, use_index, select=None, exclude=None):
+        loader = AttackLoader(str(self.attacks_dir), use_index=use_index)
+        return sorted(attack['name'] for attack in loader.load_yaml_attacks(AttackSelector.parse(select, exclude)))
+
+    def test_indexed_and_direct_selection_agree(self):
+        for use_index in (True, False):
+            with self.subTest(use_index=use_index):
+                self.assertEqual(self.load_names(use_index, ['type=*injection']), ['Basic Injection Test', 'Test Attack Valid'])
+                self.assertEqual(
+                    self.load_names(use_index, exclude=['path=valid_*,path=safe_*']), ['Basic Injection Test', 'Test Attack with émojis 🚀']
+                )
+
+    def test_unselected_paths_are_not_parsed(self):
+        with patch('src.attack_index.parse_yaml_file', wraps=parse_yaml_file) as parse:
+            loader = AttackLoader(str(self.attacks_dir), use_index=True)
+            index = AttackIndex(loader)
+            try:
+                index.load_attacks(AttackSelector.parse(['path=injection_attack']))
+            finally:
+                index.close()
+
+        self.assertEqual(parse.call_count, 1)
+
+    def test_index_answers_field_selection_without_parsing(self):
+        self.load_names(True)
+        with patch('src.attack_index.parse_yaml_file') as parse:
+            self.assertEqual(self.load_names(True, ['type=unicode*']), ['Test Attack with émojis 🚀'])
+
+        parse.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
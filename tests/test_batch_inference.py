@@ -0,0 +1,115 @@
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from src.batch_inference import (
+    BatchRequestExporter,
+    BatchResultIngestor,
+    LocalBatchService,
+    default_manifest_path_for_output,
+    make_record_id,
+)
+from src.prompt_injection_detector import PromptInjectionDetector
+from src.result_formatter import ResultFormatter
+
+
+def respond_with_anthropic_output(model_id, model_input):
+    user_text = model_input['messages'][0]['content'][-1]['text']
+    text = 'Access Denied' if 'prompt 1' in user_text else 'Here is your answer'
+    return {'content': [{'type': 'text', 'text': text}], 'stop_reason': 'end_turn'}
+
+
+class TestBatchInference(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = str(Path(self.temp_dir.name) / 'batch_input.jsonl')
+        self.attacks = [
+            {'name': 'Test Attack 1', 'prompt': 'Test prompt 1', 'payload': 'Access Denied', 'relative_path': 'a/attack_1.yaml'},
+            {'name': 'Test Attack 2', 'prompt': 'Test prompt 2', 'payload': 'Access Denied', 'relative_path': 'b/attack_2.yaml'},
+        ]
+        self.model_id = 'anthropic.claude-3-haiku-20240307-v1:0'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def export(self, model_id=None):
+        exporter = BatchRequestExporter(iterations=3)
+        return exporter.export(self.input_path, 'System', 'Pre', 'Post', self.attacks, model_id or self.model_id)
+
+    def test_export_refuses_unsupported_models_before_writing(self):
+        with self.assertRaisesRegex(ValueError, 'meta.llama3'):
+            self.export('meta.llama3-70b-instruct-v1:0')
+
+        self.assertFalse(Path(self.input_path).exists())
+
+    def test_export_writes_one_record_per_iteration_with_stable_ids(self):
+        self.assertEqual(self.export(), 6)
+
+        with open(self.input_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(records[0]['recordId'], make_record_id('a/attack_1.yaml', 0))
+        self.assertEqual(len({record['recordId'] for record in records}), 6)
+        self.assertEqual(records[0]['modelInput']['system'], 'System')
+        self.assertIn('Test prompt 1', records[0]['modelInput']['messages'][0]['content'][-1]['text'])
+        self.assertEqual(make_record_id('a/attack_1.yaml', 0), make_record_id('a/attack_1.yaml', 0))
+        self.assertEqual(len(make_record_id('a/attack_1.yaml', 0)), 11)
+
+    def test_export_nova_request_format(self):
+        self.export('eu.amazon.nova-lite-v1:0')
+
+        with open(self.input_path, encoding='utf-8') as f:
+            model_input = json.loads(f.readline())['modelInput']
+
+        self.assertEqual(model_input['schemaVersion'], 'messages-v1')
+        self.assertEqual(model_input['system'], [{'text': 'System'}])
+
+    def test_local_batch_service_end_to_end(self):
+        self.export()
+        service = LocalBatchService(str(Path(self.temp_dir.name) / 'jobs'), respond_with_anthropic_output)
+
+        job_id = service.create_job(self.input_path, self.model_id)
+        service.run_job(job_id)
+        output_path = str(service.get_output_path(job_id))
+
+        ingestor = BatchResultIngestor(PromptInjectionDetector(None), ResultFormatter())
+        output = StringIO()
+        with redirect_stdout(output):
+            stats = ingestor.ingest(output_path, f'{self.input_path}.manifest.json')
+
+        self.assertIn('Test 1/2: a/attack_1.yaml - Test Attack 1 - Scoring 3 responses...', output.getvalue())
+        self.assertNotIn('Running', output.getvalue())
+        self.assertEqual(service.get_status(job_id)['status'], 'Completed')
+        self.assertTrue(output_path.endswith('batch_input.jsonl.out'))
+        self.assertEqual(stats['total_tests'], 2)
+        self.assertEqual(stats['total_iterations'], 6)
+        self.assertEqual(stats['successful_injections'], 3)
+        self.assertEqual(stats['blocked_injections'], 3)
+        self.assertEqual([r['name'] for r in stats['results']], ['Test Attack 1', 'Test Attack 2'])
+        self.assertEqual(stats['results'][0]['success_rate'], 100.0)
+
+    def test_failed_records_are_not_counted(self):
+        self.export()
+        output_path = Path(self.temp_dir.name) / 'batch_input.jsonl.out'
+        with open(self.input_path, encoding='utf-8') as source, open(output_path, 'w', encoding='utf-8') as target:
+            for n, line in enumerate(source):
+                record = json.loads(line)
+                if n == 0:
+                    record['error'] = {'errorMessage': 'Throttled'}
+                else:
+                    record['modelOutput'] = {'output': {'message': {'content': [{'text': 'Access Denied'}]}}}
+                target.write(json.dumps(record) + '\n')
+
+        ingestor = BatchResultIngestor(PromptInjectionDetector(None), ResultFormatter())
+        stats = ingestor.ingest(str(output_path), str(default_manifest_path_for_output(str(output_path))))
+
+        self.assertEqual(stats['total_iterations'], 5)
+        self.assertEqual(stats['successful_injections'], 5)
+        self.assertEqual(stats['results'][0]['iterations'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
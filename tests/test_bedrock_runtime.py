@@ -0,0 +1,51 @@
+import unittest
+
+from src.helpers.bedrock_runtime import BedrockRuntimeClients, ConnectionSettings
+
+
+class TestConnectionSettings(unittest.TestCase):
+    def test_defaults_use_adaptive_retries_and_keepalive(self):
+        config = ConnectionSettings().to_botocore_config()
+
+        self.assertEqual(config.retries, {'mode': 'adaptive', 'total_max_attempts': 3})
+        self.assertTrue(config.tcp_keepalive)
+        self.assertEqual(config.max_pool_connections, 50)
+
+    def test_pool_grows_with_concurrency(self):
+        self.assertEqual(ConnectionSettings.from_config(None, concurrency=200).max_pool_connections, 200)
+        self.assertEqual(ConnectionSettings.from_config(None, concurrency=4).max_pool_connections, 50)
+
+    def test_config_overrides_defaults(self):
+        settings = ConnectionSettings.from_config(
+            {'max_pool_connections': 8, 'read_timeout': 30, 'retry_mode': 'standard'}, concurrency=200
+        )
+
+        self.assertEqual(settings.max_pool_connections, 8)
+        self.assertEqual(settings.read_timeout, 30)
+        self.assertEqual(settings.to_botocore_config().retries['mode'], 'standard')
+
+    def test_rejects_unknown_settings(self):
+        with self.assertRaisesRegex(ValueError, 'max_connections'):
+            ConnectionSettings.from_config({'max_connections': 8})
+
+
+class TestBedrockRuntimeClients(unittest.TestCase):
+    def setUp(self):
+        self.clients = BedrockRuntimeClients()
+
+    def test_same_key_returns_shared_client(self):
+        first = self.clients.get(None, 'eu-central-1', settings=ConnectionSettings())
+        second = self.clients.get(None, 'eu-central-1', settings=ConnectionSettings())
+
+        self.assertIs(first, second)
+        self.assertEqual(first.meta.config.max_pool_connections, 50)
+
+    def test_different_region_or_settings_get_their_own_client(self):
+        base = self.clients.get(None, 'eu-central-1')
+
+        self.assertIsNot(base, self.clients.get(None, 'us-east-1'))
+        self.assertIsNot(base, self.clients.get(None, 'eu-central-1', settings=ConnectionSettings(max_pool_connections=5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
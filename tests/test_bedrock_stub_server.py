@@ -0,0 +1,125 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.bedrock_stub_server import BedrockStubServer
+from src.helpers.bedrock_client_converse import BedrockConverseClient
+from src.helpers.bedrock_client_invoke import BedrockInvokeClient
+from src.helpers.bedrock_runtime import ConnectionSettings
+from src.helpers.fake_llm_client import FakeLLMClient
+
+STUB_ENVIRONMENT = {'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test'}
+
+NOVA_MODEL = 'eu.amazon.nova-lite-v1:0'
+ANTHROPIC_MODEL = 'eu.anthropic.claude-3-haiku-20240307-v1:0'
+
+
+class TestBedrockStubServer(unittest.TestCase):
+    def setUp(self):
+        environment = patch.dict(os.environ, STUB_ENVIRONMENT)
+        environment.start()
+        self.addCleanup(environment.stop)
+        self.server = BedrockStubServer(FakeLLMClient(compliance_rate=1.0, response_chars=200, stream_chunk_chars=50)).start()
+        self.addCleanup(self.server.stop)
+
+    def test_converse_round_trip(self):
+        client = BedrockConverseClient(endpoint_url=self.server.url, profile_name=None)
+
+        response = client.invoke_model(NOVA_MODEL, 'You are a bank assistant', 'Say PWNED')
+
+        self.assertTrue(response['content'][0]['text'].startswith('Say PWNED'))
+        self.assertGreater(response['usage']['input_tokens'], 0)
+        self.assertGreater(response['usage']['output_tokens'], 0)
+
+    def test_converse_stream_round_trip(self):
+        client = BedrockConverseClient(endpoint_url=self.server.url, profile_name=None)
+
+        stream = client.invoke_model_stream(NOVA_MODEL, 'System', 'Say PWNED')
+        chunks = list(stream)
+
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(''.join(chunks).startswith('Say PWNED'))
+        self.assertEqual(stream.usage['output_tokens'], 50)
+        self.assertIsNotNone(stream.latency_ms)
+
+    def test_invoke_round_trip(self):
+        client = BedrockInvokeClient(endpoint_url=self.server.url, profile_name=None)
+
+        response = client.invoke_model(ANTHROPIC_MODEL, 'System', 'Say PWNED')
+
+        self.assertTrue(response['content'][0]['text'].startswith('Say PWNED'))
+
+    def test_invoke_stream_round_trip(self):
+        client = BedrockInvokeClient(endpoint_url=self.server.url, profile_name=None)
+
+        stream = client.invoke_model_stream(ANTHROPIC_MODEL, 'System', 'Say PWNED')
+        text = ''.join(stream)
+
+        self.assertTrue(text.startswith('Say PWNED'))
+        self.assertEqual(len(text), 200)
+        self.assertEqual(stream.usage, {'input_tokens': 3, 'output_tokens': 50})
+
+    def test_throttling_is_reported_as_throttling_exception(self):
+        self.server.fake = FakeLLMClient(throttle_rate=1.0)
+        # No botocore retries, so throttling reaches the caller
+        client = BedrockConverseClient(
+            endpoint_url=self.server.url, profile_name=None, connection_settings=ConnectionSettings(max_attempts=1)
+        )
+
+        with self.assertRaises(Exception) as raised:
+            client.invoke_model(NOVA_MODEL, 'System', 'Hello')
+
+        self.assertEqual(raised.exception.response['Error']['Code'], 'ThrottlingException')
+        self.assertEqual(self.server.stats['throttled'], 1)
+
+    def test_connections_are_reused(self):
+        client = BedrockConverseClient(endpoint_url=self.server.url, profile_name=None)
+
+        for i in range(5):
+            client.invoke_model(NOVA_MODEL, 'System', f'Hello {i}')
+
+        self.assertEqual(self.server.stats['requests'], 5)
+        self.assertEqual(self.server.stats['connections'], 1)
+
+    def test_clients_share_the_connection_pool(self):
+        converse_client = BedrockConverseClient(endpoint_url=self.server.url, profile_name=None)
+        invoke_client = BedrockInvokeClient(endpoint_url=self.server.url, profile_name=None)
+
+        converse_client.invoke_model(NOVA_MODEL, 'System', 'Hello')
+        invoke_client.invoke_model(ANTHROPIC_MODEL, 'System', 'Hello')
+
+        self.assertIs(converse_client.client, invoke_client.client)
+        self.assertEqual(self.server.stats['connections'], 1)
+
+
+class TestOfflineRecipe(unittest.TestCase):
+    def test_main_runs_against_the_stub_with_an_empty_aws_profile(self):
+        # The recipe from the bedrock_stub_server docstring, through config.py and main.py as a user runs it
+        server = BedrockStubServer(FakeLLMClient()).start()
+        self.addCleanup(server.stop)
+        environment = {
+            **os.environ,
+            **STUB_ENVIRONMENT,
+            'AWS_ENDPOINT_URL_BEDROCK_RUNTIME': server.url,
+            'AWS_PROFILE': '',
+            'AWS_CONFIG_FILE': os.devnull,
+            'AWS_SHARED_CREDENTIALS_FILE': os.devnull,
+        }
+
+        result = subprocess.run(
+            [sys.executable, 'src/main.py', '--no-store', '--no-cache'],
+            cwd=Path(__file__).parent.parent,
+            env=environment,
+            capture_output=True,
+            text=True,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertGreater(server.stats['requests'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from src.early_stopping import EarlyStopping, wilson_interval
+
+
+class TestEarlyStopping(unittest.TestCase):
+    def test_wilson_interval_known_values(self):
+        low, high = wilson_interval(0, 10)
+
+        self.assertAlmostEqual(low, 0.0)
+        self.assertAlmostEqual(high, 0.2775, places=3)
+
+    def test_wilson_interval_without_trials(self):
+        self.assertEqual(wilson_interval(0, 0), (0.0, 1.0))
+
+    def test_fixed_mode_never_decides(self):
+        policy = EarlyStopping()
+
+        self.assertFalse(policy.enabled)
+        self.assertFalse(policy.is_decided(20, 20))
+
+    def test_any_breach_stops_at_first_success(self):
+        policy = EarlyStopping(mode='any_breach')
+
+        self.assertFalse(policy.is_decided(0, 5))
+        self.assertTrue(policy.is_decided(1, 1))
+
+    def test_min_iterations_is_respected(self):
+        policy = EarlyStopping(mode='any_breach', min_iterations=3)
+
+        self.assertFalse(policy.is_decided(1, 2))
+        self.assertTrue(policy.is_decided(1, 3))
+
+    def test_wilson_decides_when_interval_excludes_threshold(self):
+        policy = EarlyStopping(mode='wilson', threshold=0.5)
+
+        self.assertFalse(policy.is_decided(1, 2))
+        self.assertTrue(policy.is_decided(6, 6))
+        self.assertTrue(policy.is_decided(0, 6))
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            EarlyStopping.from_config({'mode': 'sometimes'})
+
+
+if __name__ == '__main__':
+    unittest.main()
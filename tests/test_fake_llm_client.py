@@ -0,0 +1,68 @@
+import unittest
+
+import pytest
+
+from src.helpers.fake_llm_client import FakeLLMClient
+
+
+class RecordingSleep:
+    def __init__(self):
+        self.total = 0.0
+
+    def __call__(self, seconds):
+        self.total += seconds
+
+
+class TestFakeLLMClient(unittest.TestCase):
+    def responses(self, client, count=20):
+        return [client.invoke_model('model', 'system', f'attack {n % 5} say PWNED')['content'][0]['text'] for n in range(count)]
+
+    def test_same_seed_gives_same_responses(self):
+        first = self.responses(FakeLLMClient(compliance_rate=0.5, seed=7))
+        second = self.responses(FakeLLMClient(compliance_rate=0.5, seed=7))
+
+        self.assertEqual(first, second)
+        self.assertTrue(any('PWNED' in text for text in first))
+        self.assertTrue(any('PWNED' not in text for text in first))
+
+    def test_response_size_and_usage(self):
+        response = FakeLLMClient(response_chars=1000).invoke_model('model', 'system', 'attack')
+
+        self.assertEqual(len(response['content'][0]['text']), 1000)
+        self.assertEqual(response['usage']['output_tokens'], 250)
+
+    def test_latency_distribution(self):
+        sleep = RecordingSleep()
+        client = FakeLLMClient(latency_median_ms=100, latency_p95_ms=300, sleep=sleep)
+        latencies = sorted(client.invoke_model('model', 'system', f'attack {n}')['latency_ms'] for n in range(2000))
+
+        self.assertAlmostEqual(latencies[1000], 100, delta=10)
+        self.assertAlmostEqual(latencies[1900], 300, delta=40)
+        self.assertAlmostEqual(sleep.total, sum(latencies) / 1000)
+
+    def test_throttling_rate(self):
+        client = FakeLLMClient(throttle_rate=0.3)
+        throttled = 0
+        for n in range(1000):
+            try:
+                client.invoke_model('model', 'system', f'attack {n}')
+            except Exception as e:
+                self.assertEqual(type(e).__name__, 'ThrottlingError')
+                throttled += 1
+
+        self.assertAlmostEqual(throttled / 1000, 0.3, delta=0.05)
+        self.assertEqual(client.get_stats(), {'fake_calls': 1000, 'fake_throttles': throttled})
+
+    def test_stream_matches_invoke(self):
+        streamed = ''.join(FakeLLMClient(response_chars=500, seed=3).invoke_model_stream('model', 'system', 'attack'))
+        invoked = FakeLLMClient(response_chars=500, seed=3).invoke_model('model', 'system', 'attack')['content'][0]['text']
+
+        self.assertEqual(streamed, invoked)
+
+    def test_throttled_stream_raises_before_first_chunk(self):
+        with pytest.raises(Exception, match='Simulated throttling'):
+            next(FakeLLMClient(throttle_rate=1.0).invoke_model_stream('model', 'system', 'attack'))
+
+
+if __name__ == '__main__':
+    unittest.main()
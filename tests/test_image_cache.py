@@ -0,0 +1,56 @@
+import base64
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.helpers.image_cache import ImageCache, get_media_type
+
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.image_path = Path(self.temp_dir.name) / 'image_black.jpeg'
+        shutil.copy(Path(__file__).parent / 'test_attacks' / 'image_black.jpeg', self.image_path)
+        self.cache = ImageCache()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_payload_holds_bytes_and_base64(self):
+        payload = self.cache.get(str(self.image_path))
+
+        self.assertEqual(payload.data, self.image_path.read_bytes())
+        self.assertEqual(base64.b64decode(payload.base64), payload.data)
+        self.assertEqual(payload.media_type, 'image/jpeg')
+        self.assertEqual(payload.format, 'jpeg')
+
+    def test_same_path_returns_cached_payload(self):
+        self.assertIs(self.cache.get(str(self.image_path)), self.cache.get(str(self.image_path)))
+
+    def test_identical_content_shares_payload(self):
+        copy_path = Path(self.temp_dir.name) / 'copy.jpeg'
+        shutil.copy(self.image_path, copy_path)
+
+        self.assertIs(self.cache.get(str(self.image_path)), self.cache.get(str(copy_path)))
+
+    def test_modified_file_is_reloaded(self):
+        first = self.cache.get(str(self.image_path))
+        self.image_path.write_bytes(b'new image content')
+        stat = self.image_path.stat()
+        os.utime(self.image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        second = self.cache.get(str(self.image_path))
+
+        self.assertNotEqual(first.sha256, second.sha256)
+        self.assertEqual(second.data, b'new image content')
+
+    def test_media_type_from_extension(self):
+        self.assertEqual(get_media_type('image.PNG'), 'image/png')
+        self.assertEqual(get_media_type('image.webp'), 'image/webp')
+        self.assertEqual(get_media_type('image.unknown'), 'image/jpeg')
+
+
+if __name__ == '__main__':
+    unittest.main()
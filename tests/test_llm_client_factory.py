@@ -10,3 +10,68 @@ def test_factory_creates_converse_client():
 
     client = create_llm_client('converse')
     assert client.__class__.__name__ == 'BedrockConverseClient'
+
+
+def test_factory_creates_fake_client():
+    from src.helpers.llm_client_factory import create_llm_client
+
+    client = create_llm_client('fake')
+    assert client.__class__.__name__ == 'FakeLLMClient'
+
+
+def test_fake_client_drops_default_connection_settings_silently(capsys):
+    from src.helpers.bedrock_runtime import ConnectionSettings
+    from src.helpers.llm_client_factory import create_llm_client
+
+    create_llm_client('fake', ConnectionSettings())
+
+    assert capsys.readouterr().out == ''
+
+
+def test_fake_client_reports_requested_prompt_cache(capsys):
+    from src.helpers.llm_client_factory import create_llm_client
+
+    create_llm_client('fake', prompt_cache={'system_prompt': True})
+
+    assert 'does not support prompt_cache' in capsys.readouterr().out
+
+
+def test_factory_rejects_unknown_client():
+    import pytest
+    from src.helpers.llm_client_factory import create_llm_client
+
+    with pytest.raises(ValueError, match='Unknown client type: bogus'):
+        create_llm_client('bogus')
+
+
+def test_factory_does_not_import_providers_until_used():
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    code = (
+        'import sys; import helpers.llm_client_factory, main; '
+        "print(sorted(name for name in sys.modules if name.split('.')[0] in ('boto3', 'botocore') "
+        "or name in ('helpers.bedrock_client_converse', 'helpers.bedrock_client_invoke')))"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=Path(__file__).parent.parent / 'src', capture_output=True, text=True, check=True
+    ).stdout
+
+    assert output.strip() == '[]'
+
+
+def test_importing_bedrock_clients_does_not_import_boto3():
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    code = (
+        'import sys; import helpers.bedrock_client_converse, helpers.bedrock_client_invoke; '
+        "print(sorted(name for name in sys.modules if name.split('.')[0] in ('boto3', 'botocore')))"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=Path(__file__).parent.parent / 'src', capture_output=True, text=True, check=True
+    ).stdout
+
+    assert output.strip() == '[]'
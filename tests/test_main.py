@@ -0,0 +1,39 @@
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from src.main import main, run_tests
+
+
+class TestCliResults(unittest.TestCase):
+    def _main(self, *argv):
+        stats = []
+        with (
+            patch('sys.argv', ['main.py', '--client', 'fake', '--no-store', '--no-cache', *argv]),
+            patch('src.main.run_tests', side_effect=lambda *args: stats.append(run_tests(*args))),
+            redirect_stdout(StringIO()),
+        ):
+            main()
+        return stats[0]
+
+    def test_results_keep_responses_by_default(self):
+        stats = self._main()
+
+        self.assertTrue(stats['results'])
+        for test_result in stats['results']:
+            self.assertEqual(len(test_result['iteration_results']), test_result['iterations'])
+            self.assertIn('response_text', test_result['iteration_results'][0])
+
+    def test_results_drop_responses_streamed_to_a_results_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stats = self._main('--results-jsonl', str(Path(temp_dir) / 'results.jsonl'))
+
+        self.assertTrue(stats['results'])
+        self.assertTrue(all('iteration_results' not in test_result for test_result in stats['results']))
+
+
+if __name__ == '__main__':
+    unittest.main()
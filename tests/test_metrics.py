@@ -0,0 +1,135 @@
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from src.helpers.llm_client import ResponseStream
+from src.metrics import Histogram, InstrumentedClient, MetricsRegistry, MetricsReporter, MetricsSink
+
+
+class ClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}}
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles_are_interpolated_within_buckets(self):
+        histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+        for value in [0.5] * 50 + [1.5] * 45 + [3.0] * 5:
+            histogram.observe(value)
+
+        self.assertAlmostEqual(histogram.quantile(0.5), 1.0)
+        self.assertAlmostEqual(histogram.quantile(0.95), 2.0)
+        self.assertAlmostEqual(histogram.quantile(0.99), 3.0)
+        self.assertEqual(list(histogram.cumulative_counts()), [('1.0', 50), ('2.0', 95), ('4.0', 100), ('+Inf', 100)])
+
+    def test_empty_histogram_has_no_quantiles(self):
+        self.assertIsNone(Histogram().quantile(0.5))
+
+
+class TestInstrumentedClient(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.inner_client = Mock()
+        self.client = InstrumentedClient(self.inner_client, self.registry)
+
+    def test_records_outcomes_and_latency(self):
+        self.inner_client.invoke_model.side_effect = [{'content': [{'text': 'ok'}]}, ClientError('ThrottlingException'), ValueError()]
+
+        self.client.invoke_model('model', 'system', 'user')
+        with pytest.raises(ClientError):
+            self.client.invoke_model('model', 'system', 'user')
+        with pytest.raises(ValueError):
+            self.client.invoke_model('model', 'system', 'user')
+
+        self.assertEqual(self.registry.calls, {('model', 'ok'): 1, ('model', 'throttled'): 1, ('model', 'error'): 1})
+        self.assertEqual(self.registry.latency['model'].count, 1)
+        self.assertEqual(self.registry.in_flight, 0)
+        self.assertEqual(self.registry.max_in_flight, 1)
+
+    def test_stream_is_in_flight_until_closed(self):
+        self.inner_client.invoke_model_stream.side_effect = lambda *args: ResponseStream(['a', 'b'])
+
+        chunks = self.client.invoke_model_stream('model', 'system', 'user')
+        next(chunks)
+        self.assertEqual(self.registry.in_flight, 1)
+        chunks.close()
+
+        self.assertEqual(self.registry.in_flight, 0)
+        self.assertEqual(self.registry.calls, {('model', 'ok'): 1})
+
+
+class TestMetricsExport(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.registry.call_started()
+        self.registry.call_finished('eu.amazon.nova-lite-v1:0', 'ok', 0.4)
+        sink = MetricsSink(self.registry)
+        sink.write({'type': 'iteration', 'injection_detected': True})
+        sink.write({'type': 'test_result'})
+
+    def test_render_openmetrics(self):
+        text = self.registry.render()
+
+        self.assertIn('# TYPE prompt_security_model_call_latency_seconds histogram', text)
+        self.assertIn('prompt_security_model_call_latency_seconds_bucket{model="eu.amazon.nova-lite-v1:0",le="0.5"} 1', text)
+        self.assertIn('# TYPE prompt_security_model_calls counter', text)
+        self.assertIn('prompt_security_model_calls_total{model="eu.amazon.nova-lite-v1:0",outcome="ok"} 1', text)
+        self.assertIn('prompt_security_tests_completed_total 1', text)
+        self.assertTrue(text.endswith('# EOF\n'))
+
+    def test_render_prometheus_text_format(self):
+        text = self.registry.render(openmetrics=False)
+
+        self.assertIn('# TYPE prompt_security_model_calls_total counter', text)
+        self.assertNotIn('# EOF', text)
+
+    def test_reporter_writes_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / 'metrics' / 'run.prom'
+
+            MetricsReporter(self.registry, path=str(path)).start().stop()
+
+            self.assertIn('prompt_security_successful_injections_total 1', path.read_text(encoding='utf-8'))
+            self.assertEqual([file.name for file in path.parent.iterdir()], ['run.prom'])
+
+    def test_reporter_pushes_to_collector(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_PUT(self):
+                received.append((self.path, self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/metrics/job/prompt_security'
+            MetricsReporter(self.registry, push_url=url).stop()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(received[0][0], '/metrics/job/prompt_security')
+        self.assertIn('prompt_security_tests_completed_total 1', received[0][1])
+
+    def test_summary(self):
+        summary = self.registry.summary()
+
+        self.assertEqual(summary['calls'], {'ok': 1})
+        self.assertEqual(summary['max_in_flight'], 1)
+        self.assertIsNotNone(summary['latency_p95_ms'])
+
+
+if __name__ == '__main__':
+    unittest.main()
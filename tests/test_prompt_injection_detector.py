@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import Mock
 
+from src.helpers.llm_client import ResponseStream
 from src.prompt_injection_detector import PromptInjectionDetector
 
 
@@ -67,5 +68,94 @@ class TestPromptInjectionDetector(unittest.TestCase):
         self.mock_bedrock_client.invoke_model.assert_called_once_with(model_id, system_prompt, user_message, image_path)
 
 
+class StreamingClient:
+    def __init__(self, chunks, response=None):
+        self.chunks = chunks
+        self.response = response
+        self.read = 0
+        self.closed = False
+
+    def invoke_model_stream(self, model_id, system_prompt, user_prompt, image_path=None):
+        return ResponseStream(self._stream())
+
+    def _stream(self):
+        try:
+            for chunk in self.chunks:
+                self.read += 1
+                yield chunk
+        finally:
+            self.closed = True
+        return self.response
+
+
+class TestPromptInjectionDetectorStreaming(unittest.TestCase):
+    def test_stops_reading_once_payload_is_found(self):
+        client = StreamingClient(['Sure, I am HIJ', 'ACKED now', ' and here is', ' a very long ramble'])
+        detector = PromptInjectionDetector(client, stream=True)
+
+        result = detector.detect_injection('system', 'attack', 'HIJACKED', 'test-model')
+
+        self.assertTrue(result['injection_detected'])
+        self.assertEqual(result['response_text'], 'Sure, I am HIJACKED now')
+        self.assertEqual(client.read, 2)
+        self.assertTrue(client.closed)
+        self.assertEqual(detector.get_stats(), {'streams_stopped_on_payload': 1, 'streams_stopped_on_budget': 0})
+
+    def test_stops_reading_at_character_budget(self):
+        client = StreamingClient(['abcde', 'fghij', 'HIJACKED'])
+        detector = PromptInjectionDetector(client, stream=True, max_response_chars=7)
+
+        result = detector.detect_injection('system', 'attack', 'HIJACKED', 'test-model')
+
+        self.assertFalse(result['injection_detected'])
+        self.assertEqual(result['response_text'], 'abcdefg')
+        self.assertEqual(client.read, 2)
+        self.assertEqual(detector.get_stats(), {'streams_stopped_on_payload': 0, 'streams_stopped_on_budget': 1})
+
+    def test_complete_stream_is_evaluated_as_a_whole(self):
+        client = StreamingClient(['I cannot ', 'help with that'])
+        detector = PromptInjectionDetector(client, stream=True)
+
+        result = detector.detect_injection('system', 'attack', 'HIJACKED', 'test-model')
+
+        self.assertFalse(result['injection_detected'])
+        self.assertEqual(result['response_text'], 'I cannot help with that')
+
+    def test_complete_stream_reports_the_usage_of_the_call(self):
+        usage = {'input_tokens': 12, 'output_tokens': 4, 'cache_read_tokens': 8, 'cache_write_tokens': 0}
+        client = StreamingClient(['I cannot ', 'help with that'], {'usage': usage, 'latency_ms': 250})
+        detector = PromptInjectionDetector(client, stream=True)
+
+        result = detector.detect_injection('system', 'attack', 'HIJACKED', 'test-model')
+
+        self.assertEqual({key: result[key] for key in usage}, usage)
+        self.assertEqual(result['latency_ms'], 250)
+
+    def test_abandoned_stream_reports_latency_without_usage(self):
+        client = StreamingClient(['HIJACKED', ' and more'], {'usage': {'input_tokens': 12, 'output_tokens': 4}, 'latency_ms': 250})
+        detector = PromptInjectionDetector(client, stream=True)
+
+        result = detector.detect_injection('system', 'attack', 'HIJACKED', 'test-model')
+
+        self.assertIsNone(result['input_tokens'])
+        self.assertIsNone(result['output_tokens'])
+        self.assertIsNotNone(result['latency_ms'])
+        self.assertNotEqual(result['latency_ms'], 250)
+
+    def test_default_stream_yields_whole_response(self):
+        from src.helpers.llm_client import LLMClient
+
+        class NonStreamingClient(LLMClient):
+            def invoke_model(self, model_id, system_prompt, user_prompt, image_path=None):
+                return {'content': [{'text': 'HIJACKED'}]}
+
+            def get_client_type(self):
+                return 'Test'
+
+        detector = PromptInjectionDetector(NonStreamingClient(), stream=True)
+
+        self.assertTrue(detector.detect_injection('system', 'attack', 'HIJACKED', 'test-model')['injection_detected'])
+
+
 if __name__ == '__main__':
     unittest.main()
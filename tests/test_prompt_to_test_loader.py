@@ -61,6 +61,32 @@ class TestPromptToTestLoader(unittest.TestCase):
         loader = PromptToTestLoader(use_case='ignored_case', config_path=custom_path)
         self.assertEqual(str(loader.config_path), custom_path)
 
+    def test_model_id_list_is_normalized(self):
+        self.test_config_data['model_id'] = ['model-a', 'model-b']
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
+            yaml.dump(self.test_config_data, f)
+            config_path = f.name
+
+        try:
+            config = PromptToTestLoader(config_path=config_path).load_prompt_to_test()
+
+            self.assertEqual(config['model_ids'], ['model-a', 'model-b'])
+            self.assertEqual(config['model_id'], 'model-a')
+        finally:
+            Path(config_path).unlink()
+
+    def test_single_model_id_is_normalized(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
+            yaml.dump(self.test_config_data, f)
+            config_path = f.name
+
+        try:
+            config = PromptToTestLoader(config_path=config_path).load_prompt_to_test()
+
+            self.assertEqual(config['model_ids'], ['test-model-id'])
+        finally:
+            Path(config_path).unlink()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import Mock
+
+import pytest
+
+from src.helpers.llm_client import ResponseStream
+from src.helpers.rate_limiter import RateLimitedClient, RateLimiter, ThrottlingError, TokenBucket, is_throttling_error
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}}
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_token_bucket_waits_for_refill(self):
+        bucket = TokenBucket(60, self.clock)
+        bucket.take(60)
+
+        self.assertAlmostEqual(bucket.wait_time(1), 1.0)
+        self.clock.sleep(1.0)
+        self.assertEqual(bucket.wait_time(1), 0.0)
+
+    def test_acquire_spaces_requests_to_budget(self):
+        limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1_000_000, clock=self.clock, sleep=self.clock.sleep)
+
+        for _ in range(4):
+            limiter.acquire('model', 10)
+
+        # The first two requests use the initial burst, the next two wait 30s each
+        self.assertAlmostEqual(self.clock.now, 60.0)
+
+    def test_token_budget_limits_large_requests(self):
+        limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=6000, clock=self.clock, sleep=self.clock.sleep)
+
+        limiter.acquire('model', 6000)
+        limiter.acquire('model', 3000)
+
+        self.assertAlmostEqual(self.clock.now, 30.0)
+
+    def test_throttle_halves_rate_and_success_recovers(self):
+        limiter = RateLimiter(requests_per_minute=100, clock=self.clock, sleep=self.clock.sleep)
+
+        limiter.on_throttle('model')
+        self.assertEqual(limiter.current_requests_per_minute('model'), 50)
+
+        for _ in range(25):
+            limiter.on_success('model')
+        self.assertEqual(limiter.current_requests_per_minute('model'), 100)
+        self.assertEqual(limiter.current_requests_per_minute('other-model'), 100)
+
+    def test_model_overrides_from_config(self):
+        limiter = RateLimiter.from_config({'requests_per_minute': 10, 'models': {'fast-model': {'requests_per_minute': 500}}})
+
+        self.assertEqual(limiter.current_requests_per_minute('slow-model'), 10)
+        self.assertEqual(limiter.current_requests_per_minute('fast-model'), 500)
+
+    def test_is_throttling_error(self):
+        self.assertTrue(is_throttling_error(ClientError('ThrottlingException')))
+        self.assertTrue(is_throttling_error(ThrottlingError()))
+        self.assertFalse(is_throttling_error(ClientError('ValidationException')))
+        self.assertFalse(is_throttling_error(ValueError()))
+
+
+class TestRateLimitedClient(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.inner_client = Mock()
+        self.inner_client.get_stats.return_value = {}
+        limiter = RateLimiter(clock=self.clock, sleep=self.clock.sleep)
+        self.client = RateLimitedClient(self.inner_client, limiter, max_retries=2, sleep=self.clock.sleep)
+
+    def test_retries_throttled_calls(self):
+        self.inner_client.invoke_model.side_effect = [ClientError('ThrottlingException'), {'content': [{'text': 'ok'}]}]
+
+        response = self.client.invoke_model('model', 'system', 'user')
+
+        self.assertEqual(response['content'][0]['text'], 'ok')
+        self.assertEqual(self.client.get_stats(), {'throttles': 1, 'retries': 1})
+
+    def test_gives_up_after_max_retries(self):
+        self.inner_client.invoke_model.side_effect = ClientError('ThrottlingException')
+
+        with pytest.raises(ClientError):
+            self.client.invoke_model('model', 'system', 'user')
+
+        self.assertEqual(self.inner_client.invoke_model.call_count, 3)
+        self.assertEqual(self.client.get_stats(), {'throttles': 3, 'retries': 2})
+
+    def test_other_errors_are_not_retried(self):
+        self.inner_client.invoke_model.side_effect = ClientError('ValidationException')
+
+        with pytest.raises(ClientError):
+            self.client.invoke_model('model', 'system', 'user')
+
+        self.assertEqual(self.inner_client.invoke_model.call_count, 1)
+        self.assertEqual(self.client.get_stats(), {'throttles': 0, 'retries': 0})
+
+    def test_retries_stream_throttled_before_first_chunk(self):
+        def throttled_stream(*args):
+            raise ClientError('ThrottlingException')
+            yield
+
+        self.inner_client.invoke_model_stream.side_effect = [ResponseStream(throttled_stream()), ResponseStream(['o', 'k'])]
+
+        chunks = list(self.client.invoke_model_stream('model', 'system', 'user'))
+
+        self.assertEqual(chunks, ['o', 'k'])
+        self.assertEqual(self.client.get_stats(), {'throttles': 1, 'retries': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+
+from src.helpers.llm_client import ResponseStream
+from src.helpers.response_cache import CachedLLMClient, ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = Path(self.temp_dir.name) / 'responses.sqlite'
+
+        self.mock_bedrock_client = Mock()
+        self.mock_bedrock_client.get_client_type.return_value = 'Mock API'
+        self.mock_bedrock_client.get_stats.return_value = {}
+        self.mock_bedrock_client.invoke_model.side_effect = lambda *args: {'content': [{'text': f'response {self.call_count()}'}]}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def call_count(self):
+        return self.mock_bedrock_client.invoke_model.call_count
+
+    def run_iterations(self, client, iterations=3, user_prompt='attack'):
+        return [client.invoke_model('test-model', 'system', user_prompt)['content'][0]['text'] for _ in range(iterations)]
+
+    def test_rerun_is_served_from_cache_per_iteration(self):
+        cache = ResponseCache(str(self.cache_path))
+        first_run = self.run_iterations(CachedLLMClient(self.mock_bedrock_client, cache))
+        second_client = CachedLLMClient(self.mock_bedrock_client, cache)
+        second_run = self.run_iterations(second_client)
+
+        self.assertEqual(first_run, ['response 1', 'response 2', 'response 3'])
+        self.assertEqual(second_run, first_run)
+        self.assertEqual(self.call_count(), 3)
+        self.assertEqual(second_client.get_stats(), {'cache_hits': 3, 'cache_misses': 0})
+
+    def test_cache_persists_on_disk(self):
+        cache = ResponseCache(str(self.cache_path))
+        self.run_iterations(CachedLLMClient(self.mock_bedrock_client, cache), iterations=1)
+        cache.close()
+
+        reopened_cache = ResponseCache(str(self.cache_path))
+        self.run_iterations(CachedLLMClient(self.mock_bedrock_client, reopened_cache), iterations=1)
+
+        self.assertEqual(self.call_count(), 1)
+
+    def test_changed_message_is_a_miss(self):
+        cache = ResponseCache(str(self.cache_path))
+        self.run_iterations(CachedLLMClient(self.mock_bedrock_client, cache), iterations=1)
+        self.run_iterations(CachedLLMClient(self.mock_bedrock_client, cache), iterations=1, user_prompt='edited attack')
+
+        self.assertEqual(self.call_count(), 2)
+
+    def test_only_complete_streams_are_cached(self):
+        self.mock_bedrock_client.invoke_model_stream.side_effect = lambda *args: ResponseStream(['stream', 'ed'])
+        cache = ResponseCache(str(self.cache_path))
+
+        abandoned = CachedLLMClient(self.mock_bedrock_client, cache).invoke_model_stream('test-model', 'system', 'attack')
+        next(abandoned)
+        abandoned.close()
+        self.assertEqual(len(cache), 0)
+
+        self.assertEqual(
+            list(CachedLLMClient(self.mock_bedrock_client, cache).invoke_model_stream('test-model', 'system', 'attack')), ['stream', 'ed']
+        )
+        cached_client = CachedLLMClient(self.mock_bedrock_client, cache)
+        self.assertEqual(list(cached_client.invoke_model_stream('test-model', 'system', 'attack')), ['streamed'])
+        self.assertEqual(cached_client.get_stats(), {'cache_hits': 1, 'cache_misses': 0})
+
+    def test_cached_stream_reports_no_model_call(self):
+        def stream():
+            yield 'streamed'
+            return {'usage': {'input_tokens': 3, 'output_tokens': 1}, 'latency_ms': 40}
+
+        self.mock_bedrock_client.invoke_model_stream.side_effect = lambda *args: ResponseStream(stream())
+        cache = ResponseCache(str(self.cache_path))
+
+        miss = CachedLLMClient(self.mock_bedrock_client, cache).invoke_model_stream('test-model', 'system', 'attack')
+        list(miss)
+        hit = CachedLLMClient(self.mock_bedrock_client, cache).invoke_model_stream('test-model', 'system', 'attack')
+        list(hit)
+
+        self.assertEqual(miss.response, {'usage': {'input_tokens': 3, 'output_tokens': 1}, 'latency_ms': 40})
+        self.assertEqual(hit.response, {'usage': None, 'latency_ms': None})
+
+    def test_refresh_calls_model_and_overwrites(self):
+        cache = ResponseCache(str(self.cache_path))
+        self.run_iterations(CachedLLMClient(self.mock_bedrock_client, cache), iterations=1)
+        refreshed = self.run_iterations(CachedLLMClient(self.mock_bedrock_client, cache, refresh=True), iterations=1)
+        cached = self.run_iterations(CachedLLMClient(self.mock_bedrock_client, cache), iterations=1)
+
+        self.assertEqual(refreshed, ['response 2'])
+        self.assertEqual(cached, ['response 2'])
+        self.assertEqual(self.call_count(), 2)
+
+    def test_evicts_least_recently_used_over_max_bytes(self):
+        cache = ResponseCache(str(self.cache_path), max_bytes=120)
+        cache.put('old', {'text': 'x' * 40})
+        cache.put('recent', {'text': 'y' * 40})
+        cache.get('old')
+        cache.put('newest', {'text': 'z' * 40})
+
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get('recent'))
+        self.assertIsNotNone(cache.get('old'))
+        self.assertIsNotNone(cache.get('newest'))
+
+    def test_evicts_expired_entries(self):
+        cache = ResponseCache(str(self.cache_path), max_age_days=1)
+        cache.put('key', {'text': 'response'})
+        cache.connection.execute('UPDATE responses SET created_at = ?', (time.time() - 2 * 24 * 3600,))
+
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+
+from src.prompt_injection_detector import PromptInjectionDetector
+from src.result_formatter import ResultFormatter
+from src.result_sinks import CallbackResultSink, JsonlResultSink, StdoutResultSink, TaggedResultSink
+from src.runner import Runner
+
+
+class TestResultSinks(unittest.TestCase):
+    def setUp(self):
+        self.mock_bedrock_client = Mock()
+        self.mock_bedrock_client.invoke_model.return_value = {'content': [{'text': 'Access Denied'}]}
+        self.detector = PromptInjectionDetector(self.mock_bedrock_client)
+        self.attacks = [
+            {'name': 'Test Attack 1', 'prompt': 'Test prompt 1', 'payload': 'Access Denied', 'relative_path': 'attack_1.yaml'},
+            {'name': 'Test Attack 2', 'prompt': 'Test prompt 2', 'payload': 'Nope', 'relative_path': 'attack_2.yaml'},
+        ]
+
+    def test_runner_emits_iteration_and_test_results(self):
+        records = []
+        runner = Runner(self.detector, ResultFormatter(), iterations=2, sinks=[CallbackResultSink(records.append)])
+
+        runner.run_injection_tests('System', 'Pre', 'Post', self.attacks, 'test-model')
+
+        self.assertEqual([record['type'] for record in records], ['iteration', 'iteration', 'test_result'] * 2)
+        self.assertEqual(records[0]['relative_path'], 'attack_1.yaml')
+        self.assertEqual(records[0]['model_id'], 'test-model')
+        self.assertEqual(records[0]['response_text'], 'Access Denied')
+        self.assertEqual(records[2]['successful_iterations'], 2)
+        self.assertNotIn('iteration_results', records[2])
+
+    def test_runner_without_responses_keeps_only_counts(self):
+        runner = Runner(self.detector, ResultFormatter(), iterations=2, concurrency=2, keep_responses=False)
+
+        result = runner.run_injection_tests('System', 'Pre', 'Post', self.attacks, 'test-model')
+
+        self.assertEqual(result['successful_injections'], 2)
+        self.assertEqual(result['blocked_injections'], 2)
+        self.assertNotIn('iteration_results', result['results'][0])
+        self.assertEqual(result['results'][1]['blocked_iterations'], 2)
+
+    def test_jsonl_sink_appends_records(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / 'results' / 'run.jsonl'
+            sink = JsonlResultSink(str(path))
+            sink.write({'type': 'iteration', 'response_text': 'émoji 🚀'})
+            sink.close()
+
+            sink = JsonlResultSink(str(path))
+            sink.write({'type': 'test_result'})
+            sink.close()
+
+            records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+        self.assertEqual(records, [{'type': 'iteration', 'response_text': 'émoji 🚀'}, {'type': 'test_result'}])
+
+    def test_stdout_sink_prints_json_lines(self):
+        stream = io.StringIO()
+
+        StdoutResultSink(stream).write({'type': 'iteration', 'iteration': 1})
+
+        self.assertEqual(json.loads(stream.getvalue()), {'type': 'iteration', 'iteration': 1})
+
+    def test_tagged_sink_adds_fields_and_leaves_the_wrapped_sink_open(self):
+        sink = Mock()
+        tagged = TaggedResultSink(sink, {'use_case': 'default'})
+
+        tagged.write({'type': 'test_result', 'relative_path': 'attack_1.yaml'})
+        tagged.close()
+
+        sink.write.assert_called_once_with({'use_case': 'default', 'type': 'test_result', 'relative_path': 'attack_1.yaml'})
+        sink.close.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+import sqlite3
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from src.prompt_injection_detector import PromptInjectionDetector
+from src.result_formatter import ResultFormatter
+from src.results_store import PreviousResults, ResultsStore, ResultsStoreSink
+from src.runner import Runner
+
+ATTACKS = [{'name': f'Attack {n}', 'prompt': f'Prompt {n}', 'payload': 'PWNED', 'relative_path': f'dir/attack_{n}.yaml'} for n in range(5)]
+
+
+def stored_result(relative_path, successful_iterations, model_id='test-model', iterations=2):
+    return {
+        'type': 'test_result',
+        'name': relative_path,
+        'relative_path': relative_path,
+        'model_id': model_id,
+        'category': 'jailbreak',
+        'iterations': iterations,
+        'successful_iterations': successful_iterations,
+        'blocked_iterations': iterations - successful_iterations,
+        'success_rate': successful_iterations / iterations * 100,
+        'calls': iterations,
+        'input_tokens': 10,
+        'output_tokens': 5,
+        'latency_ms': 20.0,
+        'estimated_cost': None,
+    }
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = str(Path(self.temp_dir.name) / 'results.sqlite')
+
+    def _store(self, **kwargs):
+        store = ResultsStore(self.path, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def _record_run(self, store, run_id, results, use_case='default'):
+        store.start_run(run_id, use_case, 'Mock')
+        sink = ResultsStoreSink(store, run_id, batch_size=2)
+        for result in results:
+            sink.write(result)
+        sink.write({'type': 'iteration', 'relative_path': 'ignored'})
+        sink.mark_complete()
+
+    def test_diff_reports_attacks_whose_verdict_flipped(self):
+        store = self._store()
+        self._record_run(store, 'a', [stored_result('one.yaml', 0), stored_result('two.yaml', 2), stored_result('three.yaml', 1)])
+        self._record_run(store, 'b', [stored_result('one.yaml', 1), stored_result('two.yaml', 0), stored_result('three.yaml', 2)])
+
+        diff = store.diff_runs('a', 'b')
+
+        self.assertEqual([change['relative_path'] for change in diff['newly_successful']], ['one.yaml'])
+        self.assertEqual(diff['newly_successful'][0]['base_success_rate'], 0.0)
+        self.assertEqual(diff['newly_successful'][0]['success_rate'], 50.0)
+        self.assertEqual([change['relative_path'] for change in diff['newly_blocked']], ['two.yaml'])
+
+    def test_diff_matches_attacks_per_model(self):
+        store = self._store()
+        self._record_run(store, 'a', [stored_result('one.yaml', 0, 'model-a'), stored_result('one.yaml', 2, 'model-b')])
+        self._record_run(store, 'b', [stored_result('one.yaml', 0, 'model-a'), stored_result('one.yaml', 2, 'model-b')])
+
+        self.assertEqual(store.diff_runs('a', 'b'), {'newly_successful': [], 'newly_blocked': []})
+
+    def test_diff_of_unknown_run_raises(self):
+        store = self._store()
+        self._record_run(store, 'a', [stored_result('one.yaml', 0)])
+
+        with self.assertRaisesRegex(ValueError, 'missing'):
+            store.diff_runs('a', 'missing')
+
+    def test_list_runs_newest_first_with_totals(self):
+        store = self._store()
+        with patch('src.results_store.time.time', side_effect=[100.0, 101.0, 200.0, 201.0]):
+            self._record_run(store, 'old', [stored_result('one.yaml', 1)])
+            self._record_run(store, 'new', [stored_result('one.yaml', 0), stored_result('two.yaml', 2)])
+
+        runs = store.list_runs('default')
+
+        self.assertEqual([run['run_id'] for run in runs], ['new', 'old'])
+        self.assertEqual((runs[0]['test_results'], runs[0]['iterations'], runs[0]['successful_iterations']), (2, 4, 2))
+        self.assertEqual(runs[0]['status'], 'complete')
+
+    def test_run_without_mark_complete_stays_incomplete_but_keeps_results(self):
+        store = self._store()
+        store.start_run('a', 'default', 'Mock')
+        sink = ResultsStoreSink(store, 'a')
+        sink.write(stored_result('one.yaml', 1))
+        sink.flush()
+
+        self.assertEqual(store.list_runs()[0]['status'], 'incomplete')
+        self.assertEqual(store.list_runs()[0]['test_results'], 1)
+
+    def test_resumed_run_replaces_its_earlier_results(self):
+        store = self._store()
+        self._record_run(store, 'a', [stored_result('one.yaml', 0)])
+        self._record_run(store, 'a', [stored_result('one.yaml', 2)])
+
+        run = store.list_runs()[0]
+        self.assertEqual((run['test_results'], run['successful_iterations']), (1, 2))
+
+    def test_keeps_only_the_newest_runs_of_each_use_case(self):
+        store = self._store(keep_runs=2)
+        for n in range(4):
+            self._record_run(store, f'default-{n}', [stored_result('one.yaml', 0)])
+            self._record_run(store, f'other-{n}', [stored_result('one.yaml', 0)], use_case='other')
+            time.sleep(0.001)
+
+        self.assertEqual(store.prune(), 4)
+        self.assertEqual({run['run_id'] for run in store.list_runs()}, {'default-2', 'default-3', 'other-2', 'other-3'})
+        self.assertEqual(store.connection.execute("SELECT COUNT(*) FROM test_results WHERE run_id = 'default-0'").fetchone()[0], 0)
+
+    def test_prune_returns_freed_pages_to_the_file_system(self):
+        store = self._store(keep_runs=1)
+        self._record_run(store, 'old', [stored_result(f'attack_{n}.yaml', 0) for n in range(2000)])
+        time.sleep(0.001)
+        self._record_run(store, 'new', [stored_result('one.yaml', 0)])
+
+        store.prune()
+
+        self.assertEqual(store.connection.execute('PRAGMA freelist_count').fetchone()[0], 0)
+
+    def test_drops_runs_older_than_max_age_when_opened(self):
+        store = self._store()
+        with patch('src.results_store.time.time', return_value=time.time() - 10 * 24 * 3600):
+            self._record_run(store, 'old', [stored_result('one.yaml', 0)])
+        self._record_run(store, 'new', [stored_result('one.yaml', 0)])
+        store.close()
+
+        reopened = self._store(max_age_days=7)
+
+        self.assertEqual([run['run_id'] for run in reopened.list_runs()], ['new'])
+
+    def test_opens_a_store_created_before_input_fingerprints_were_stored(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            'CREATE TABLE test_results (run_id TEXT NOT NULL, model_id TEXT NOT NULL, relative_path TEXT NOT NULL, name TEXT, '
+            'category TEXT, iterations INTEGER, successful_iterations INTEGER, blocked_iterations INTEGER, success_rate REAL, '
+            'calls INTEGER, input_tokens INTEGER, output_tokens INTEGER, latency_ms REAL, estimated_cost REAL, '
+            'PRIMARY KEY (run_id, model_id, relative_path))'
+        )
+        connection.close()
+
+        store = self._store()
+        self._record_run(store, 'a', [{**stored_result('one.yaml', 1), 'input_fingerprint': 'abc'}])
+
+        self.assertEqual(store.find_result('abc', 'Mock')['successful_iterations'], 1)
+
+
+class TestIncrementalRuns(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.store = ResultsStore(str(Path(self.temp_dir.name) / 'results.sqlite'))
+        self.addCleanup(self.store.close)
+        self.client = Mock()
+        self.client.invoke_model.return_value = {'content': [{'text': 'PWNED'}], 'latency_ms': 5}
+
+    def _run(self, run_id, attacks, client_type='Mock', concurrency=1, iterations=2):
+        self.client.invoke_model.reset_mock()
+        self.store.start_run(run_id, 'default', client_type)
+        sink = ResultsStoreSink(self.store, run_id)
+        runner = Runner(
+            PromptInjectionDetector(self.client),
+            ResultFormatter(),
+            iterations=iterations,
+            concurrency=concurrency,
+            sinks=[sink],
+            previous_results=PreviousResults(self.store, client_type),
+        )
+        stats = runner.run_injection_tests('System', 'Pre', 'Post', attacks, 'test-model')
+        sink.mark_complete()
+        return stats
+
+    def test_unchanged_attacks_are_carried_forward_without_model_calls(self):
+        self._run('first', ATTACKS)
+        stats = self._run('second', ATTACKS)
+
+        self.client.invoke_model.assert_not_called()
+        self.assertEqual(stats['carried_forward_tests'], 5)
+        self.assertEqual((stats['total_iterations'], stats['successful_injections']), (10, 10))
+        self.assertEqual(stats['usage']['calls'], 0)
+        self.assertEqual({result['carried_forward_from'] for result in stats['results']}, {'first'})
+
+    def test_only_the_changed_attack_runs_again(self):
+        self._run('first', ATTACKS)
+        changed = [dict(attack) for attack in ATTACKS]
+        changed[2]['payload'] = 'HACKED'
+
+        stats = self._run('second', changed, concurrency=4)
+
+        self.assertEqual(self.client.invoke_model.call_count, 2)
+        self.assertEqual(stats['carried_forward_tests'], 4)
+        self.assertEqual(stats['successful_injections'], 8)
+        self.assertEqual(self.store.diff_runs('first', 'second')['newly_blocked'][0]['relative_path'], 'dir/attack_2.yaml')
+
+    def test_carried_attacks_are_announced_as_carried_forward(self):
+        self._run('first', ATTACKS)
+
+        for concurrency in (1, 4):
+            changed = [dict(attack) for attack in ATTACKS]
+            changed[2]['payload'] = f'HACKED-{concurrency}'
+            output = StringIO()
+            with redirect_stdout(output):
+                self._run(f'second-{concurrency}', changed, concurrency=concurrency)
+
+            announcements = [line for line in output.getvalue().splitlines() if line.startswith('Test ')]
+            self.assertEqual(len(announcements), 5)
+            self.assertIn(' - carried forward from ', announcements[0])
+            previous_run = announcements[0].rsplit(' ', 1)[-1]
+            self.assertIn(f'Example Successful Attack: (carried forward from run {previous_run})', output.getvalue())
+            self.assertNotRegex(output.getvalue(), r'Example Successful Attack: *\n')
+            self.assertTrue(announcements[2].endswith('Running 2 iterations...'))
+
+    def test_carried_results_are_stored_again_for_the_next_run(self):
+        self._run('first', ATTACKS)
+        self._run('second', ATTACKS)
+        self._run('third', ATTACKS)
+
+        self.client.invoke_model.assert_not_called()
+        self.assertEqual(self.store.list_runs()[0]['successful_iterations'], 10)
+
+    def test_changed_settings_or_client_run_everything(self):
+        self._run('first', ATTACKS)
+
+        self._run('more-iterations', ATTACKS, iterations=3)
+        self.assertEqual(self.client.invoke_model.call_count, 15)
+
+        self._run('other-client', ATTACKS, client_type='Fake LLM Client')
+        self.assertEqual(self.client.invoke_model.call_count, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
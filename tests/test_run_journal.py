@@ -0,0 +1,142 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+
+from src.prompt_injection_detector import PromptInjectionDetector
+from src.result_formatter import ResultFormatter
+from src.run_journal import RunJournal
+from src.runner import Runner
+from src.sharding import run_fingerprint
+
+
+class TestRunJournal(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.mock_bedrock_client = Mock()
+        self.detector = PromptInjectionDetector(self.mock_bedrock_client)
+        self.attacks = [
+            {'name': f'Test Attack {n}', 'prompt': f'Test prompt {n}', 'payload': 'Access Denied', 'relative_path': f'attack_{n}.yaml'}
+            for n in range(3)
+        ]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_tests(self, journal, completed_iterations=None):
+        runner = Runner(self.detector, ResultFormatter(), iterations=2, sinks=[journal], completed_iterations=completed_iterations)
+        return runner.run_injection_tests('System', 'Pre', 'Post', self.attacks, 'test-model')
+
+    def test_resume_skips_completed_iterations_and_merges_results(self):
+        self.mock_bedrock_client.invoke_model.side_effect = [{'content': [{'text': 'Access Denied'}]}] * 3 + [
+            ConnectionError('network down')
+        ]
+
+        journal = RunJournal.start(self.temp_dir.name, use_case='default')
+        with self.assertRaises(ConnectionError):
+            self.run_tests(journal)
+        journal.close()
+
+        self.mock_bedrock_client.invoke_model.side_effect = None
+        self.mock_bedrock_client.invoke_model.return_value = {'content': [{'text': 'Blocked'}]}
+        resumed_journal = RunJournal.resume(journal.run_id, self.temp_dir.name, use_case='default')
+        completed_iterations = resumed_journal.load_completed()
+        result = self.run_tests(resumed_journal, completed_iterations)
+        resumed_journal.close()
+
+        self.assertEqual(len(completed_iterations), 3)
+        self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, 4 + 3)
+        self.assertEqual(result['total_iterations'], 6)
+        self.assertEqual(result['successful_injections'], 3)
+        self.assertEqual(result['blocked_injections'], 3)
+        self.assertEqual(len(RunJournal.resume(journal.run_id, self.temp_dir.name).load_completed()), 6)
+
+    def test_truncated_last_line_is_ignored(self):
+        journal = RunJournal.start(self.temp_dir.name)
+        journal.write(
+            {
+                'type': 'iteration',
+                'model_id': 'm',
+                'relative_path': 'a.yaml',
+                'iteration': 1,
+                'injection_detected': True,
+                'response_text': 'x',
+            }
+        )
+        journal.close()
+        with open(journal.path, 'a', encoding='utf-8') as f:
+            f.write('{"type": "iteration", "model_id": "m", "relat')
+
+        resumed_journal = RunJournal.resume(journal.run_id, self.temp_dir.name)
+        resumed_journal.write(
+            {
+                'type': 'iteration',
+                'model_id': 'm',
+                'relative_path': 'a.yaml',
+                'iteration': 2,
+                'injection_detected': False,
+                'response_text': 'y',
+            }
+        )
+        resumed_journal.close()
+
+        self.assertEqual(set(resumed_journal.load_completed()), {('m', 'a.yaml', 1), ('m', 'a.yaml', 2)})
+
+    def test_resume_unknown_run_id(self):
+        with self.assertRaises(FileNotFoundError):
+            RunJournal.resume('missing-run', self.temp_dir.name)
+
+    def test_resume_rejects_other_use_case(self):
+        journal = RunJournal.start(self.temp_dir.name, use_case='default')
+        journal.close()
+
+        with self.assertRaises(ValueError):
+            RunJournal.resume(journal.run_id, self.temp_dir.name, use_case='proseller-agent')
+
+    def test_resume_rejects_changed_settings_or_attacks(self):
+        prompt_to_test = {'system_prompt': 'System', 'pre_user_message': 'Pre', 'post_user_message': 'Post', 'iterations': 2}
+        journal = RunJournal.start(
+            self.temp_dir.name, use_case='default', run_fingerprint=run_fingerprint(prompt_to_test, None, self.attacks)
+        )
+        journal.close()
+
+        changed_attacks = [dict(self.attacks[0], payload='PWNED')] + self.attacks[1:]
+        for fingerprint in (
+            run_fingerprint({**prompt_to_test, 'system_prompt': 'Other'}, None, self.attacks),
+            run_fingerprint({**prompt_to_test, 'iterations': 3}, None, self.attacks),
+            run_fingerprint(prompt_to_test, None, changed_attacks),
+        ):
+            with self.assertRaisesRegex(ValueError, 'other settings or attacks'):
+                RunJournal.resume(journal.run_id, self.temp_dir.name, use_case='default', run_fingerprint=fingerprint)
+
+        resumed = RunJournal.resume(
+            journal.run_id, self.temp_dir.name, use_case='default', run_fingerprint=run_fingerprint(prompt_to_test, None, self.attacks)
+        )
+        resumed.close()
+
+    def test_completed_run_deletes_its_journal(self):
+        self.mock_bedrock_client.invoke_model.return_value = {'content': [{'text': 'Blocked'}]}
+        journal = RunJournal.start(self.temp_dir.name)
+        self.run_tests(journal)
+
+        journal.mark_complete()
+        journal.close()
+
+        self.assertFalse(journal.path.exists())
+
+    def test_start_prunes_journals_of_old_interrupted_runs(self):
+        old_journal = RunJournal.start(self.temp_dir.name)
+        old_journal.close()
+        old = time.time() - 40 * 24 * 3600
+        os.utime(old_journal.path, (old, old))
+
+        recent_journal = RunJournal.start(self.temp_dir.name)
+        recent_journal.close()
+
+        self.assertEqual(list(Path(self.temp_dir.name).glob('*.jsonl')), [recent_journal.path])
+
+
+if __name__ == '__main__':
+    unittest.main()
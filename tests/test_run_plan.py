@@ -0,0 +1,37 @@
+from src.run_plan import plan_run
+
+
+def build_config(model_ids):
+    return {
+        'model_id': model_ids[0],
+        'model_ids': model_ids,
+        'iterations': 3,
+        'concurrency': 4,
+        'system_prompt': 'S' * 100,
+        'pre_user_message': '<q>',
+        'post_user_message': '</q>',
+    }
+
+
+def test_plan_counts_calls_and_tokens_per_model():
+    attacks = [
+        {'prompt': 'A' * 200, 'image_path': None},
+        {'prompt': 'B' * 40, 'image_path': 'shared_assets/cat.png'},
+    ]
+
+    plan = plan_run(build_config(['eu.amazon.nova-lite-v1:0', 'unpriced-model']), attacks)
+
+    assert plan['attacks'] == 2
+    assert plan['attacks_with_images'] == 1
+    assert [model['calls'] for model in plan['models']] == [6, 6]
+    nova, unpriced = plan['models']
+    assert nova['input_tokens'] > (100 + 200 + 100 + 40) * 3 / 4
+    assert nova['estimated_input_cost'] > 0
+    assert unpriced['estimated_input_cost'] is None
+
+
+def test_plan_of_empty_selection():
+    plan = plan_run(build_config(['eu.amazon.nova-lite-v1:0']), [])
+
+    assert plan['models'][0]['calls'] == 0
+    assert plan['models'][0]['input_tokens'] == 0
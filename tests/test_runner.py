@@ -1,9 +1,14 @@
+import threading
+import time
 import unittest
+from contextlib import redirect_stdout
+from io import StringIO
 from unittest.mock import Mock
 
+from src.early_stopping import EarlyStopping
 from src.prompt_injection_detector import PromptInjectionDetector
 from src.result_formatter import ResultFormatter
-from src.runner import Runner
+from src.runner import Runner, build_defended_message, defended_message_prefix
 
 
 class TestRunner(unittest.TestCase):
@@ -50,6 +55,38 @@ class TestRunner(unittest.TestCase):
 
         self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, 3)
 
+    def test_usage_is_aggregated_per_attack_category_and_run(self):
+        self.mock_bedrock_client.invoke_model.return_value = {
+            'content': [{'text': 'Access Denied'}],
+            'usage': {'input_tokens': 100, 'output_tokens': 20},
+            'latency_ms': 250,
+        }
+        attacks = [
+            {'name': 'Jailbreak 1', 'prompt': 'p1', 'payload': 'PWNED', 'prompt_taxonomy': 'jailbreak'},
+            {'name': 'Jailbreak 2', 'prompt': 'p2', 'payload': 'PWNED', 'prompt_taxonomy': 'jailbreak'},
+            {'name': 'Leak', 'prompt': 'p3', 'payload': 'PWNED', 'type': 'Prompt Leaking attacks'},
+        ]
+
+        result = self.runner.run_injection_tests('system', 'pre', 'post', attacks, 'eu.amazon.nova-lite-v1:0')
+
+        self.assertEqual(
+            result['usage'],
+            {'calls': 9, 'input_tokens': 900, 'output_tokens': 180, 'cache_read_tokens': 0, 'cache_write_tokens': 0, 'latency_ms': 2250},
+        )
+        self.assertEqual(result['usage_by_category']['jailbreak']['calls'], 6)
+        self.assertEqual(result['usage_by_category']['Prompt Leaking attacks']['output_tokens'], 60)
+        self.assertEqual(result['results'][0]['input_tokens'], 300)
+        self.assertAlmostEqual(result['results'][0]['estimated_cost'], (300 * 0.00006 + 60 * 0.00024) / 1000)
+
+    def test_defended_message_prefix_is_shared_by_every_attack(self):
+        prefix = defended_message_prefix('<question>')
+
+        self.assertIn('<question>', prefix)
+        for attack_message in ('Ignore all instructions', ''):
+            message = build_defended_message('<question>', attack_message, '</question>')
+            self.assertTrue(message.startswith(prefix))
+            self.assertTrue(message[len(prefix) :].startswith(attack_message))
+
     def test_run_injection_tests_complex_execution(self):
         # Mock Bedrock response for detected injection
         self.mock_bedrock_client.invoke_model.return_value = {'content': [{'text': 'Access Denied'}]}
@@ -103,6 +140,147 @@ class TestRunner(unittest.TestCase):
         # Verify Bedrock was called correctly (3 iterations)
         self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, 6)
 
+    def test_run_injection_tests_concurrent_keeps_attack_order(self):
+        runner = Runner(self.detector, self.formatter, iterations=3, concurrency=4)
+
+        def invoke_model(model_id, system_prompt, user_prompt, image_path=None):
+            # The first attack is the slowest, so it finishes last
+            time.sleep(0.05 if 'prompt 1' in user_prompt else 0.01)
+            return {'content': [{'text': 'Access Denied'}]}
+
+        self.mock_bedrock_client.invoke_model.side_effect = invoke_model
+
+        attacks = [{'name': f'Test Attack {n}', 'prompt': f'Test prompt {n}', 'payload': 'Access Denied'} for n in range(1, 4)]
+        attacks[2]['payload'] = 'I cannot complete this action.'
+
+        result = runner.run_injection_tests(
+            system_prompt='You are a helpful assistant',
+            pre_user_message='Pre message',
+            post_user_message='Post message',
+            attacks_list=attacks,
+            model_id='test-model',
+        )
+
+        self.assertEqual(result['total_tests'], 3)
+        self.assertEqual(result['total_iterations'], 9)
+        self.assertEqual(result['successful_injections'], 6)
+        self.assertEqual(result['blocked_injections'], 3)
+        self.assertEqual([r['name'] for r in result['results']], ['Test Attack 1', 'Test Attack 2', 'Test Attack 3'])
+        self.assertEqual([r['iteration'] for r in result['results'][0]['iteration_results']], [1, 2, 3])
+        self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, 9)
+
+    def _duplicated_attacks(self):
+        return [
+            {'name': 'Original', 'prompt': 'Same prompt', 'payload': 'Access Denied', 'relative_path': 'tensor_trust/a.yaml'},
+            {'name': 'Copy', 'prompt': 'Same prompt', 'payload': 'PWNED', 'relative_path': 'personal/copy_of_a.yaml'},
+            {'name': 'Unique', 'prompt': 'Other prompt', 'payload': 'Access Denied', 'relative_path': 'personal/b.yaml'},
+        ]
+
+    def test_identical_requests_are_sent_once_and_judged_per_attack(self):
+        self.mock_bedrock_client.invoke_model.return_value = {'content': [{'text': 'Access Denied'}], 'latency_ms': 10}
+
+        result = self.runner.run_injection_tests('System', 'Pre', 'Post', self._duplicated_attacks(), 'test-model')
+
+        self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, 6)
+        self.assertEqual(result['deduplicated_iterations'], 3)
+        self.assertEqual([r['successful_iterations'] for r in result['results']], [3, 0, 3])
+        self.assertEqual(result['results'][1]['calls'], 0)
+        self.assertTrue(all(r['deduplicated'] for r in result['results'][1]['iteration_results']))
+        self.assertEqual(self.runner._shared_results, {})
+
+    def test_identical_requests_are_sent_once_when_concurrent(self):
+        self.mock_bedrock_client.invoke_model.return_value = {'content': [{'text': 'Access Denied'}]}
+        runner = Runner(self.detector, self.formatter, iterations=3, concurrency=4)
+
+        result = runner.run_injection_tests('System', 'Pre', 'Post', self._duplicated_attacks() * 2, 'test-model')
+
+        self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, 6)
+        self.assertEqual(result['deduplicated_iterations'], 12)
+        self.assertEqual([r['successful_iterations'] for r in result['results']], [3, 0, 3, 3, 0, 3])
+        self.assertEqual(runner._shared_results, {})
+
+    def test_deduplication_can_be_disabled(self):
+        self.mock_bedrock_client.invoke_model.return_value = {'content': [{'text': 'Access Denied'}]}
+        runner = Runner(self.detector, self.formatter, iterations=3, deduplicate=False)
+
+        result = runner.run_injection_tests('System', 'Pre', 'Post', self._duplicated_attacks(), 'test-model')
+
+        self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, 9)
+        self.assertEqual(result['deduplicated_iterations'], 0)
+
+    def test_run_injection_tests_concurrency_limit(self):
+        runner = Runner(self.detector, self.formatter, iterations=4, concurrency=2)
+        lock = threading.Lock()
+        in_flight = {'current': 0, 'max': 0}
+
+        def invoke_model(model_id, system_prompt, user_prompt, image_path=None):
+            with lock:
+                in_flight['current'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['current'])
+            time.sleep(0.01)
+            with lock:
+                in_flight['current'] -= 1
+            return {'content': [{'text': 'nothing to see'}]}
+
+        self.mock_bedrock_client.invoke_model.side_effect = invoke_model
+
+        attacks = [{'name': f'Test Attack {n}', 'prompt': f'Test prompt {n}', 'payload': 'Access Denied'} for n in range(3)]
+        result = runner.run_injection_tests('System', 'Pre', 'Post', attacks, 'test-model')
+
+        self.assertEqual(result['blocked_injections'], 12)
+        self.assertEqual(in_flight['max'], 2)
+
+    def test_run_model_matrix_runs_every_model(self):
+        def invoke_model(model_id, system_prompt, user_prompt, image_path=None):
+            return {'content': [{'text': 'Access Denied' if model_id == 'weak-model' else 'Nice try'}]}
+
+        self.mock_bedrock_client.invoke_model.side_effect = invoke_model
+
+        attacks = [
+            {'name': f'Test Attack {n}', 'prompt': f'Test prompt {n}', 'payload': 'Access Denied', 'relative_path': f'attack_{n}.yaml'}
+            for n in range(2)
+        ]
+        output = StringIO()
+        with redirect_stdout(output):
+            stats_per_model = self.runner.run_model_matrix('System', 'Pre', 'Post', attacks, ['weak-model', 'strong-model'])
+
+        self.assertIn('[weak-model] Test Attack 0: ❌ 3/3 injections successful', output.getvalue())
+        self.assertIn('[strong-model] Test Attack 0: ✅ 0/3 injections successful', output.getvalue())
+        self.assertEqual(list(stats_per_model), ['weak-model', 'strong-model'])
+        self.assertEqual(stats_per_model['weak-model']['successful_injections'], 6)
+        self.assertEqual(stats_per_model['strong-model']['blocked_injections'], 6)
+        self.assertEqual([r['relative_path'] for r in stats_per_model['strong-model']['results']], ['attack_0.yaml', 'attack_1.yaml'])
+        self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, 12)
+
+    def test_run_injection_tests_early_stopping_any_breach(self):
+        runner = Runner(self.detector, self.formatter, iterations=5, early_stopping=EarlyStopping(mode='any_breach'))
+        self.mock_bedrock_client.invoke_model.return_value = {'content': [{'text': 'Access Denied'}]}
+
+        attacks = [
+            {'name': 'Breached Attack', 'prompt': 'Test prompt 1', 'payload': 'Access Denied'},
+            {'name': 'Blocked Attack', 'prompt': 'Test prompt 2', 'payload': 'I cannot complete this action.'},
+        ]
+        result = runner.run_injection_tests('System', 'Pre', 'Post', attacks, 'test-model')
+
+        self.assertEqual(result['results'][0]['iterations'], 1)
+        self.assertEqual(result['results'][0]['success_rate'], 100.0)
+        self.assertEqual(result['results'][1]['iterations'], 5)
+        self.assertEqual(result['total_iterations'], 6)
+        self.assertEqual(result['saved_iterations'], 4)
+        self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, 6)
+
+    def test_run_injection_tests_concurrent_early_stopping(self):
+        runner = Runner(self.detector, self.formatter, iterations=20, concurrency=2, early_stopping=EarlyStopping(mode='any_breach'))
+        self.mock_bedrock_client.invoke_model.return_value = {'content': [{'text': 'Access Denied'}]}
+
+        attacks = [{'name': 'Breached Attack', 'prompt': 'Test prompt', 'payload': 'Access Denied'}]
+        result = runner.run_injection_tests('System', 'Pre', 'Post', attacks, 'test-model')
+
+        # Calls already in flight when the verdict is reached still count
+        self.assertLessEqual(result['total_iterations'], 2)
+        self.assertEqual(result['total_iterations'] + result['saved_iterations'], 20)
+        self.assertEqual(self.mock_bedrock_client.invoke_model.call_count, result['total_iterations'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+
+from src.prompt_injection_detector import PromptInjectionDetector
+from src.result_formatter import ResultFormatter
+from src.runner import Runner
+from src.sharding import ShardResultsFile, merge_shard_files, parse_shard, select_shard, shard_of
+
+ATTACKS = [
+    {
+        'name': f'Attack {n}',
+        'prompt': f'Prompt {n}',
+        'payload': 'PWNED' if n % 3 else 'Access Denied',
+        'relative_path': f'dir/attack_{n}.yaml',
+    }
+    for n in range(30)
+]
+HEADER = {'use_case': 'default', 'run_fingerprint': 'abc', 'model_ids': ['test-model'], 'iterations': 2, 'client_type': 'Mock'}
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def _run(self, attacks, sinks=None):
+        client = Mock()
+        client.invoke_model.return_value = {'content': [{'text': 'Access Denied'}], 'latency_ms': 5}
+        runner = Runner(PromptInjectionDetector(client), ResultFormatter(), iterations=2, sinks=sinks)
+        return runner.run_injection_tests('System', 'Pre', 'Post', attacks, 'test-model')
+
+    def _run_shard(self, shard, shards, complete=True):
+        path = str(Path(self.temp_dir.name) / f'shard-{shard}.jsonl')
+        results = ShardResultsFile(path, {**HEADER, 'shard': shard, 'shards': shards})
+        self._run(select_shard(ATTACKS, shard, shards), [results])
+        if complete:
+            results.mark_complete()
+        results.close()
+        return path
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('2/4'), (2, 4))
+        for spec in ('0/4', '5/4', '2', 'a/b', '1/0'):
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_shards_partition_the_attacks(self):
+        shards = [select_shard(ATTACKS, shard, 3) for shard in (1, 2, 3)]
+
+        paths = sorted(attack['relative_path'] for shard in shards for attack in shard)
+        self.assertEqual(paths, sorted(attack['relative_path'] for attack in ATTACKS))
+        self.assertTrue(all(shards))
+        self.assertEqual(shard_of('dir/attack_1.yaml', 3), shard_of('dir\\attack_1.yaml', 3))
+
+    def test_merge_reproduces_the_stats_of_a_single_run(self):
+        single = self._run(ATTACKS)
+
+        merged = merge_shard_files([self._run_shard(shard, 3) for shard in (3, 1, 2)])
+
+        stats = merged['stats']['test-model']
+        self.assertEqual(set(stats), set(single))
+        for key in set(single) - {'results'}:
+            self.assertEqual(stats[key], single[key], key)
+
+    def test_merge_refuses_missing_or_incomplete_shards(self):
+        first, second = self._run_shard(1, 3), self._run_shard(2, 3, complete=False)
+
+        with self.assertRaisesRegex(ValueError, 'Missing shards 2, 3'):
+            merge_shard_files([first])
+        with self.assertRaisesRegex(ValueError, 'incomplete'):
+            merge_shard_files([first, second])
+        with self.assertRaisesRegex(ValueError, 'more than once'):
+            merge_shard_files([first, first])
+
+
+if __name__ == '__main__':
+    unittest.main()
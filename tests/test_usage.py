@@ -0,0 +1,32 @@
+import unittest
+
+from src.usage import add_usage, estimate_cost, iteration_usage, new_usage
+
+
+class TestUsage(unittest.TestCase):
+    def test_estimate_cost_by_model_family(self):
+        self.assertAlmostEqual(estimate_cost('eu.amazon.nova-lite-v1:0', 1000, 1000), 0.0003)
+        self.assertAlmostEqual(estimate_cost('anthropic.claude-3-5-haiku-20241022-v1:0', 1000, 0), 0.0008)
+        self.assertIsNone(estimate_cost('unknown-model', 1000, 1000))
+        self.assertIsNone(estimate_cost(None, 1000, 1000))
+
+    def test_iterations_without_a_call_add_nothing(self):
+        total = new_usage()
+        add_usage(total, iteration_usage({'iteration': 1, 'injection_detected': False, 'response_text': 'cached'}))
+        add_usage(total, iteration_usage({'input_tokens': 10, 'output_tokens': 5, 'latency_ms': 40.0}))
+
+        self.assertEqual(
+            total, {'calls': 1, 'input_tokens': 10, 'output_tokens': 5, 'cache_read_tokens': 0, 'cache_write_tokens': 0, 'latency_ms': 40.0}
+        )
+
+    def test_cached_input_tokens_are_priced_at_a_fraction(self):
+        uncached = estimate_cost('anthropic.claude-3-7-sonnet-20250219-v1:0', 2000, 0)
+        cache_reads = estimate_cost('anthropic.claude-3-7-sonnet-20250219-v1:0', 0, 0, cache_read_tokens=2000)
+        cache_writes = estimate_cost('anthropic.claude-3-7-sonnet-20250219-v1:0', 0, 0, cache_write_tokens=2000)
+
+        self.assertAlmostEqual(cache_reads, uncached * 0.1)
+        self.assertAlmostEqual(cache_writes, uncached * 1.25)
+
+
+if __name__ == '__main__':
+    unittest.main()